@@ -0,0 +1,163 @@
+# api/circuit_breaker.py
+import asyncio
+import time
+from collections import deque
+from typing import Dict
+
+
+class UpstreamUnavailable(Exception):
+    """Запрос к API отклонен без обращения к нему (разомкнут автомат или превышен лимит)"""
+    
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Автомат для одного endpoint'а: closed -> open -> half_open -> closed
+    
+    После failure_threshold подряд идущих сбоев (таймауты, ошибки соединения, 5xx)
+    запросы отклоняются сразу на reset_timeout секунд, затем пропускается
+    один пробный запрос: успех замыкает автомат, сбой снова размыкает.
+    """
+    
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+    
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+        self.transitions: Dict[tuple, int] = {}
+        self._probe_in_flight = False
+    
+    def allow(self) -> bool:
+        """Можно ли выполнить запрос сейчас"""
+        if self.state == self.CLOSED:
+            return True
+        
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self._transition(self.HALF_OPEN)
+        
+        if self.state == self.HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        
+        self.rejected += 1
+        return False
+    
+    def retry_after(self) -> float:
+        return max(self.reset_timeout - (time.monotonic() - self.opened_at), 1.0)
+    
+    def record_success(self) -> None:
+        self.failures = 0
+        self._probe_in_flight = False
+        if self.state != self.CLOSED:
+            self._transition(self.CLOSED)
+    
+    def record_failure(self) -> None:
+        self._probe_in_flight = False
+        self.failures += 1
+        if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.failure_threshold):
+            self.opened_at = time.monotonic()
+            self._transition(self.OPEN)
+    
+    def release_probe(self) -> None:
+        """Пробный запрос завершился без оценки состояния upstream (например, 404)"""
+        self._probe_in_flight = False
+    
+    def stats(self) -> dict:
+        return {
+            'state': self.state,
+            'failures': self.failures,
+            'rejected': self.rejected,
+            'transitions': {f"{source}->{target}": count for (source, target), count in self.transitions.items()}
+        }
+    
+    def _transition(self, state: str) -> None:
+        key = (self.state, state)
+        self.transitions[key] = self.transitions.get(key, 0) + 1
+        print(f"Circuit breaker {self.name}: {self.state} -> {state}")
+        self.state = state
+
+
+class AdaptiveLimiter:
+    """Адаптивный лимит одновременных запросов к API (AIMD)
+    
+    Каждый быстрый успешный ответ увеличивает лимит на 1/limit (примерно +1 за
+    «круг» запросов), таймаут, сбой или ответ медленнее latency_target уменьшает
+    его вдвое. Запросы сверх лимита ждут не дольше queue_timeout, затем отклоняются.
+    """
+    
+    def __init__(self, initial: float, min_limit: float, max_limit: float,
+                 latency_target: float, queue_timeout: float):
+        self.limit = float(initial)
+        self.min_limit = float(min_limit)
+        self.max_limit = float(max_limit)
+        self.latency_target = latency_target
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.rejected = 0
+        self.decrease_interval = 1.0
+        self._last_decrease = 0.0
+        self._waiters: deque = deque()
+    
+    async def acquire(self) -> bool:
+        """Занимает слот; False - лимит не освободился за queue_timeout"""
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            return True
+        
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+            return True
+        except asyncio.TimeoutError:
+            # Слот мог быть выдан в момент истечения таймаута - тогда он уже наш
+            if waiter.done() and not waiter.cancelled():
+                return True
+            self.rejected += 1
+            return False
+        except asyncio.CancelledError:
+            # Слот мог быть выдан одновременно с отменой - возвращаем его
+            if waiter.done() and not waiter.cancelled():
+                self.in_flight -= 1
+                self._wake_waiters()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+    
+    def release(self, latency: float, success: bool) -> None:
+        """Освобождает слот и подстраивает лимит по результату запроса"""
+        self.in_flight -= 1
+        if success and latency <= self.latency_target:
+            self.limit = min(self.limit + 1 / self.limit, self.max_limit)
+        else:
+            # Пачка одновременных таймаутов - это один сигнал перегрузки, а не десять
+            now = time.monotonic()
+            if now - self._last_decrease >= self.decrease_interval:
+                self._last_decrease = now
+                self.limit = max(self.limit / 2, self.min_limit)
+        self._wake_waiters()
+    
+    def stats(self) -> dict:
+        return {
+            'limit': round(self.limit, 2),
+            'in_flight': self.in_flight,
+            'queued': len(self._waiters),
+            'rejected': self.rejected
+        }
+    
+    def _wake_waiters(self) -> None:
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(True)
@@ -0,0 +1,109 @@
+"""Второй уровень кэша ответов API на SQLite"""
+import json
+import threading
+import time
+import zlib
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from utils.json_codec import RawJSON
+from utils.sqlite_db import SharedSQLite
+
+
+class DiskCache:
+    """Персистентный кэш сжатых JSON ответов с истечением срока.
+    
+    Файл базы может использоваться несколькими процессами uvicorn на одном
+    хосте: SQLite в режиме WAL допускает параллельное чтение и сериализует
+    запись. Соединение создается отдельно в каждом процессе (после fork).
+    Ответы endpoint'ов из raw_endpoints хранятся исходными байтами и читаются
+    как RawJSON, без разбора.
+    """
+    
+    PURGE_EVERY = 500
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS responses ("
+        " key TEXT PRIMARY KEY,"
+        " endpoint TEXT NOT NULL,"
+        " payload BLOB NOT NULL,"
+        " stored_at REAL NOT NULL,"
+        " expires_at REAL NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS responses_endpoint_stored ON responses (endpoint, stored_at)",
+    )
+    
+    def __init__(self, path: str, ttls: Dict[str, float], compress_level: int = 6,
+                 raw_endpoints: Iterable[str] = ()):
+        self.path = path
+        self.ttls = ttls
+        self.raw_endpoints = set(raw_endpoints)
+        self.compress_level = compress_level
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self._db = SharedSQLite(path, self.SCHEMA)
+        self._lock = threading.Lock()
+    
+    @property
+    def endpoints(self):
+        """Endpoint'ы, ответы которых хранятся в дисковом кэше"""
+        return self.ttls.keys()
+    
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        """Возвращает (значение, сколько секунд оно еще действительно) или None"""
+        now = time.time()
+        with self._lock:
+            row = self._db.connection().execute(
+                "SELECT payload, expires_at, endpoint FROM responses WHERE key = ? AND expires_at > ?",
+                (key, now)
+            ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return self._decode(row[0], row[2]), row[1] - now
+    
+    def set(self, key: str, endpoint: str, value: Any) -> None:
+        """Сохраняет запись с TTL endpoint'а, периодически удаляя истекшие"""
+        body = value.raw if isinstance(value, RawJSON) else json.dumps(value, ensure_ascii=False).encode('utf-8')
+        payload = zlib.compress(body, self.compress_level)
+        now = time.time()
+        with self._lock:
+            conn = self._db.connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, endpoint, payload, stored_at, expires_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, endpoint, payload, now, now + self.ttls[endpoint])
+            )
+            self.writes += 1
+            if self.writes % self.PURGE_EVERY == 0:
+                conn.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+    
+    def load_recent(self, endpoint: str, limit: int) -> List[Tuple[str, Any, float]]:
+        """Последние сохраненные записи endpoint'а для прогрева кэша в памяти"""
+        now = time.time()
+        with self._lock:
+            rows = self._db.connection().execute(
+                "SELECT key, payload, expires_at FROM responses "
+                "WHERE endpoint = ? AND expires_at > ? "
+                "ORDER BY stored_at DESC LIMIT ?",
+                (endpoint, now, limit)
+            ).fetchall()
+        return [(key, self._decode(payload, endpoint), expires_at - now) for key, payload, expires_at in rows]
+    
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+    
+    def stats(self) -> dict:
+        return {
+            'path': self.path,
+            'endpoints': sorted(self.endpoints),
+            'hits': self.hits,
+            'misses': self.misses,
+            'writes': self.writes
+        }
+    
+    def _decode(self, payload: bytes, endpoint: str) -> Any:
+        body = zlib.decompress(payload)
+        if endpoint in self.raw_endpoints:
+            return RawJSON(body)
+        return json.loads(body)
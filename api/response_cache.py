@@ -0,0 +1,205 @@
+"""Кэш ответов API с TTL и LRU-вытеснением по объему памяти"""
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from utils.http_cache import serialize_json, make_etag
+from utils.json_codec import RawJSON
+
+
+def make_cache_key(endpoint: str, payload: Dict) -> str:
+    """Строит канонический ключ запроса из endpoint и нормализованного payload"""
+    canonical = json.dumps(payload, sort_keys=True, ensure_ascii=False,
+                           separators=(',', ':'), default=str)
+    digest = hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+    return f"{endpoint}:{digest}"
+
+
+@dataclass
+class CacheEntry:
+    """Запись кэша"""
+    value: Any
+    expires_at: float
+    stale_until: float
+    keep_until: float
+    size: int
+    etag: Optional[str] = None
+
+
+@dataclass
+class CachedError:
+    """Негативная запись: сохраненная ошибка upstream (например, 404)"""
+    message: str
+
+
+class ResponseCache:
+    """LRU кэш с TTL на каждый endpoint и ограничением по памяти.
+    
+    Для endpoint'ов из stale_ttls запись после истечения TTL еще
+    stale_ttl секунд отдается как устаревшая (stale-while-revalidate).
+    Еще fallback_ttl секунд запись хранится только как запасная: ее отдает
+    get_fallback(), когда upstream недоступен.
+    """
+    
+    def __init__(self, max_bytes: int, ttls: Dict[str, float],
+                 stale_ttls: Optional[Dict[str, float]] = None,
+                 negative_ttls: Optional[Dict[str, float]] = None,
+                 fallback_ttl: float = 0):
+        self.max_bytes = max_bytes
+        self.ttls = ttls
+        self.stale_ttls = stale_ttls or {}
+        self.negative_ttls = negative_ttls or {}
+        self.fallback_ttl = fallback_ttl
+        self.current_bytes = 0
+        self.hits = 0
+        self.stale_hits = 0
+        self.negative_hits = 0
+        self.fallback_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: 'OrderedDict[str, CacheEntry]' = OrderedDict()
+    
+    def get_ttl(self, endpoint: str) -> float:
+        """Возвращает TTL для endpoint (0 - не кэшировать)"""
+        return self.ttls.get(endpoint, 0)
+    
+    def get_negative_ttl(self, endpoint: str) -> float:
+        """Возвращает TTL негативных записей для endpoint (0 - не кэшировать)"""
+        return self.negative_ttls.get(endpoint, 0)
+    
+    @staticmethod
+    def _detach(value: Any) -> Any:
+        """RawJSON отдается и хранится отдельной оберткой над теми же байтами:
+        разобранное потребителем содержимое не остается в кэше сверх учтенного объема"""
+        return RawJSON(value.raw) if isinstance(value, RawJSON) else value
+    
+    def get(self, key: str) -> Optional[Any]:
+        """Возвращает свежее значение из кэша или None"""
+        value, is_stale = self.lookup(key, allow_stale=False)
+        return value
+    
+    def lookup(self, key: str, allow_stale: bool = True) -> Tuple[Optional[Any], bool]:
+        """Возвращает (значение, устарело ли оно) или (None, False)"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None, False
+        
+        now = time.monotonic()
+        if entry.stale_until <= now:
+            if entry.keep_until <= now:
+                self._remove(key)
+            self.misses += 1
+            return None, False
+        
+        is_stale = entry.expires_at <= now
+        if is_stale and not allow_stale:
+            self.misses += 1
+            return None, False
+        
+        self._entries.move_to_end(key)
+        if isinstance(entry.value, CachedError):
+            self.negative_hits += 1
+        elif is_stale:
+            self.stale_hits += 1
+        else:
+            self.hits += 1
+        return self._detach(entry.value), is_stale
+    
+    def get_fallback(self, key: str) -> Optional[Any]:
+        """Последнее успешное значение, даже устаревшее, пока не истек fallback_ttl"""
+        entry = self._entries.get(key)
+        if entry is None or isinstance(entry.value, CachedError) or entry.keep_until <= time.monotonic():
+            return None
+        self.fallback_hits += 1
+        return self._detach(entry.value)
+    
+    def contains(self, key: str) -> bool:
+        """Есть ли свежая запись (без учета в статистике и LRU)"""
+        entry = self._entries.get(key)
+        return entry is not None and entry.expires_at > time.monotonic()
+    
+    def set(self, endpoint: str, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """Сохраняет значение с TTL endpoint'а, вытесняя самые старые записи"""
+        if ttl is None:
+            ttl = self.get_ttl(endpoint)
+        if ttl <= 0 or value is None:
+            return
+        
+        size, etag = self._measure(value)
+        if size > self.max_bytes:
+            return
+        
+        if key in self._entries:
+            self._remove(key)
+        
+        expires_at = time.monotonic() + ttl
+        stale_until = keep_until = expires_at
+        if not isinstance(value, CachedError):
+            stale_until += self.stale_ttls.get(endpoint, 0)
+            keep_until = max(stale_until, expires_at + self.fallback_ttl)
+        
+        self._entries[key] = CacheEntry(value=self._detach(value), expires_at=expires_at, stale_until=stale_until,
+                                        keep_until=keep_until, size=size, etag=etag)
+        self.current_bytes += size
+        
+        while self.current_bytes > self.max_bytes and self._entries:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            self.evictions += 1
+    
+    def get_etag(self, key: str) -> Optional[str]:
+        """ETag сохраненного ответа (без учета в статистике и LRU)"""
+        entry = self._entries.get(key)
+        return entry.etag if entry is not None else None
+    
+    def invalidate(self, key: str) -> None:
+        """Удаляет запись из кэша"""
+        if key in self._entries:
+            self._remove(key)
+    
+    def clear(self) -> None:
+        """Полностью очищает кэш"""
+        self._entries.clear()
+        self.current_bytes = 0
+    
+    def stats(self) -> Dict[str, Any]:
+        """Статистика кэша"""
+        lookups = self.hits + self.stale_hits + self.negative_hits + self.misses
+        served = self.hits + self.stale_hits + self.negative_hits
+        return {
+            'entries': len(self._entries),
+            'bytes': self.current_bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'stale_hits': self.stale_hits,
+            'negative_hits': self.negative_hits,
+            'fallback_hits': self.fallback_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_ratio': round(served / lookups, 4) if lookups else 0.0
+        }
+    
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        self.current_bytes -= entry.size
+    
+    def _measure(self, value: Any) -> Tuple[int, Optional[str]]:
+        """Объем записи и ETag ответа с этим содержимым - по одной сериализации при записи"""
+        if isinstance(value, CachedError):
+            return self._estimate_size(value), None
+        try:
+            body = serialize_json(value)
+        except (TypeError, ValueError):
+            return self._estimate_size(value), None
+        return len(body), make_etag(body)
+    
+    def _estimate_size(self, value: Any) -> int:
+        """Оценивает объем записи по размеру JSON представления"""
+        try:
+            return len(json.dumps(value, ensure_ascii=False, default=str).encode('utf-8'))
+        except (TypeError, ValueError):
+            return self.max_bytes + 1
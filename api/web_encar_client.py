@@ -1,19 +1,136 @@
 # api/web_encar_client.py
-import requests
+import asyncio
+import httpx
 import json
+import time
+from collections.abc import Mapping
 from decouple import config
 from typing import Dict, Any, Optional, List
 
+from api.response_cache import ResponseCache, CachedError, make_cache_key
+from api.disk_cache import DiskCache
+from api.circuit_breaker import CircuitBreaker, AdaptiveLimiter, UpstreamUnavailable
+from utils.json_codec import RawJSON, loads
+from utils.metrics import metrics, error_code
+from utils.profiling import phase
+
+
+class SingleFlight:
+    """Объединяет одновременные одинаковые запросы в один вызов upstream.
+    
+    Вызов выполняется отдельной задачей: отмена одного из ожидающих
+    (например, при обрыве соединения клиентом) не прерывает запрос
+    для остальных. Все ожидающие получают один и тот же результат или ошибку.
+    """
+    
+    def __init__(self):
+        self.calls = 0
+        self.coalesced = 0
+        self._in_flight: Dict[str, asyncio.Task] = {}
+    
+    async def do(self, key: str, factory):
+        """Выполняет factory() или присоединяется к уже выполняющемуся вызову"""
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done, key=key: self._on_done(key, done))
+            self.calls += 1
+        else:
+            self.coalesced += 1
+        
+        return await asyncio.shield(task)
+    
+    def is_in_flight(self, key: str) -> bool:
+        return key in self._in_flight
+    
+    def _on_done(self, key: str, task: asyncio.Task) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # Помечаем исключение как полученное, даже если все ожидающие отменены
+        if not task.cancelled():
+            task.exception()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Статистика объединения запросов"""
+        total = self.calls + self.coalesced
+        return {
+            'upstream_calls': self.calls,
+            'coalesced': self.coalesced,
+            'in_flight': len(self._in_flight),
+            'coalesced_ratio': round(self.coalesced / total, 4) if total else 0.0
+        }
+
+
+def search_total(response) -> Optional[int]:
+    """Число найденных объявлений из ответа simple_search (pagination.filtered_count)"""
+    if not isinstance(response, Mapping):
+        return None
+    pagination = response.get('pagination')
+    total = pagination.get('filtered_count') if isinstance(pagination, Mapping) else None
+    if total is None:
+        total = response.get('total')
+    return total if isinstance(total, int) else None
+
+
 class WebEncarClient:
     def __init__(self):
         self.base_url = config('ENCAR_API_URL', default='https://api-centr.ru/auto_korea')
         self.api_key = config('ENCAR_API_KEY', default='')
+        self.timeout = config('ENCAR_API_TIMEOUT', default=30.0, cast=float)
+        self.max_connections = config('ENCAR_API_MAX_CONNECTIONS', default=50, cast=int)
+        self.max_keepalive_connections = config('ENCAR_API_MAX_KEEPALIVE', default=20, cast=int)
+        self.keepalive_expiry = config('ENCAR_API_KEEPALIVE_EXPIRY', default=30.0, cast=float)
+        self.headers = {}
         self.session = None
+        self.cache = ResponseCache(
+            max_bytes=config('ENCAR_CACHE_MAX_BYTES', default=64 * 1024 * 1024, cast=int),
+            ttls={
+                'simple_search': config('ENCAR_CACHE_TTL_SIMPLE_SEARCH', default=60.0, cast=float),
+                'get_fuel': config('ENCAR_CACHE_TTL_OPTIONS', default=300.0, cast=float),
+                'get_transmission': config('ENCAR_CACHE_TTL_OPTIONS', default=300.0, cast=float),
+                'car_info': config('ENCAR_CACHE_TTL_CAR_INFO', default=300.0, cast=float)
+            },
+            stale_ttls={
+                'car_info': config('ENCAR_CACHE_STALE_CAR_INFO', default=3600.0, cast=float)
+            },
+            negative_ttls={
+                'car_info': config('ENCAR_CACHE_TTL_NOT_FOUND', default=600.0, cast=float)
+            },
+            # Сколько хранить истекшие ответы на случай недоступности API
+            fallback_ttl=config('ENCAR_CACHE_FALLBACK_TTL', default=3600.0, cast=float)
+        )
+        # Ответы этих endpoint'ов не разбираются при получении: роуты-прокси отдают
+        # исходные байты, остальные разбирают тело при первом обращении (RawJSON).
+        # simple_search разбирают почти все потребители, поэтому он по умолчанию не входит
+        self.raw_endpoints = config('ENCAR_RAW_ENDPOINTS', default='car_info',
+                                    cast=lambda v: {e.strip() for e in v.split(',') if e.strip()})
+        self.disk_cache = None
+        disk_cache_path = config('ENCAR_DISK_CACHE_PATH', default='')
+        if disk_cache_path:
+            # car_info хранится на диске долго; остальные endpoint'ы (например,
+            # simple_search для общих кэшей нескольких воркеров) - со своим TTL
+            shared_endpoints = config('ENCAR_DISK_CACHE_ENDPOINTS', default='car_info',
+                                      cast=lambda v: [e.strip() for e in v.split(',') if e.strip()])
+            disk_ttls = {endpoint: self.cache.get_ttl(endpoint) for endpoint in shared_endpoints}
+            disk_ttls['car_info'] = config('ENCAR_DISK_CACHE_TTL', default=86400.0, cast=float)
+            self.disk_cache = DiskCache(disk_cache_path, ttls=disk_ttls, raw_endpoints=self.raw_endpoints)
+        self.single_flight = SingleFlight()
+        self.breaker_failures = config('ENCAR_BREAKER_FAILURES', default=5, cast=int)
+        self.breaker_reset = config('ENCAR_BREAKER_RESET', default=30.0, cast=float)
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.limiter = AdaptiveLimiter(
+            initial=config('ENCAR_LIMITER_INITIAL', default=10, cast=int),
+            min_limit=config('ENCAR_LIMITER_MIN', default=2, cast=int),
+            max_limit=self.max_connections,
+            latency_target=config('ENCAR_LIMITER_LATENCY_TARGET', default=5.0, cast=float),
+            queue_timeout=config('ENCAR_LIMITER_QUEUE_TIMEOUT', default=2.0, cast=float)
+        )
+        self._background_tasks = set()
         self._setup_session()
     
     def _setup_session(self):
-        """Настройка сессии с правильными заголовками"""
-        self.session = requests.Session()
+        """Настройка заголовков сессии"""
         headers = {
             "accept": "application/json",
             "Content-Type": "application/json"
@@ -25,27 +142,241 @@ class WebEncarClient:
         else:
             print("❌ API ключ не найден или невалиден")
         
-        self.session.headers.update(headers)
+        self.headers = headers
+    
+    def _get_session(self) -> httpx.AsyncClient:
+        """Возвращает пул соединений, создавая его при первом обращении.
+        
+        Клиент создается лениво, чтобы привязаться к event loop воркера.
+        Все запросы идут на один хост (base_url), поэтому лимиты пула
+        являются лимитами соединений на хост.
+        """
+        if self.session is None or self.session.is_closed:
+            self.session = httpx.AsyncClient(
+                headers=self.headers,
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive_connections,
+                    keepalive_expiry=self.keepalive_expiry
+                )
+            )
+        return self.session
+    
+    async def aclose(self):
+        """Закрывает пул соединений и файл дискового кэша"""
+        if self.session is not None and not self.session.is_closed:
+            await self.session.aclose()
+        self.session = None
+        if self.disk_cache is not None:
+            self.disk_cache.close()
+    
+    async def warm_from_disk(self, limit: int = 500) -> int:
+        """Прогревает кэш в памяти последними записями дискового кэша"""
+        if self.disk_cache is None:
+            return 0
+        
+        loaded = 0
+        for endpoint in self.disk_cache.endpoints:
+            try:
+                entries = await asyncio.to_thread(self.disk_cache.load_recent, endpoint, limit)
+            except Exception as e:
+                print(f"Disk cache warmup error: {e}")
+                continue
+            for key, value, remaining in entries:
+                self.cache.set(endpoint, key, value, ttl=min(self.cache.get_ttl(endpoint), remaining))
+                loaded += 1
+        
+        print(f"✅ Кэш прогрет с диска: {loaded} записей")
+        return loaded
     
     def _has_valid_api_key(self) -> bool:
         """Проверяет валидность API ключа"""
         invalid_keys = ['', 'your_encar_api_key_here', 'test', 'demo']
         return bool(self.api_key and self.api_key not in invalid_keys)
     
-    def _make_api_request(self, endpoint: str, payload: Dict) -> Optional[Dict]:
+    async def _make_api_request(self, endpoint: str, payload: Dict, use_cache: bool = True,
+                                store: bool = True) -> Optional[Dict]:
+        """Выполняет API запрос через кэш ответов и single-flight.
+        
+        При use_cache=False кэш не читается, но свежий ответ в него записывается.
+        При store=False кэш не используется вовсе: так обходы всего каталога
+        (выгрузка) не вытесняют из LRU записи пользовательских запросов.
+        Устаревшая (stale) запись отдается сразу, а обновляется в фоне.
+        Одновременные запросы с одинаковым ключом разделяют один вызов upstream.
+        """
+        request_key = make_cache_key(endpoint, payload)
+        cacheable = store and self.cache.get_ttl(endpoint) > 0
+        
+        if cacheable and use_cache:
+            cached = self._lookup_cached(endpoint, payload, request_key)
+            if cached is not None:
+                return cached
+        
+        try:
+            with phase('upstream'):
+                return await self.single_flight.do(
+                    request_key,
+                    lambda: self._fetch_and_store(endpoint, payload, request_key, cacheable, use_disk=use_cache)
+                )
+        except Exception as e:
+            # API недоступен - отдаем последний сохраненный ответ, если он есть
+            if cacheable and use_cache and self._is_upstream_failure(e):
+                fallback = self.cache.get_fallback(request_key)
+                if fallback is not None:
+                    return fallback
+            raise
+    
+    def _lookup_cached(self, endpoint: str, payload: Dict, request_key: str) -> Optional[Dict]:
+        """Ответ из кэша в памяти (устаревший обновляется в фоне); закэшированная ошибка пробрасывается"""
+        cached, is_stale = self.cache.lookup(request_key)
+        if cached is None:
+            return None
+        if is_stale:
+            self._revalidate(endpoint, payload, request_key)
+        if isinstance(cached, CachedError):
+            raise Exception(cached.message)
+        return cached
+    
+    async def _fetch_and_store(self, endpoint: str, payload: Dict, request_key: str,
+                               cacheable: bool, use_disk: bool = True) -> Optional[Dict]:
+        """Запрашивает дисковый кэш или upstream и сохраняет ответ (или ошибку 404) в кэш"""
+        disk_cacheable = cacheable and self.disk_cache is not None and endpoint in self.disk_cache.endpoints
+        
+        if disk_cacheable and use_disk:
+            stored = await self._disk_get(request_key)
+            if stored is not None:
+                value, remaining = stored
+                self.cache.set(endpoint, request_key, value,
+                               ttl=min(self.cache.get_ttl(endpoint), remaining))
+                return value
+        
+        try:
+            result = await self._send_request(endpoint, payload)
+        except Exception as e:
+            if cacheable and "API_ERROR_404" in str(e):
+                self.cache.set(endpoint, request_key, CachedError(str(e)),
+                               ttl=self.cache.get_negative_ttl(endpoint))
+            raise
+        
+        if cacheable:
+            ttl = None
+            if isinstance(result, Mapping) and result.get('status', 'success') != 'success':
+                if not self._is_not_found(result):
+                    # Прочие ошибки API могут быть временными - не кэшируем
+                    return result
+                # Ответ "не найдено" кэшируем коротко и без stale-окна
+                ttl = self.cache.get_negative_ttl(endpoint)
+            self.cache.set(endpoint, request_key, result, ttl=ttl)
+            if disk_cacheable and ttl is None:
+                await self._disk_set(request_key, endpoint, result)
+        return result
+    
+    @staticmethod
+    def _is_not_found(result: Mapping) -> bool:
+        """Неуспешный ответ 200 явно сообщает, что объекта нет"""
+        code = str(result.get('error') or result.get('code') or '').upper()
+        if code in ('NOT_FOUND', '404', 'API_ERROR_404'):
+            return True
+        return 'not found' in str(result.get('message') or '').lower()
+    
+    async def _disk_get(self, request_key: str) -> Optional[tuple]:
+        try:
+            return await asyncio.to_thread(self.disk_cache.get, request_key)
+        except Exception as e:
+            print(f"Disk cache read error: {e}")
+            return None
+    
+    async def _disk_set(self, request_key: str, endpoint: str, value: Dict) -> None:
+        try:
+            await asyncio.to_thread(self.disk_cache.set, request_key, endpoint, value)
+        except Exception as e:
+            print(f"Disk cache write error: {e}")
+    
+    def _revalidate(self, endpoint: str, payload: Dict, request_key: str) -> None:
+        """Фоновое обновление устаревшей записи (не более одного на ключ)"""
+        async def refresh():
+            try:
+                await self.single_flight.do(
+                    request_key,
+                    lambda: self._fetch_and_store(endpoint, payload, request_key, True, use_disk=False)
+                )
+            except Exception as e:
+                print(f"Background refresh error ({endpoint}): {e}")
+        
+        if self.single_flight.is_in_flight(request_key):
+            return
+        task = asyncio.ensure_future(refresh())
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+    
+    async def _send_request(self, endpoint: str, payload: Dict) -> Optional[Dict]:
         """Выполняет API запрос с обработкой ошибок"""
         if not self._has_valid_api_key():
             raise Exception("API_KEY_NOT_CONFIGURED: Не настроен API ключ. Проверьте файл .env")
         
+        breaker = self._get_breaker(endpoint)
+        if not breaker.allow():
+            raise UpstreamUnavailable(f"API_CIRCUIT_OPEN: API ({endpoint}) временно недоступен",
+                                      breaker.retry_after())
+        if not await self.limiter.acquire():
+            breaker.release_probe()
+            raise UpstreamUnavailable("API_OVERLOADED: Превышен лимит одновременных запросов к API", 1.0)
+        
+        labels = (endpoint,)
+        started = metrics.upstream.begin(labels)
+        failed = False
+        try:
+            result = await self._post(endpoint, payload)
+        except Exception as e:
+            metrics.upstream.error(labels, error_code(str(e)))
+            failed = self._is_upstream_failure(e)
+            if failed:
+                breaker.record_failure()
+            else:
+                # API ответил (404, 401 и т.п.) - значит, он доступен
+                breaker.record_success()
+            raise
+        else:
+            breaker.record_success()
+            return result
+        finally:
+            # Если запрос отменен, пробный слот автомата освобождается без оценки
+            breaker.release_probe()
+            metrics.upstream.end(labels, started)
+            self.limiter.release(time.perf_counter() - started, success=not failed)
+    
+    def _get_breaker(self, endpoint: str) -> CircuitBreaker:
+        breaker = self.breakers.get(endpoint)
+        if breaker is None:
+            breaker = self.breakers[endpoint] = CircuitBreaker(
+                endpoint, failure_threshold=self.breaker_failures, reset_timeout=self.breaker_reset
+            )
+        return breaker
+    
+    @staticmethod
+    def _is_upstream_failure(error: Exception) -> bool:
+        """Сбой на стороне API (таймаут, соединение, 5xx, 429), а не ответ об ошибке запроса"""
+        if isinstance(error, UpstreamUnavailable):
+            return True
+        code = error_code(str(error))
+        if code in ('API_TIMEOUT', 'API_CONNECTION_ERROR', 'API_REQUEST_ERROR'):
+            return True
+        return code.startswith('API_ERROR_') and (code[10:] == '429' or code[10:11] == '5')
+    
+    async def _post(self, endpoint: str, payload: Dict) -> Optional[Dict]:
         try:
-            response = self.session.post(
+            response = await self._get_session().post(
                 f"{self.base_url}/{endpoint}", 
-                json=payload,
-                timeout=30
+                json=payload
             )
             
             if response.status_code == 200:
-                return response.json()
+                content = response.content
+                if endpoint in self.raw_endpoints and content.lstrip().startswith(b'{'):
+                    return RawJSON(content)
+                with phase('parse'):
+                    return loads(content)
             elif response.status_code == 401:
                 raise Exception("API_KEY_INVALID: Неверный API ключ")
             elif response.status_code == 403:
@@ -53,62 +384,83 @@ class WebEncarClient:
             else:
                 raise Exception(f"API_ERROR_{response.status_code}: {response.text}")
                 
-        except requests.exceptions.Timeout:
+        except httpx.TimeoutException:
             raise Exception("API_TIMEOUT: Превышено время ожидания ответа от API")
-        except requests.exceptions.ConnectionError:
+        except httpx.TransportError:
             raise Exception("API_CONNECTION_ERROR: Ошибка подключения к API")
         except Exception as e:
             if "API_KEY" in str(e):
                 raise e
             raise Exception(f"API_REQUEST_ERROR: {str(e)}")
     
-    def simple_search(self, car_data=None, pagination=None, filters=None, sorting=None) -> Dict[str, Any]:
+    async def simple_search(self, car_data=None, pagination=None, filters=None, sorting=None,
+                            use_cache: bool = True, store: bool = True) -> Dict[str, Any]:
         """Упрощенный поиск с пагинацией, фильтрами и сортировкой"""
-        # Значения по умолчанию
-        car_data = car_data or {}
-        pagination = pagination or {"limit": 20, "offset": 0}
-        filters = filters or {}
-        sorting = sorting or {"sort_order": "price", "sort_direction": "ASC"}
+        payload = self._build_search_payload(car_data, pagination, filters, sorting)
         
-        # Формирование payload
+        # Выполнение API запроса
+        return await self._make_api_request("simple_search", payload, use_cache, store)
+    
+    def search_cache_key(self, car_data=None, pagination=None, filters=None, sorting=None) -> str:
+        """Ключ кэша, под которым будет сохранен ответ simple_search"""
+        payload = self._build_search_payload(car_data, pagination, filters, sorting)
+        return make_cache_key("simple_search", payload)
+    
+    def _build_search_payload(self, car_data, pagination, filters, sorting) -> Dict[str, Any]:
+        """Формирует payload simple_search со значениями по умолчанию"""
+        return {
+            "car_data": car_data or {},
+            "pagination": pagination or {"limit": 20, "offset": 0},
+            "filters": self._clean_filters(filters or {}),
+            "sorting": sorting or {"sort_order": "price", "sort_direction": "ASC"}
+        }
+    
+    async def get_car_details(self, car_id: int, lang: str = "eng", use_cache: bool = True) -> Dict[str, Any]:
+        """Получение деталей автомобиля (кэшируется по car_id и lang)"""
         payload = {
-            "car_data": car_data,
-            "pagination": pagination,
-            "filters": self._clean_filters(filters),
-            "sorting": sorting
+            "car_id": car_id,
+            "lang": lang
         }
         
-        # Выполнение API запроса
-        return self._make_api_request("simple_search", payload)
+        return await self._make_api_request("car_info", payload, use_cache)
+    
+    def car_details_etag(self, car_id: int, lang: str = "eng") -> Optional[str]:
+        """ETag закэшированных деталей автомобиля (вычислен при записи в кэш)"""
+        return self.cache.get_etag(make_cache_key("car_info", {"car_id": car_id, "lang": lang}))
     
-    def get_car_details(self, car_id: int, lang: str = "eng") -> Dict[str, Any]:
-        """Получение деталей автомобиля"""
+    def peek_car_details(self, car_id: int, lang: str = "eng") -> Optional[Dict[str, Any]]:
+        """Детали автомобиля только из кэша в памяти, без обращения к API; None - промах"""
         payload = {
             "car_id": car_id,
             "lang": lang
         }
-        
-        return self._make_api_request("car_info", payload)
+        return self._lookup_cached("car_info", payload, make_cache_key("car_info", payload))
     
-    def get_available_fuels(self, car_data: Dict) -> Optional[Dict]:
+    async def get_available_fuels(self, car_data: Dict, use_cache: bool = True) -> Optional[Dict]:
         """Получает доступные варианты топлива для выбранных параметров"""
         try:
             # Всегда используем прямой запрос к API с правильным форматом
-            return self._get_available_options("get_fuel", car_data, "fuels")
+            return await self._get_available_options("get_fuel", car_data, "fuels", use_cache)
+        except UpstreamUnavailable:
+            # Роуты отвечают на это 503 с Retry-After
+            raise
         except Exception as e:
             print(f"Error getting fuel types: {e}")
             return None
 
-    def get_available_transmissions(self, car_data: Dict) -> Optional[Dict]:
+    async def get_available_transmissions(self, car_data: Dict, use_cache: bool = True) -> Optional[Dict]:
         """Получает доступные варианты трансмиссии для выбранных параметров"""
         try:
             # Всегда используем прямой запрос к API с правильным форматом  
-            return self._get_available_options("get_transmission", car_data, "transmissions")
+            return await self._get_available_options("get_transmission", car_data, "transmissions", use_cache)
+        except UpstreamUnavailable:
+            raise
         except Exception as e:
             print(f"Error getting transmission types: {e}")
             return None
     
-    def _get_available_options(self, endpoint: str, car_data: Dict, option_type: str) -> Optional[Dict]:
+    async def _get_available_options(self, endpoint: str, car_data: Dict, option_type: str,
+                                     use_cache: bool = True) -> Optional[Dict]:
         """Общий метод для получения доступных опций"""
         # Преобразуем car_data в формат который ожидает API
         clean_car_data = self._clean_filters(car_data)
@@ -123,7 +475,7 @@ class WebEncarClient:
         # Очищаем от None значений
         payload = {k: v for k, v in payload.items() if v and v[0] is not None}
         
-        return self._make_api_request(endpoint, payload)
+        return await self._make_api_request(endpoint, payload, use_cache)
     
     def _clean_filters(self, filters: Dict) -> Dict:
         """Очистка фильтров от пустых значений"""
@@ -149,14 +501,15 @@ class WebEncarClient:
             return False
         return True
     
-    def check_api_health(self) -> Dict[str, Any]:
+    async def check_api_health(self, use_cache: bool = True) -> Dict[str, Any]:
         """Проверка доступности API и валидности ключа"""
         try:
             # Простой запрос для проверки
-            test_response = self.simple_search(
+            test_response = await self.simple_search(
                 car_data={},
                 pagination={"limit": 1, "offset": 0},
-                filters={}
+                filters={},
+                use_cache=use_cache
             )
             return {
                 "status": "success",
@@ -168,4 +521,4 @@ class WebEncarClient:
                 "status": "error",
                 "message": str(e),
                 "data": None
-            }
\ No newline at end of file
+            }
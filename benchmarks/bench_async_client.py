@@ -0,0 +1,93 @@
+"""Бенчмарк пропускной способности при конкурентных запросах
+
+Поднимает заглушку upstream и приложение (одним воркером uvicorn),
+после чего отправляет конкурентные запросы к /example/api/car/{id}.
+
+Запуск:
+    python benchmarks/bench_async_client.py --app-dir . --requests 200 --concurrency 50
+
+Для сравнения "до/после" укажите --app-dir с другой ревизией репозитория
+(например, git worktree).
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+from common import percentile, wait_ready
+from stub_upstream import stub_command
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+async def _run_load(app_url: str, total: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+    
+    async with httpx.AsyncClient(timeout=120, limits=httpx.Limits(max_connections=concurrency)) as client:
+        async def one(i: int):
+            nonlocal errors
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.get(f"{app_url}/example/api/car/{i}")
+                latencies.append(time.perf_counter() - started)
+                if response.status_code != 200:
+                    errors += 1
+        
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        elapsed = time.perf_counter() - started
+    
+    latencies.sort()
+    return {
+        'requests': total,
+        'errors': errors,
+        'elapsed': elapsed,
+        'rps': total / elapsed,
+        'p50': percentile(latencies, 50),
+        'p95': percentile(latencies, 95)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--app-dir', default=os.path.dirname(BENCH_DIR))
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0.2)
+    parser.add_argument('--stub-port', type=int, default=8900)
+    parser.add_argument('--app-port', type=int, default=8901)
+    args = parser.parse_args()
+    
+    stub_url = f"http://127.0.0.1:{args.stub_port}"
+    app_url = f"http://127.0.0.1:{args.app_port}"
+    env = dict(os.environ, ENCAR_API_URL=stub_url, ENCAR_API_KEY='bench-key')
+    
+    stub = subprocess.Popen(stub_command(args.stub_port, latency=args.latency))
+    app = subprocess.Popen([sys.executable, '-m', 'uvicorn', 'main:app', '--port', str(args.app_port),
+                            '--log-level', 'warning'], cwd=args.app_dir, env=env,
+                           stdout=subprocess.DEVNULL)
+    try:
+        asyncio.run(wait_ready(f"{stub_url}/"))
+        asyncio.run(wait_ready(f"{app_url}/example/docs"))
+        result = asyncio.run(_run_load(app_url, args.requests, args.concurrency))
+    finally:
+        app.terminate()
+        stub.terminate()
+        app.wait()
+        stub.wait()
+    
+    print(f"app-dir={args.app_dir} upstream latency={args.latency}s "
+          f"concurrency={args.concurrency}")
+    print(f"  requests={result['requests']} errors={result['errors']} "
+          f"elapsed={result['elapsed']:.2f}s rps={result['rps']:.1f} "
+          f"p50={result['p50'] * 1000:.0f}ms p95={result['p95'] * 1000:.0f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""Бенчмарк сжатия ответов: GZipMiddleware на каждый запрос против сжатия один раз
+
+Поднимает в памяти приложение с тем же GZipMiddleware, что и main.py, и отдает
+одинаковые ответы (детали автомобиля, страницу каталога, HTML карточки) двумя
+способами: несжатое тело, которое GZip сжимает на каждый запрос, и
+cached_json_response / compress_response с кэшем сжатых тел по ETag.
+Для каждого способа выводит байты на проводе, экономию и CPU на запрос.
+
+Запуск:
+    python benchmarks/bench_compression.py --requests 500 --cars 500
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+os.chdir(ROOT_DIR)
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import Response
+from fastapi.templating import Jinja2Templates
+
+from services.currency_service import CurrencyService
+from utils.assets import setup_template_globals
+from utils.compression import MIN_SIZE, GZIP_LEVEL, body_cache, compress_response
+from utils.http_cache import cached_json_response, make_etag, serialize_json
+
+FIXTURES_DIR = os.path.join(ROOT_DIR, 'benchmarks', 'fixtures')
+
+
+def load_payloads(cars: int) -> dict:
+    with open(os.path.join(FIXTURES_DIR, 'car_info.json'), encoding='utf-8') as file:
+        car_info = json.load(file)
+    with open(os.path.join(FIXTURES_DIR, 'simple_search.json'), encoding='utf-8') as file:
+        search = json.load(file)
+    page = dict(search)
+    # Разные id, цены и пробеги, чтобы страница не сжималась как повтор одной записи
+    page['cars'] = [
+        dict(search['cars'][i % len(search['cars'])], car_id=30000000 + i * 7919,
+             price=1000 + (i * 37) % 9000, mileage=(i * 7331) % 250000)
+        for i in range(cars)
+    ]
+    return {'car_details': car_info, f'catalog_{cars}': page}
+
+
+def create_app(payloads: dict, gzip_level: int) -> FastAPI:
+    templates = Jinja2Templates(directory='templates')
+    setup_template_globals(templates)
+    # ETag в проде приходит из кэша ответов API - считаем его заранее
+    etags = {name: make_etag(serialize_json(payload)) for name, payload in payloads.items()}
+    page_context = {'car_id': 1, 'exchange_rates': CurrencyService.get_rates()}
+    app = FastAPI()
+    app.add_middleware(GZipMiddleware, minimum_size=MIN_SIZE, compresslevel=gzip_level)
+    
+    @app.get('/per-request/{name}')
+    async def per_request(request: Request, name: str):
+        if name == 'car_page':
+            return templates.TemplateResponse(request, 'car_details.html', page_context)
+        return Response(serialize_json(payloads[name]), media_type='application/json')
+    
+    @app.get('/once/{name}')
+    async def once(request: Request, name: str):
+        if name == 'car_page':
+            return compress_response(request, templates.TemplateResponse(request, 'car_details.html', page_context))
+        return cached_json_response(request, payloads[name], 'car', etag=etags[name])
+    
+    return app
+
+
+async def measure(app: FastAPI, path: str, requests: int) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+        headers = {'Accept-Encoding': 'gzip'}
+        first = await client.get(path, headers=headers)
+        first.raise_for_status()
+        started_cpu = time.process_time()
+        for _ in range(requests):
+            response = await client.get(path, headers=headers)
+        elapsed_cpu = time.process_time() - started_cpu
+    return {
+        'raw': len(response.content),
+        'wire': int(response.headers['content-length']),
+        'cpu_us': elapsed_cpu / requests * 1e6
+    }
+
+
+async def run(requests: int, cars: int, gzip_level: int):
+    payloads = load_payloads(cars)
+    names = list(payloads) + ['car_page']
+    modes = [
+        ('GZip level 9 (прежний main.py)', create_app(payloads, 9), 'per-request'),
+        (f'GZip level {gzip_level} (некэшируемые)', create_app(payloads, gzip_level), 'per-request'),
+        ('сжатие один раз', create_app(payloads, gzip_level), 'once'),
+    ]
+    print(f"{requests} запросов на ответ, Accept-Encoding: gzip")
+    print(f"{'ответ':<14} {'способ':<32} {'байт':>8} {'на проводе':>11} {'экономия':>9} {'CPU мкс/запрос':>15}")
+    for name in names:
+        baseline = None
+        for title, app, prefix in modes:
+            result = await measure(app, f'/{prefix}/{name}', requests)
+            baseline = baseline or result['cpu_us']
+            saved = 1 - result['wire'] / result['raw']
+            print(f"{name:<14} {title:<32} {result['raw']:>8} {result['wire']:>11} {saved:>8.1%} "
+                  f"{result['cpu_us']:>9.0f} ({result['cpu_us'] / baseline:.2f}x)")
+    print(f"Кэш сжатых тел: {json.dumps(body_cache.stats(), ensure_ascii=False)}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--cars', type=int, default=500, help='автомобилей на странице каталога')
+    parser.add_argument('--gzip-level', type=int, default=GZIP_LEVEL, help='уровень GZip для некэшируемых ответов')
+    args = parser.parse_args()
+    asyncio.run(run(args.requests, args.cars, args.gzip_level))
+
+
+if __name__ == '__main__':
+    main()
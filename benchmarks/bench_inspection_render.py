@@ -0,0 +1,106 @@
+"""Микро-бенчмарк генерации и рендеринга отчета осмотра
+
+Строит синтетический большой checkup и измеряет время
+InspectionGenerator.generate_report + рендеринга inspection/report_ru.html.
+
+Запуск:
+    python benchmarks/bench_inspection_render.py --systems 40 --items 30 --outers 400
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+os.chdir(ROOT_DIR)
+
+from fastapi.templating import Jinja2Templates
+
+from utils.inspection_generator import InspectionGenerator
+from utils.damage_coordinates import DAMAGE_COLORS, DAMAGE_COORDINATES
+
+STATUS_TYPES = [
+    {'code': 'W', 'title': 'Sheet metal/welding'},
+    {'code': 'X', 'title': 'Exchange (replacement)'},
+    {'code': 'C', 'title': 'Corrosion'},
+    {'code': 'A', 'title': 'Scratch'},
+    {'code': 'U', 'title': 'Dent'},
+]
+
+
+def build_car_data(systems: int, items: int, outers: int) -> dict:
+    point_codes = list(DAMAGE_COORDINATES.keys())
+    return {
+        'status': 'success',
+        'data': {
+            'info': {
+                'spec': {'mileage': 123456, 'transmissionName': 'Auto', 'fuelName': 'Gasoline'},
+                'category': {'manufacturerName': 'Hyundai', 'modelGroupName': 'Grandeur',
+                             'gradeName': 'Premium', 'formYear': 2020}
+            },
+            'open_data': {'accidentCnt': 2},
+            'checkup': {
+                'master': {
+                    'registrationDate': '2024-05-01',
+                    'detail': {'vin': 'KMHXX00XXXX000000', 'inspName': 'Inspector <&>',
+                               'firstRegistrationDate': '20200101'}
+                },
+                'inners': [
+                    {
+                        'type': {'code': f'S{s:02d}', 'title': f'System {s}'},
+                        'children': [
+                            {'type': {'title': f'Element {s}.{i} <b>'},
+                             'statusType': {'code': 'GOOD', 'title': 'Good'}}
+                            for i in range(items)
+                        ]
+                    }
+                    for s in range(systems)
+                ],
+                'outers': [
+                    {'type': {'code': point_codes[n % len(point_codes)], 'title': f'Part {n}'},
+                     'statusTypes': [STATUS_TYPES[n % len(STATUS_TYPES)]]}
+                    for n in range(outers)
+                ]
+            }
+        }
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--systems', type=int, default=40)
+    parser.add_argument('--items', type=int, default=30)
+    parser.add_argument('--outers', type=int, default=400)
+    parser.add_argument('--rounds', type=int, default=50)
+    args = parser.parse_args()
+    
+    car_data = build_car_data(args.systems, args.items, args.outers)
+    generator = InspectionGenerator()
+    template = Jinja2Templates(directory='templates').get_template('inspection/report_ru.html')
+    
+    # Прогрев (компиляция шаблона)
+    template.render(report_data=generator.generate_report(car_data, 'ru'), DAMAGE_COLORS=DAMAGE_COLORS)
+    
+    generate_times, render_times = [], []
+    size = 0
+    for _ in range(args.rounds):
+        started = time.perf_counter()
+        report_data = generator.generate_report(car_data, 'ru')
+        generated = time.perf_counter()
+        html = template.render(report_data=report_data, DAMAGE_COLORS=DAMAGE_COLORS)
+        rendered = time.perf_counter()
+        generate_times.append(generated - started)
+        render_times.append(rendered - generated)
+        size = len(html)
+    
+    total = [g + r for g, r in zip(generate_times, render_times)]
+    print(f"systems={args.systems} items={args.items} outers={args.outers} html={size // 1024} KB")
+    print(f"  generate: median {statistics.median(generate_times) * 1000:.2f} ms")
+    print(f"  render:   median {statistics.median(render_times) * 1000:.2f} ms")
+    print(f"  total:    median {statistics.median(total) * 1000:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+"""Бенчмарк JSON пути ответов API: разбор и сериализация против передачи байтов
+
+Прогоняет запросы через приложение (main.app) с upstream в памяти
+(httpx.MockTransport), каждый запрос - промах кэша, то есть полный путь
+"ответ API -> клиент". Сравнивает CPU на запрос:
+  - прокси-роут /example/api/car/{id}: разбор + сериализация stdlib json
+    (прежний путь), то же через orjson и передача исходных байтов (RawJSON);
+  - изменяющий роут /example/api/catalog/cars (добавление price_rub):
+    stdlib json против orjson.
+
+Запуск:
+    python benchmarks/bench_json_path.py --size-kb 200 --requests 300
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+os.chdir(ROOT_DIR)
+
+import httpx
+
+import utils.json_codec as json_codec
+from benchmarks.bench_inspection_render import build_car_data
+from main import app
+from services.catalog_service import encar_client, listing_snapshot
+
+FIXTURES_DIR = os.path.join(ROOT_DIR, 'benchmarks', 'fixtures')
+
+
+def build_car_info(target_bytes: int) -> bytes:
+    """Детали автомобиля из фикстуры с синтетическим checkup нужного объема"""
+    with open(os.path.join(FIXTURES_DIR, 'car_info.json'), encoding='utf-8') as file:
+        car_info = json.load(file)
+    outers = 50
+    while True:
+        checkup = build_car_data(systems=20, items=15, outers=outers)['data']['checkup']
+        payload = {**car_info, 'data': {**car_info['data'], 'checkup': checkup}}
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        if len(body) >= target_bytes:
+            return body
+        outers = int(outers * target_bytes / len(body)) + 1
+
+
+def build_search_page(target_bytes: int) -> bytes:
+    """Страница simple_search из фикстуры, размноженная до нужного объема"""
+    with open(os.path.join(FIXTURES_DIR, 'simple_search.json'), encoding='utf-8') as file:
+        search = json.load(file)
+    cars = []
+    page = dict(search, cars=cars)
+    while len(json.dumps(page, ensure_ascii=False).encode('utf-8')) < target_bytes:
+        for car in search['cars']:
+            cars.append(dict(car, car_id=30000000 + len(cars), price=1000 + len(cars) % 9000))
+    return json.dumps(page, ensure_ascii=False).encode('utf-8')
+
+
+def install_upstream(car_info: bytes, search_page: bytes):
+    def handler(request: httpx.Request) -> httpx.Response:
+        endpoint = request.url.path.rsplit('/', 1)[-1]
+        return httpx.Response(200, content=car_info if endpoint == 'car_info' else search_page,
+                              headers={'Content-Type': 'application/json'})
+    
+    encar_client.api_key = encar_client.api_key or 'benchmark-key'
+    encar_client.session = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+async def measure(path: str, method: str, requests: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+        # identity - замеряется JSON путь, а не сжатие ответа
+        headers = {'Accept-Encoding': 'identity'}
+        body = {'car_data': {}, 'pagination': {'limit': 20, 'offset': 0}}
+        total = 0.0
+        for i in range(requests + 1):
+            encar_client.cache.clear()
+            started = time.process_time()
+            if method == 'GET':
+                response = await client.get(path, headers=headers)
+            else:
+                response = await client.post(path, json=body, headers=headers)
+            if i:
+                total += time.process_time() - started
+            response.raise_for_status()
+    return total / requests * 1e6
+
+
+async def run(size_kb: int, requests: int):
+    car_info = build_car_info(size_kb * 1024)
+    search_page = build_search_page(size_kb * 1024)
+    install_upstream(car_info, search_page)
+    listing_snapshot.enabled = False
+    orjson = json_codec.orjson
+    raw_endpoints = encar_client.raw_endpoints
+    
+    def configure(use_orjson: bool, passthrough: bool):
+        json_codec.orjson = orjson if use_orjson else None
+        encar_client.raw_endpoints = raw_endpoints if passthrough else set()
+    
+    cases = [
+        ('car', 'GET', '/example/api/car/1', len(car_info), [
+            ('json: разбор + сериализация', False, False),
+            ('orjson: разбор + сериализация', True, False),
+            ('передача байтов (RawJSON)', True, True),
+        ]),
+        ('catalog/cars', 'POST', '/example/api/catalog/cars', len(search_page), [
+            ('json', False, True),
+            ('orjson', True, True),
+        ]),
+    ]
+    print(f"{requests} запросов, каждый - промах кэша; orjson: {'есть' if orjson else 'нет'}")
+    print(f"{'роут':<14} {'байт':>8} {'способ':<32} {'CPU мкс/запрос':>15}")
+    for name, method, path, size, modes in cases:
+        baseline = None
+        for title, use_orjson, passthrough in modes:
+            if use_orjson and orjson is None:
+                continue
+            configure(use_orjson, passthrough)
+            cpu_us = await measure(path, method, requests)
+            baseline = baseline or cpu_us
+            print(f"{name:<14} {size:>8} {title:<32} {cpu_us:>9.0f} ({cpu_us / baseline:.2f}x)")
+    configure(True, True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size-kb', type=int, default=200, help='объем ответа API')
+    parser.add_argument('--requests', type=int, default=300)
+    args = parser.parse_args()
+    asyncio.run(run(args.size_kb, args.requests))
+
+
+if __name__ == '__main__':
+    main()
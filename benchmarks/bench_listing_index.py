@@ -0,0 +1,98 @@
+"""Бенчмарк локального индекса объявлений
+
+Строит ListingIndex на синтетических объявлениях и измеряет время построения
+и задержку запросов (p50/p95) для типовых фильтров и сортировок каталога.
+
+Запуск:
+    python benchmarks/bench_listing_index.py --listings 100000 1000000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from benchmarks.common import percentile
+from services.listing_index import ListingIndex
+
+MANUFACTURERS = {
+    f'Manufacturer {m}': {f'Group {m}.{g}': [f'Model {m}.{g}.{n}' for n in range(4)] for g in range(8)}
+    for m in range(30)
+}
+FUELS = ['Gasoline', 'Diesel', 'LPG', 'Hybrid', 'Electric']
+TRANSMISSIONS = ['Auto', 'Manual', 'CVT']
+
+QUERIES = {
+    'root, price ASC': ({}, {}, {'sort_order': 'price', 'sort_direction': 'ASC'}),
+    'manufacturer, year DESC': ({'manufacturer': 'Manufacturer 3'}, {},
+                                {'sort_order': 'year', 'sort_direction': 'DESC'}),
+    'model group + price range': ({'manufacturer': 'Manufacturer 3', 'modelgroup': 'Group 3.2'},
+                                  {'price_min': 1000, 'price_max': 3000},
+                                  {'sort_order': 'price', 'sort_direction': 'ASC'}),
+    'root + year/mileage + fuel': ({}, {'year_min': 2018, 'mileage_max': 80000, 'fuel': ['Diesel', 'Hybrid']},
+                                   {'sort_order': 'mileage', 'sort_direction': 'ASC'}),
+    'deep page': ({'manufacturer': 'Manufacturer 7'}, {},
+                  {'sort_order': 'price', 'sort_direction': 'DESC'}),
+}
+
+
+def build_cars(count: int, seed: int = 1) -> list:
+    rng = random.Random(seed)
+    manufacturers = list(MANUFACTURERS)
+    cars = []
+    for car_id in range(count):
+        manufacturer = rng.choice(manufacturers)
+        group = rng.choice(list(MANUFACTURERS[manufacturer]))
+        year = rng.randint(2005, 2025)
+        cars.append({
+            'car_id': 40_000_000 + car_id,
+            'manufacturer': manufacturer,
+            'model_group': group,
+            'model': rng.choice(MANUFACTURERS[manufacturer][group]),
+            'fuel_type': rng.choice(FUELS),
+            'transmission': rng.choice(TRANSMISSIONS),
+            'price': rng.randint(300, 15000),
+            'year': year * 100 + rng.randint(1, 12),
+            'form_year': year,
+            'mileage': rng.randint(0, 300000),
+        })
+    return cars
+
+
+def run(count: int, rounds: int):
+    cars = build_cars(count)
+    started = time.perf_counter()
+    index = ListingIndex(cars)
+    build = time.perf_counter() - started
+    print(f"listings={count} build={build:.2f} s")
+    
+    for name, (car_data, filters, sorting) in QUERIES.items():
+        offset = 2000 if name == 'deep page' else 0
+        pagination = {'limit': 20, 'offset': offset}
+        timings = []
+        total = 0
+        for _ in range(rounds):
+            started = time.perf_counter()
+            response = index.query(car_data, filters, sorting, pagination)
+            timings.append(time.perf_counter() - started)
+            total = response['total']
+        timings.sort()
+        print(f"  {name:<28} total={total:<8} p50 {percentile(timings, 50) * 1000:7.2f} ms"
+              f"  p95 {percentile(timings, 95) * 1000:7.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--listings', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--rounds', type=int, default=50)
+    args = parser.parse_args()
+    
+    for count in args.listings:
+        run(count, args.rounds)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""Нагрузочный тест масштабирования по числу воркеров
+
+Поднимает заглушку upstream, затем для каждого числа воркеров запускает
+serve.py и нагружает смесь роутов (JSON каталога, детали автомобиля,
+отчет осмотра) из нескольких процессов-генераторов нагрузки.
+
+Запуск:
+    python benchmarks/bench_workers.py --workers 1 2 4 --duration 10
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from common import wait_ready
+from stub_upstream import stub_command
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+
+
+async def _generate_load(app_url: str, duration: float, concurrency: int, seed: int) -> tuple:
+    rnd = random.Random(seed)
+    completed = 0
+    errors = 0
+    deadline = time.monotonic() + duration
+    
+    async with httpx.AsyncClient(base_url=app_url, timeout=30,
+                                 limits=httpx.Limits(max_connections=concurrency)) as client:
+        async def user():
+            nonlocal completed, errors
+            while time.monotonic() < deadline:
+                kind = rnd.random()
+                if kind < 0.5:
+                    page = rnd.randrange(20)
+                    response = await client.post('/example/api/catalog/cars', json={
+                        'pagination': {'limit': 20, 'offset': page * 20}
+                    })
+                elif kind < 0.8:
+                    response = await client.get(f'/example/api/car/{rnd.randrange(200)}')
+                else:
+                    response = await client.get(f'/example/car/{rnd.randrange(200)}/inspection')
+                completed += 1
+                if response.status_code != 200:
+                    errors += 1
+        
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+    return completed, errors
+
+
+def _load_process(args):
+    return asyncio.run(_generate_load(*args))
+
+
+def run_case(workers: int, args, stub_url: str) -> dict:
+    app_url = f"http://127.0.0.1:{args.app_port}"
+    shared_dir = tempfile.mkdtemp(prefix='encar-bench-', dir='/dev/shm' if os.path.isdir('/dev/shm') else None)
+    env = dict(os.environ, ENCAR_API_URL=stub_url, ENCAR_API_KEY='bench-key')
+    server = subprocess.Popen([sys.executable, 'serve.py', '--workers', str(workers),
+                               '--port', str(args.app_port), '--host', '127.0.0.1',
+                               '--shared-dir', shared_dir],
+                              cwd=ROOT_DIR, env=env, stdout=subprocess.DEVNULL)
+    try:
+        asyncio.run(wait_ready(f"{app_url}/example/docs"))
+        with multiprocessing.Pool(args.load_processes) as pool:
+            started = time.perf_counter()
+            results = pool.map(_load_process, [
+                (app_url, args.duration, args.concurrency, seed) for seed in range(args.load_processes)
+            ])
+            elapsed = time.perf_counter() - started
+    finally:
+        server.terminate()
+        server.wait()
+        shutil.rmtree(shared_dir, ignore_errors=True)
+    
+    completed = sum(r[0] for r in results)
+    return {
+        'workers': workers,
+        'requests': completed,
+        'errors': sum(r[1] for r in results),
+        'rps': completed / elapsed
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--concurrency', type=int, default=32, help='На один процесс нагрузки')
+    parser.add_argument('--load-processes', type=int, default=2)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--stub-port', type=int, default=8900)
+    parser.add_argument('--app-port', type=int, default=8902)
+    args = parser.parse_args()
+    
+    stub_url = f"http://127.0.0.1:{args.stub_port}"
+    stub = subprocess.Popen(stub_command(args.stub_port, latency=args.latency))
+    try:
+        asyncio.run(wait_ready(f"{stub_url}/"))
+        print(f"cpu_count={os.cpu_count()} upstream latency={args.latency}s")
+        for workers in args.workers:
+            result = run_case(workers, args, stub_url)
+            print(f"  workers={result['workers']}: requests={result['requests']} "
+                  f"errors={result['errors']} rps={result['rps']:.1f}")
+    finally:
+        stub.terminate()
+        stub.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,26 @@
+"""Общие помощники бенчмарков"""
+import asyncio
+import time
+
+import httpx
+
+
+async def wait_ready(url: str, timeout: float = 30.0):
+    """Ждет, пока сервис начнет отвечать на HTTP запросы"""
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get(url)
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.1)
+    raise RuntimeError(f"Сервис не поднялся: {url}")
+
+
+def percentile(sorted_values: list, q: float) -> float:
+    """Перцентиль q (0..100) по отсортированному списку (nearest-rank)"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(q / 100 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
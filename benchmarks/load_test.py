@@ -0,0 +1,207 @@
+"""Набор нагрузочных тестов реальных роутов FastAPI
+
+Поднимает заглушку upstream и приложение (uvicorn или serve.py),
+по очереди нагружает сценарии и сохраняет p50/p95/p99 и RPS в JSON,
+чтобы сравнивать результаты между коммитами.
+
+Запуск:
+    python benchmarks/load_test.py --duration 10 --concurrency 20
+    python benchmarks/load_test.py --compare benchmarks/results/load_test-<commit>.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+from common import percentile, wait_ready
+from stub_upstream import stub_command
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+
+CAR_ID_BASE = 38000000
+
+
+async def catalog_html(client: httpx.AsyncClient, rnd: random.Random, keyspace: int):
+    return await client.get('/example/catalog', params={'page': rnd.randrange(1, keyspace + 1)})
+
+
+async def catalog_cars(client: httpx.AsyncClient, rnd: random.Random, keyspace: int):
+    return await client.post('/example/api/catalog/cars', json={
+        'car_data': {},
+        'pagination': {'limit': 20, 'offset': rnd.randrange(keyspace) * 20},
+        'filters': {},
+        'sorting': {'sort_order': 'price', 'sort_direction': 'ASC'}
+    })
+
+
+async def catalog_cars_get(client: httpx.AsyncClient, rnd: random.Random, keyspace: int):
+    # Канонический URL (без значений по умолчанию) - ответ без редиректа, с ETag
+    offset = rnd.randrange(keyspace) * 20
+    return await client.get('/example/api/catalog/cars', params={'offset': offset} if offset else None)
+
+
+async def car_details(client: httpx.AsyncClient, rnd: random.Random, keyspace: int):
+    return await client.get(f'/example/api/car/{CAR_ID_BASE + rnd.randrange(keyspace)}')
+
+
+async def inspection(client: httpx.AsyncClient, rnd: random.Random, keyspace: int):
+    return await client.get(f'/example/car/{CAR_ID_BASE + rnd.randrange(keyspace)}/inspection')
+
+
+SCENARIOS = {
+    'catalog_html': catalog_html,
+    'catalog_cars': catalog_cars,
+    'catalog_cars_get': catalog_cars_get,
+    'car_details': car_details,
+    'inspection': inspection,
+}
+
+
+async def run_scenario(app_url: str, scenario, duration: float, concurrency: int,
+                       keyspace: int, seed: int) -> dict:
+    rnd = random.Random(seed)
+    latencies = []
+    errors = 0
+    deadline = time.monotonic() + duration
+    
+    async with httpx.AsyncClient(base_url=app_url, timeout=60,
+                                 limits=httpx.Limits(max_connections=concurrency)) as client:
+        async def user():
+            nonlocal errors
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                try:
+                    response = await scenario(client, rnd, keyspace)
+                    # Редирект на канонический URL тоже ошибка: сценарий должен попадать в кэшируемый путь
+                    if response.status_code >= 300:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - started)
+        
+        started = time.perf_counter()
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': round(len(latencies) / elapsed, 2),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'max_ms': round(latencies[-1] * 1000, 2) if latencies else 0.0
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       cwd=ROOT_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def print_comparison(current: dict, previous: dict):
+    print(f"\nСравнение с {previous['meta']['commit']} ({previous['meta']['timestamp']}):")
+    for name, stats in current['scenarios'].items():
+        before = previous['scenarios'].get(name)
+        if not before:
+            continue
+        rps_delta = (stats['rps'] - before['rps']) / before['rps'] * 100 if before['rps'] else 0.0
+        p95_delta = (stats['p95_ms'] - before['p95_ms']) / before['p95_ms'] * 100 if before['p95_ms'] else 0.0
+        print(f"  {name:14s} rps {before['rps']:>9.1f} -> {stats['rps']:>9.1f} ({rps_delta:+.1f}%)   "
+              f"p95 {before['p95_ms']:>8.1f} -> {stats['p95_ms']:>8.1f} ms ({p95_delta:+.1f}%)")
+
+
+def start_app(args, stub_url: str) -> subprocess.Popen:
+    env = dict(os.environ, ENCAR_API_URL=stub_url, ENCAR_API_KEY='bench-key')
+    if args.workers > 1:
+        command = [sys.executable, 'serve.py', '--workers', str(args.workers), '--host', '127.0.0.1',
+                   '--port', str(args.app_port), '--shared-dir', f'/tmp/encar-load-test-{os.getpid()}']
+    else:
+        command = [sys.executable, '-m', 'uvicorn', 'main:app', '--port', str(args.app_port),
+                   '--log-level', 'warning', '--no-access-log']
+    return subprocess.Popen(command, cwd=ROOT_DIR, env=env, stdout=subprocess.DEVNULL)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--keyspace', type=int, default=200, help='Число разных страниц/автомобилей')
+    parser.add_argument('--workers', type=int, default=1, help='>1 - запуск через serve.py')
+    parser.add_argument('--latency', type=float, default=0.1)
+    parser.add_argument('--jitter', type=float, default=0.02)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--not-found-rate', type=float, default=0.0)
+    parser.add_argument('--url', help='Нагружать уже запущенное приложение (заглушка не поднимается)')
+    parser.add_argument('--stub-port', type=int, default=8900)
+    parser.add_argument('--app-port', type=int, default=8903)
+    parser.add_argument('--output', help='Файл результатов (по умолчанию benchmarks/results/load_test-<commit>.json)')
+    parser.add_argument('--compare', help='Файл предыдущих результатов для сравнения')
+    args = parser.parse_args()
+    
+    processes = []
+    app_url = args.url
+    try:
+        if not app_url:
+            stub_url = f"http://127.0.0.1:{args.stub_port}"
+            processes.append(subprocess.Popen(stub_command(
+                args.stub_port, latency=args.latency, jitter=args.jitter,
+                error_rate=args.error_rate, not_found_rate=args.not_found_rate
+            )))
+            asyncio.run(wait_ready(f"{stub_url}/"))
+            processes.append(start_app(args, stub_url))
+            app_url = f"http://127.0.0.1:{args.app_port}"
+        asyncio.run(wait_ready(f"{app_url}/example/docs"))
+        
+        scenarios = {}
+        for seed, name in enumerate(args.scenarios):
+            stats = asyncio.run(run_scenario(app_url, SCENARIOS[name], args.duration,
+                                             args.concurrency, args.keyspace, seed))
+            scenarios[name] = stats
+            print(f"{name:14s} rps={stats['rps']:>8.1f} p50={stats['p50_ms']:>7.1f}ms "
+                  f"p95={stats['p95_ms']:>7.1f}ms p99={stats['p99_ms']:>7.1f}ms "
+                  f"errors={stats['errors']}/{stats['requests']}")
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+            process.wait()
+    
+    result = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'cpu_count': os.cpu_count(),
+            'params': {key: value for key, value in vars(args).items() if key not in ('output', 'compare')}
+        },
+        'scenarios': scenarios
+    }
+    
+    output = args.output or os.path.join(RESULTS_DIR, f"load_test-{result['meta']['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"\nРезультаты сохранены: {output}")
+    
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            print_comparison(result, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
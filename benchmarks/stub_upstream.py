@@ -0,0 +1,152 @@
+"""Локальная заглушка upstream API для бенчмарков
+
+Реализует simple_search, car_info, get_fuel и get_transmission.
+Ответы строятся из записанных образцов в benchmarks/fixtures/,
+идентификаторы, цены и пробег варьируются по запросу.
+
+Запуск:
+    python benchmarks/stub_upstream.py --port 8900 --latency 0.2 --jitter 0.05 \\
+        --error-rate 0.01 --not-found-rate 0.02
+"""
+import argparse
+import asyncio
+import copy
+import json
+import os
+import random
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+SETTINGS = {
+    'latency': 0.0,
+    'jitter': 0.0,
+    'error_rate': 0.0,
+    'not_found_rate': 0.0,
+    'slow_rate': 0.0,
+    'slow_latency': 5.0,
+    'total': None
+}
+
+
+def _load_fixture(name: str) -> dict:
+    with open(os.path.join(FIXTURES_DIR, f'{name}.json'), encoding='utf-8') as f:
+        return json.load(f)
+
+
+SIMPLE_SEARCH = _load_fixture('simple_search')
+CAR_INFO = _load_fixture('car_info')
+FUELS = _load_fixture('get_fuel')
+TRANSMISSIONS = _load_fixture('get_transmission')
+
+
+async def _simulate_upstream():
+    """Задержка и инъекция ошибок. Возвращает ответ-ошибку или None"""
+    latency = SETTINGS['latency']
+    if SETTINGS['jitter']:
+        latency = max(0.0, random.gauss(latency, SETTINGS['jitter']))
+    if random.random() < SETTINGS['slow_rate']:
+        latency = SETTINGS['slow_latency']
+    if latency:
+        await asyncio.sleep(latency)
+    if random.random() < SETTINGS['error_rate']:
+        return JSONResponse({'detail': 'Injected upstream error'}, status_code=500)
+    return None
+
+
+def _make_car(template: dict, car_id: int) -> dict:
+    car = dict(template)
+    car['car_id'] = car_id
+    car['price'] = template['price'] + car_id * 13 % 2000
+    car['mileage'] = template['mileage'] + car_id * 37 % 90000
+    car['photos'] = [photo.replace(str(template['car_id']), str(car_id)) for photo in template['photos']]
+    car['url'] = f"https://fem.encar.com/cars/detail/{car_id}"
+    return car
+
+
+async def simple_search(request: Request):
+    payload = await request.json()
+    error = await _simulate_upstream()
+    if error:
+        return error
+    
+    total = SETTINGS['total'] or SIMPLE_SEARCH['total']
+    pagination = payload.get('pagination', {})
+    offset = pagination.get('offset', 0)
+    limit = min(pagination.get('limit', 20), max(0, total - offset))
+    templates = SIMPLE_SEARCH['cars']
+    
+    cars = [_make_car(templates[(offset + i) % len(templates)], 38000000 + offset + i)
+            for i in range(limit)]
+    return JSONResponse({
+        'status': 'success',
+        'total': total,
+        'pagination': {'limit': limit, 'offset': offset, 'filtered_count': total, 'total_count': total},
+        'cars': cars,
+        'children': SIMPLE_SEARCH['children']
+    })
+
+
+async def car_info(request: Request):
+    payload = await request.json()
+    error = await _simulate_upstream()
+    if error:
+        return error
+    if random.random() < SETTINGS['not_found_rate']:
+        return JSONResponse({'detail': 'Car not found'}, status_code=404)
+    
+    response = copy.deepcopy(CAR_INFO)
+    info = response['data']['info']
+    info['vehicleId'] = payload.get('car_id')
+    info['spec']['mileage'] += (payload.get('car_id') or 0) % 50000
+    return JSONResponse(response)
+
+
+async def get_fuel(request: Request):
+    await request.json()
+    return await _simulate_upstream() or JSONResponse(FUELS)
+
+
+async def get_transmission(request: Request):
+    await request.json()
+    return await _simulate_upstream() or JSONResponse(TRANSMISSIONS)
+
+
+app = Starlette(routes=[
+    Route('/simple_search', simple_search, methods=['POST']),
+    Route('/car_info', car_info, methods=['POST']),
+    Route('/get_fuel', get_fuel, methods=['POST']),
+    Route('/get_transmission', get_transmission, methods=['POST']),
+])
+
+
+def stub_command(port: int, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 not_found_rate: float = 0.0, slow_rate: float = 0.0, total: int = 0) -> list:
+    """Аргументы командной строки для запуска заглушки в отдельном процессе"""
+    import sys
+    return [sys.executable, os.path.abspath(__file__), '--port', str(port),
+            '--latency', str(latency), '--jitter', str(jitter), '--error-rate', str(error_rate),
+            '--not-found-rate', str(not_found_rate), '--slow-rate', str(slow_rate),
+            '--total', str(total)]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--latency', type=float, default=0.2, help='Средняя задержка ответа, сек')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Стандартное отклонение задержки, сек')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Доля ответов 500')
+    parser.add_argument('--not-found-rate', type=float, default=0.0, help='Доля ответов 404 для car_info')
+    parser.add_argument('--slow-rate', type=float, default=0.0, help='Доля очень медленных ответов')
+    parser.add_argument('--slow-latency', type=float, default=5.0, help='Задержка медленных ответов, сек')
+    parser.add_argument('--total', type=int, default=0, help='Размер выдачи simple_search (0 - из образца)')
+    args = parser.parse_args()
+    SETTINGS.update(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                    not_found_rate=args.not_found_rate, slow_rate=args.slow_rate,
+                    slow_latency=args.slow_latency, total=args.total or None)
+    uvicorn.run(app, host='127.0.0.1', port=args.port, log_level='warning')
@@ -0,0 +1,400 @@
+"""Сборка статических файлов в static/dist
+
+Минифицирует JS, CSS и SVG, собирает логотипы брендов в один спрайт,
+пишет файлы с хэшем содержимого в имени и предсжатые копии рядом
+(.gz всегда, .br - если установлен модуль brotli). Итог - manifest.json,
+по которому utils.assets.asset_url() находит хэшированные URL.
+
+Запуск (перед стартом приложения, после изменения static/):
+    python build_assets.py
+"""
+import argparse
+import base64
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+import struct
+import sys
+import time
+import zlib
+
+from utils.assets import STATIC_DIR, DIST_DIR
+
+try:
+    import brotli
+except ImportError:  # без brotli пишутся только .gz копии
+    brotli = None
+
+# Исходники, попадающие в сборку
+SOURCE_EXTENSIONS = ('.js', '.css', '.svg', '.jpg', '.jpeg', '.png')
+# Уже сжатые форматы не пережимаются
+COMPRESSIBLE_EXTENSIONS = ('.js', '.css', '.svg')
+BRANDS_DIR = 'images/brands'
+BRANDS_SPRITE = 'images/brands.svg'
+# Зазор между логотипами в спрайте, чтобы соседи не попадали в кадр при сглаживании
+SPRITE_GAP = 2
+
+# Слова, после которых "/" начинает регулярное выражение, а не деление
+REGEX_KEYWORDS = {'return', 'typeof', 'case', 'do', 'else', 'in', 'of', 'new', 'delete',
+                  'void', 'throw', 'instanceof', 'yield', 'await'}
+
+
+def _is_word(char):
+    return char.isalnum() or char in '_$' or ord(char) > 127
+
+
+def minify_js(source):
+    """Консервативная минификация: убирает комментарии, отступы и лишние пробелы.
+    
+    Строки, шаблонные строки и регулярные выражения копируются как есть.
+    Переводы строк сохраняются везде, где от них может зависеть автоматическая
+    расстановка точек с запятой, поэтому переименований и перестановок нет.
+    """
+    out = []
+    length = len(source)
+    i = 0
+    last = ''          # последний значимый символ кода
+    last_word = ''     # последнее слово кода (для return /re/ и т.п.)
+    pending = ''       # пропущенный пробельный разделитель: '', ' ' или '\n'
+    templates = []     # глубина фигурных скобок внутри ${...} шаблонных строк
+    
+    def emit(text, first):
+        nonlocal pending
+        if pending and out:
+            prev = out[-1][-1]
+            if pending == '\n' and prev not in '{[(,;\n' and first not in '}]),;':
+                out.append('\n')
+            elif (_is_word(prev) and _is_word(first)) or (prev in '+-' and first == prev):
+                out.append(' ')
+        pending = ''
+        out.append(text)
+    
+    def copy_template(start):
+        """Текст шаблонной строки от start до закрывающей ` или ${"""
+        j = start
+        while j < length:
+            char = source[j]
+            if char == '\\':
+                j += 2
+                continue
+            if char == '`':
+                return j + 1, False
+            if char == '$' and source.startswith('${', j):
+                return j + 2, True
+            j += 1
+        raise ValueError("незакрытая шаблонная строка")
+    
+    while i < length:
+        char = source[i]
+        
+        if char in ' \t\r\n\f\v\u00a0\ufeff':
+            if char == '\n':
+                pending = '\n'
+            elif not pending:
+                pending = ' '
+            i += 1
+            continue
+        
+        if source.startswith('//', i):
+            end = source.find('\n', i)
+            i = length if end == -1 else end
+            continue
+        
+        if source.startswith('/*', i):
+            end = source.find('*/', i + 2)
+            if end == -1:
+                raise ValueError("незакрытый комментарий")
+            if '\n' in source[i:end]:
+                pending = '\n'
+            elif not pending:
+                pending = ' '
+            i = end + 2
+            continue
+        
+        if char in '"\'':
+            j = i + 1
+            while j < length and source[j] != char:
+                if source[j] == '\n':
+                    raise ValueError(f"незакрытая строка в позиции {i}")
+                j += 2 if source[j] == '\\' else 1
+            emit(source[i:j + 1], char)
+            last, last_word = char, ''
+            i = j + 1
+            continue
+        
+        if char == '`' or (char == '}' and templates and templates[-1] == 0):
+            if char == '}':
+                templates.pop()
+            end, opened = copy_template(i + 1)
+            emit(source[i:end], char)
+            if opened:
+                templates.append(0)
+                last, last_word = '{', ''
+            else:
+                last, last_word = '`', ''
+            i = end
+            continue
+        
+        if char == '/' and (not last or last in '(,=:[!&|?{};+-*%<>~^' or last_word in REGEX_KEYWORDS):
+            j = i + 1
+            in_class = False
+            while j < length:
+                if source[j] == '\\':
+                    j += 2
+                    continue
+                if source[j] == '\n':
+                    raise ValueError(f"незакрытое регулярное выражение в позиции {i}")
+                if source[j] == '[':
+                    in_class = True
+                elif source[j] == ']':
+                    in_class = False
+                elif source[j] == '/' and not in_class:
+                    break
+                j += 1
+            j += 1
+            while j < length and _is_word(source[j]):
+                j += 1
+            emit(source[i:j], char)
+            last, last_word = '/', ''
+            i = j
+            continue
+        
+        if _is_word(char):
+            j = i + 1
+            while j < length and _is_word(source[j]):
+                j += 1
+            word = source[i:j]
+            emit(word, char)
+            last, last_word = word[-1], word
+            i = j
+            continue
+        
+        if templates:
+            if char == '{':
+                templates[-1] += 1
+            elif char == '}':
+                templates[-1] -= 1
+        emit(char, char)
+        last, last_word = char, ''
+        i += 1
+    
+    return ''.join(out).strip() + '\n'
+
+
+def minify_css(source):
+    """Убирает комментарии и пробелы вокруг { } ; , (строки не трогаются)"""
+    parts = re.split(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')', source)
+    for index in range(0, len(parts), 2):
+        text = re.sub(r'/\*.*?\*/', '', parts[index], flags=re.S)
+        text = re.sub(r'\s+', ' ', text)
+        text = re.sub(r' ?([{};,]) ?', r'\1', text)
+        # Пробел после ":" убирается только в блоках объявлений (в селекторах он значим)
+        text = re.sub(r'\{[^{}]*\}', lambda block: block.group(0).replace(': ', ':'), text)
+        parts[index] = text.replace(';}', '}')
+    return ''.join(parts).strip() + '\n'
+
+
+def recompress_png(data):
+    """PNG с данными, пережатыми zlib на максимальном уровне (если так меньше)"""
+    if not data.startswith(b'\x89PNG\r\n\x1a\n'):
+        return data
+    chunks, idat, position = [], [], 8
+    while position < len(data):
+        size, kind = struct.unpack('>I4s', data[position:position + 8])
+        body = data[position + 8:position + 8 + size]
+        position += 12 + size
+        if kind == b'IDAT':
+            if not idat:
+                chunks.append((b'IDAT', None))
+            idat.append(body)
+        elif kind in (b'IHDR', b'PLTE', b'tRNS', b'IEND', b'gAMA', b'sRGB', b'cHRM', b'iCCP', b'pHYs'):
+            chunks.append((kind, body))
+    pixels = zlib.decompress(b''.join(idat))
+    recompressed = zlib.compress(pixels, 9)
+    result = [data[:8]]
+    for kind, body in chunks:
+        if body is None:
+            body = recompressed
+        result.append(struct.pack('>I', len(body)) + kind + body
+                      + struct.pack('>I', zlib.crc32(kind + body) & 0xffffffff))
+    result = b''.join(result)
+    return result if len(result) < len(data) else data
+
+
+def _minify_data_uri(match):
+    media_type, payload = match.group(1), re.sub(r'\s+', '', match.group(2))
+    if media_type == 'image/png':
+        payload = base64.b64encode(recompress_png(base64.b64decode(payload))).decode('ascii')
+    return f'data:{media_type};base64,{payload}'
+
+
+def minify_svg(source):
+    """Убирает пролог, комментарии, метаданные редактора и пробелы между тегами.
+    
+    Встроенные PNG (схемы осмотра из Inkscape) переупаковываются без переносов
+    строк в base64 и с максимальным сжатием zlib, пиксели не меняются.
+    """
+    text = re.sub(r'<\?xml.*?\?>', '', source, flags=re.S)
+    text = re.sub(r'<!--.*?-->', '', text, flags=re.S)
+    text = re.sub(r'<metadata\b.*?</metadata>', '', text, flags=re.S)
+    text = re.sub(r'<sodipodi:namedview\b.*?(/>|</sodipodi:namedview>)', '', text, flags=re.S)
+    text = re.sub(r'data:([\w/+.-]+);base64,([A-Za-z0-9+/=\s]+)', _minify_data_uri, text)
+    text = re.sub(r'>\s+<', '><', text)
+    # Переносы и отступы между атрибутами
+    text = re.sub(r'<[^>]+>', lambda tag: re.sub(r'\s+', ' ', tag.group(0)).replace(' />', '/>'), text)
+    return text.strip()
+
+
+def build_sprite(logos):
+    """Логотипы друг под другом в одном SVG; <view id="slug"> выделяет каждый.
+    
+    <img src="brands.svg#bmw"> показывает только кадр BMW. Атрибуты id внутри
+    логотипов получают префикс slug-, чтобы не пересекаться между собой.
+    """
+    views, bodies, y, width = [], [], 0, 0
+    for slug, source in logos:
+        match = re.match(r'\s*<svg\b([^>]*)>(.*)</svg>\s*$', source, flags=re.S)
+        if match is None:
+            raise ValueError(f"{slug}: корневой <svg> не найден")
+        attributes, content = match.groups()
+        view_box = re.search(r'viewBox="([^"]+)"', attributes)
+        if view_box is None:
+            raise ValueError(f"{slug}: нет viewBox")
+        box = view_box.group(1)
+        box_width, box_height = (float(value) for value in box.replace(',', ' ').split()[2:4])
+        content = re.sub(r'<title>.*?</title>', '', content, flags=re.S)
+        content = re.sub(r'\bid="([^"]+)"', rf'id="{slug}-\1"', content)
+        content = re.sub(r'url\(#([^)]+)\)', rf'url(#{slug}-\1)', content)
+        content = re.sub(r'href="#([^"]+)"', rf'href="#{slug}-\1"', content)
+        # Атрибуты оформления корня (fill и т.п.) переносятся на вложенный <svg>
+        extra = re.sub(r'\s(?:xmlns(?::\w+)?|width|height|viewBox|role|id)="[^"]*"', '', attributes).strip()
+        
+        def number(value):
+            return f"{value:g}"
+        views.append(f'<view id="{slug}" viewBox="0 {number(y)} {number(box_width)} {number(box_height)}"/>')
+        bodies.append(
+            f'<svg x="0" y="{number(y)}" width="{number(box_width)}" height="{number(box_height)}" '
+            f'viewBox="{box}"{" " + extra if extra else ""}>{content}</svg>'
+        )
+        y += box_height + SPRITE_GAP
+        width = max(width, box_width)
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink" '
+        f'viewBox="0 0 {width:g} {max(y - SPRITE_GAP, 0):g}">' + ''.join(views) + ''.join(bodies) + '</svg>'
+    )
+
+
+def hashed_name(path, data):
+    root, extension = os.path.splitext(path)
+    return f"{root}.{hashlib.blake2b(data, digest_size=5).hexdigest()}{extension}"
+
+
+def write_asset(dist_dir, path, data, compress):
+    """Пишет файл под хэшированным именем и его .gz/.br копии; размеры для отчета"""
+    name = hashed_name(path, data)
+    target = os.path.join(dist_dir, name)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    with open(target, 'wb') as file:
+        file.write(data)
+    sizes = {'raw': len(data)}
+    if compress:
+        # mtime=0 - одинаковое содержимое дает одинаковый .gz
+        compressed = gzip.compress(data, compresslevel=9, mtime=0)
+        if len(compressed) < len(data):
+            with open(target + '.gz', 'wb') as file:
+                file.write(compressed)
+            sizes['gz'] = len(compressed)
+        if brotli is not None:
+            compressed = brotli.compress(data, quality=11)
+            if len(compressed) < len(data):
+                with open(target + '.br', 'wb') as file:
+                    file.write(compressed)
+                sizes['br'] = len(compressed)
+    return name, sizes
+
+
+def collect_sources(static_dir):
+    sources = []
+    for directory, subdirectories, files in os.walk(static_dir):
+        subdirectories[:] = sorted(d for d in subdirectories
+                                   if os.path.join(directory, d) != os.path.join(static_dir, DIST_DIR))
+        for filename in sorted(files):
+            if filename.lower().endswith(SOURCE_EXTENSIONS):
+                sources.append(os.path.relpath(os.path.join(directory, filename), static_dir).replace(os.sep, '/'))
+    return sources
+
+
+def minify(path, data):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.js':
+        return minify_js(data.decode('utf-8')).encode('utf-8')
+    if extension == '.css':
+        return minify_css(data.decode('utf-8')).encode('utf-8')
+    if extension == '.svg':
+        return minify_svg(data.decode('utf-8')).encode('utf-8')
+    return data
+
+
+def build(static_dir=STATIC_DIR, verbose=True):
+    started = time.perf_counter()
+    dist_dir = os.path.join(static_dir, DIST_DIR)
+    if os.path.isdir(dist_dir):
+        shutil.rmtree(dist_dir)
+    os.makedirs(dist_dir)
+    
+    manifest = {'files': {}, 'sprites': {}}
+    report = []
+    logos = []
+    for path in collect_sources(static_dir):
+        with open(os.path.join(static_dir, path), 'rb') as file:
+            original = file.read()
+        try:
+            data = minify(path, original)
+        except ValueError as e:
+            raise ValueError(f"{path}: {e}")
+        extension = os.path.splitext(path)[1].lower()
+        name, sizes = write_asset(dist_dir, path, data, extension in COMPRESSIBLE_EXTENSIONS)
+        manifest['files'][path] = f"{DIST_DIR}/{name}"
+        report.append((path, len(original), sizes))
+        if os.path.dirname(path) == BRANDS_DIR and extension == '.svg':
+            logos.append((os.path.splitext(os.path.basename(path))[0], data.decode('utf-8')))
+    
+    if logos:
+        sprite = build_sprite(logos).encode('utf-8')
+        name, sizes = write_asset(dist_dir, BRANDS_SPRITE, sprite, True)
+        manifest['files'][BRANDS_SPRITE] = f"{DIST_DIR}/{name}"
+        manifest['sprites'][BRANDS_SPRITE] = {'file': f"{DIST_DIR}/{name}", 'ids': [slug for slug, _ in logos]}
+        report.append((f"{BRANDS_SPRITE} ({len(logos)} logos)",
+                       sum(len(source) for _, source in logos), sizes))
+    
+    manifest['built_at'] = time.time()
+    with open(os.path.join(dist_dir, 'manifest.json'), 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, ensure_ascii=False, indent=1, sort_keys=True)
+    
+    if verbose:
+        print(f"{'file':<48} {'source':>9} {'min':>9} {'gz':>9} {'br':>9}")
+        for path, original_size, sizes in report:
+            print(f"{path:<48} {original_size:>9} {sizes['raw']:>9} "
+                  f"{sizes.get('gz', '-'):>9} {sizes.get('br', '-'):>9}")
+        print(f"{len(report)} assets -> {dist_dir} in {time.perf_counter() - started:.2f}s"
+              f"{'' if brotli is not None else ' (brotli not installed, .br skipped)'}")
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сборка static/dist")
+    parser.add_argument('--static-dir', default=STATIC_DIR)
+    parser.add_argument('--quiet', action='store_true')
+    args = parser.parse_args()
+    try:
+        build(args.static_dir, verbose=not args.quiet)
+    except ValueError as e:
+        print(f"Asset build error: {e}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
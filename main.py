@@ -1,23 +1,95 @@
 """Главный файл приложения"""
-from fastapi import FastAPI
-from fastapi.staticfiles import StaticFiles
+import asyncio
+from contextlib import asynccontextmanager
+
+from decouple import config
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
 
+from api.circuit_breaker import UpstreamUnavailable
 from routes.catalog import setup_catalog_routes
-from routes.car_details import setup_car_details_routes
+from routes.car_details import setup_car_details_routes, precompile_inspection_templates
 from routes.api import setup_api_routes
+from services.catalog_service import (encar_client, manufacturer_snapshot, facet_index, listing_snapshot,
+                                      background_leader)
+from services.rates_provider import rates_provider
+from utils.assets import PrecompressedStaticFiles
+from utils.compression import MIN_SIZE, GZIP_LEVEL
+from utils.metrics import MetricsRoute
+from utils.profiling import ProfilingMiddleware, CompressionTimerMiddleware
+
+
+LEADER_RETRY_INTERVAL = config('ENCAR_LEADER_RETRY_INTERVAL', default=30, cast=float)
+
+
+async def start_background_sync(leader: bool):
+    await manufacturer_snapshot.start(leader)
+    await facet_index.start(leader)
+    await listing_snapshot.start(leader)
+
+
+async def stop_background_sync():
+    await listing_snapshot.stop()
+    await facet_index.stop()
+    await manufacturer_snapshot.stop()
+
+
+async def await_leadership():
+    """Не ведущий воркер ждет блокировку и при смерти ведущего берет синхронизации на себя"""
+    while not background_leader.try_acquire():
+        await asyncio.sleep(LEADER_RETRY_INTERVAL)
+    print("✅ Воркер стал ведущим для фоновых синхронизаций")
+    await stop_background_sync()
+    await start_background_sync(True)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Прогреваем кэш с диска и загружаем дерево производителей до приема запросов
+    await encar_client.warm_from_disk(config('ENCAR_DISK_CACHE_WARM', default=500, cast=int))
+    await rates_provider.start()
+    await start_background_sync(background_leader.try_acquire())
+    leadership_task = None if background_leader.is_leader else asyncio.create_task(await_leadership())
+    precompile_inspection_templates()
+    yield
+    if leadership_task is not None:
+        leadership_task.cancel()
+    await stop_background_sync()
+    background_leader.release()
+    await rates_provider.stop()
+    # Закрываем пул соединений с API
+    await encar_client.aclose()
+
 
 app = FastAPI(title="Auto Catalog API", 
               docs_url="/example/docs", 
-              openapi_url="/example/openapi.json")
+              openapi_url="/example/openapi.json",
+              lifespan=lifespan)
+
+# Роуты, объявленные через app.get/app.post, пишут метрики латентности
+app.router.route_class = MetricsRoute
 
-# Middleware
+# Middleware (последний добавленный - внешний). Профилирование выключено по умолчанию,
+# замер сжатия стоит сразу внутри GZip, сам профилировщик - снаружи.
+# GZip сжимает на лету только некэшируемые ответы: кэшируемые уже сжаты (utils.compression)
 app.add_middleware(TrustedHostMiddleware, allowed_hosts=["*"])
-app.add_middleware(GZipMiddleware, minimum_size=1000)
+app.add_middleware(CompressionTimerMiddleware)
+app.add_middleware(GZipMiddleware, minimum_size=MIN_SIZE, compresslevel=GZIP_LEVEL)
+app.add_middleware(ProfilingMiddleware)
+
+@app.exception_handler(UpstreamUnavailable)
+async def upstream_unavailable_handler(request: Request, exc: UpstreamUnavailable):
+    """API недоступен и сохраненного ответа нет - быстрый отказ вместо ожидания таймаута"""
+    return JSONResponse(
+        content={'error': 'UPSTREAM_UNAVAILABLE', 'message': str(exc)},
+        status_code=503,
+        headers={'Retry-After': str(int(exc.retry_after + 0.5))}
+    )
 
-# Статические файлы
-app.mount("/example/static", StaticFiles(directory="static"), name="static")
+# Статические файлы; собранные build_assets.py (static/dist) отдаются предсжатыми
+app.mount("/example/static", PrecompressedStaticFiles(directory="static"), name="static")
 
 # Настройка роутов
 setup_catalog_routes(app)
@@ -1,93 +1,330 @@
 """API роуты"""
+from collections.abc import Mapping
+from urllib.parse import parse_qsl
+from decouple import config
 from fastapi import Request, HTTPException
-from fastapi.responses import JSONResponse
-from services.catalog_service import encar_client, CatalogService
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse, RedirectResponse, Response
+from api.circuit_breaker import UpstreamUnavailable
+from services.catalog_service import (encar_client, manufacturer_snapshot, facet_index, listing_snapshot,
+                                      catalog_prefetcher, background_leader, CatalogService)
+from services.currency_service import CurrencyService
+from services.export_service import ExportService
+from services.rates_provider import rates_provider
+from services.inspection_service import report_cache
 from services.session_manager import SessionManager
+from routes.parsers import CatalogParamsParser
+from utils.compression import body_cache
+from utils.http_cache import CACHE_POLICIES, FastJSONResponse, cached_json_response
+from utils.metrics import metrics
+from utils.profiling import settings as profiling_settings
+
+PROFILE_TOKEN = config('ENCAR_PROFILE_TOKEN', default='')
+
+
+def collect_service_metrics():
+    """Метрики кэшей, объединения запросов и хранилища сессий на момент выгрузки"""
+    caches = {'response': encar_client.cache.stats(), 'inspection': report_cache.stats()}
+    lookups, hit_ratio, sizes = [], [], []
+    for name, stats in caches.items():
+        for kind in ('hits', 'stale_hits', 'negative_hits', 'fallback_hits', 'misses'):
+            lookups.append(({'cache': name, 'result': kind}, stats[kind]))
+        hit_ratio.append(({'cache': name}, stats['hit_ratio']))
+        sizes.append(({'cache': name}, stats['bytes']))
+    
+    if encar_client.disk_cache:
+        disk = encar_client.disk_cache.stats()
+        lookups.append(({'cache': 'disk', 'result': 'hits'}, disk['hits']))
+        lookups.append(({'cache': 'disk', 'result': 'misses'}, disk['misses']))
+        disk_lookups = disk['hits'] + disk['misses']
+        hit_ratio.append(({'cache': 'disk'}, round(disk['hits'] / disk_lookups, 4) if disk_lookups else 0.0))
+    
+    facets = facet_index.stats()
+    lookups.append(({'cache': 'facets', 'result': 'hits'}, facets['hits']))
+    lookups.append(({'cache': 'facets', 'result': 'misses'}, facets['misses']))
+    hit_ratio.append(({'cache': 'facets'}, facets['hit_ratio']))
+    
+    listing = listing_snapshot.stats()
+    single_flight = encar_client.single_flight.stats()
+    prefetch = catalog_prefetcher.stats()
+    limiter = encar_client.limiter.stats()
+    breaker_states, breaker_transitions, breaker_rejected = [], [], []
+    for endpoint, breaker in encar_client.breakers.items():
+        for state in (breaker.CLOSED, breaker.OPEN, breaker.HALF_OPEN):
+            breaker_states.append(({'endpoint': endpoint, 'state': state}, int(breaker.state == state)))
+        for (source, target), count in breaker.transitions.items():
+            breaker_transitions.append(({'endpoint': endpoint, 'from': source, 'to': target}, count))
+        breaker_rejected.append(({'endpoint': endpoint}, breaker.rejected))
+    return [
+        ('encar_cache_lookups_total', 'counter', 'Обращения к кэшам по результату', lookups),
+        ('encar_cache_hit_ratio', 'gauge', 'Доля ответов из кэша', hit_ratio),
+        ('encar_cache_bytes', 'gauge', 'Занятый объем кэша в памяти', sizes),
+        ('encar_upstream_coalesced_total', 'counter', 'Запросы, объединенные с уже выполняющимися',
+         [({}, single_flight['coalesced'])]),
+        ('encar_circuit_breaker_state', 'gauge', 'Текущее состояние автомата (1 - активное)', breaker_states),
+        ('encar_circuit_breaker_transitions_total', 'counter', 'Переходы автомата между состояниями',
+         breaker_transitions),
+        ('encar_circuit_breaker_rejected_total', 'counter', 'Запросы, отклоненные разомкнутым автоматом',
+         breaker_rejected),
+        ('encar_upstream_concurrency_limit', 'gauge', 'Текущий адаптивный лимит запросов к API',
+         [({}, limiter['limit'])]),
+        ('encar_upstream_limiter_queued', 'gauge', 'Запросы, ожидающие слот лимитера', [({}, limiter['queued'])]),
+        ('encar_upstream_limiter_rejected_total', 'counter', 'Запросы, не дождавшиеся слота лимитера',
+         [({}, limiter['rejected'])]),
+        ('encar_listing_index_size', 'gauge', 'Объявлений в локальном индексе', [({}, listing['listings'])]),
+        ('encar_listing_index_queries_total', 'counter', 'Запросы каталога к локальному индексу по результату',
+         [({'result': 'served'}, listing['queries']), ({'result': 'fallback'}, listing['fallbacks'])]),
+        ('encar_prefetch_hit_ratio', 'gauge', 'Доля предзагруженных страниц, которые были запрошены',
+         [({}, prefetch['hit_rate'])]),
+        ('encar_session_store_size', 'gauge', 'Число сессий в хранилище', [({}, SessionManager.last_size)]),
+    ]
+
 
 def setup_api_routes(app):
-    @app.post("/example/api/catalog/cars")
-    async def api_catalog_cars(request: Request):
+    metrics.add_collector(collect_service_metrics)
+    
+    def catalog_route(path, policy):
+        """POST-роут каталога и его GET-версия с тем же обработчиком.
+        
+        Обработчик получает тело запроса и возвращает dict (успех) или готовый ответ.
+        GET принимает параметры в каноническом query string (иначе 301 на канонический
+        URL, чтобы браузер и прокси кэшировали один адрес; неизвестные параметры и
+        неверные значения - 400) и отдает успешные ответы с ETag, Cache-Control
+        политики policy и 304 на совпавший If-None-Match.
+        """
+        def register(handler):
+            async def post_endpoint(request: Request):
+                try:
+                    data = await request.json()
+                except Exception:
+                    return JSONResponse(content={'error': 'Invalid JSON body'}, status_code=400)
+                result = await handler(data, request)
+                return result if isinstance(result, Response) else FastJSONResponse(content=result)
+            
+            async def get_endpoint(request: Request):
+                try:
+                    data = CatalogParamsParser.parse_api_query(request)
+                except ValueError as e:
+                    return JSONResponse(content={'error': 'INVALID_PARAMS', 'message': str(e)}, status_code=400)
+                canonical = CatalogParamsParser.canonical_api_query(data)
+                if request.query_params.multi_items() != parse_qsl(canonical):
+                    url = f"{request.url.path}?{canonical}" if canonical else request.url.path
+                    return RedirectResponse(url=url, status_code=301,
+                                            headers={'Cache-Control': CACHE_POLICIES['redirect']})
+                result = await handler(data, request)
+                if isinstance(result, Response):
+                    return result
+                if not isinstance(result, Mapping) or result.get('status') != 'success':
+                    # Пустой или неуспешный ответ upstream не должен кэшироваться браузером и прокси
+                    return FastJSONResponse(content=result, headers={'Cache-Control': CACHE_POLICIES['no_store']})
+                route_policy = 'no_store' if data['use_cache'] == 'false' else policy
+                return cached_json_response(request, result, route_policy)
+            
+            app.add_api_route(path, post_endpoint, methods=['POST'], name=handler.__name__)
+            app.add_api_route(path, get_endpoint, methods=['GET'], name=f"{handler.__name__}_get")
+            return handler
+        return register
+    
+    @catalog_route("/example/api/catalog/cars", policy='catalog')
+    async def api_catalog_cars(data, request: Request):
         try:
-            data = await request.json()
             car_data = data.get('car_data', {})
             pagination = data.get('pagination', {"limit": 20, "offset": 0})
             filters = data.get('filters', {})
             sorting = data.get('sorting', {})
+            currencies = data.get('currencies') or ['RUB']
+            if isinstance(currencies, str):
+                currencies = [currencies]
             
-            response = CatalogService.get_catalog_data(car_data, filters, sorting, pagination)
+            use_cache = CatalogParamsParser.parse_use_cache(request)
+            
+            response = await CatalogService.get_catalog_data(
+                car_data, filters, sorting, pagination, use_cache, prefetch_next=True,
+                currencies=currencies, rates_version=data.get('rates_version'),
+                price_currency=data.get('price_currency')
+            )
             if response:
-                return JSONResponse(content=response)
+                return response
             return JSONResponse(content={'error': 'API error'}, status_code=500)
+        except UpstreamUnavailable:
+            raise
         except Exception as e:
             print(f"Cars loading error: {e}")
             return JSONResponse(content={'error': 'Internal server error'}, status_code=500)
     
+    @app.post("/example/api/catalog/export")
+    async def api_catalog_export(request: Request):
+        """Потоковая выгрузка всего отфильтрованного каталога в NDJSON или CSV"""
+        export_format = request.query_params.get('format', 'ndjson')
+        if export_format not in ('ndjson', 'csv'):
+            return JSONResponse(content={'error': 'Unsupported format'}, status_code=400)
+        
+        try:
+            data = await request.json()
+        except Exception:
+            return JSONResponse(content={'error': 'Invalid JSON body'}, status_code=400)
+        
+        try:
+            cars = await ExportService.start(
+                data.get('car_data', {}),
+                data.get('filters', {}),
+                data.get('sorting', {}),
+                request
+            )
+        except UpstreamUnavailable:
+            raise
+        except Exception as e:
+            print(f"Export error: {e}")
+            return JSONResponse(content={'error': 'API error'}, status_code=500)
+        
+        if export_format == 'csv':
+            body = ExportService.stream_csv(cars)
+            media_type = 'text/csv; charset=utf-8'
+        else:
+            body = ExportService.stream_ndjson(cars)
+            media_type = 'application/x-ndjson'
+        
+        return StreamingResponse(body, media_type=media_type, headers={
+            'Content-Disposition': f'attachment; filename="catalog.{export_format}"'
+        })
+    
+    @app.get("/example/api/rates")
+    async def api_rates(request: Request):
+        """Курсы валют текущей или закрепленной (?version=) версии"""
+        return JSONResponse(content=CurrencyService.get_rates(request.query_params.get('version')))
+    
     @app.get("/example/api/health")
-    async def api_health():
+    async def api_health(request: Request):
         """Проверка состояния API"""
-        health_status = encar_client.check_api_health()
-        return JSONResponse(content=health_status)
+        use_cache = CatalogParamsParser.parse_use_cache(request)
+        health_status = await encar_client.check_api_health(use_cache)
+        return FastJSONResponse(content=health_status)
+    
+    @app.get("/example/metrics")
+    async def api_metrics():
+        """Метрики в текстовом формате Prometheus"""
+        # Сборщики синхронные - размер хранилища сессий обновляется заранее
+        await SessionManager.size()
+        return PlainTextResponse(metrics.render(), media_type='text/plain; version=0.0.4; charset=utf-8')
+    
+    @app.get("/example/api/profiling")
+    async def api_profiling_settings():
+        """Текущие настройки профилирования запросов"""
+        return JSONResponse(content=profiling_settings.to_dict())
+    
+    @app.post("/example/api/profiling")
+    async def api_update_profiling_settings(request: Request):
+        """Изменение настроек профилирования без перезапуска (только текущий воркер)"""
+        # Без ENCAR_PROFILE_TOKEN изменение настроек закрыто: иначе любой клиент
+        # может включить sample_rate=1 со стеками и забить logs/
+        if not PROFILE_TOKEN or request.headers.get('x-profile-token') != PROFILE_TOKEN:
+            raise HTTPException(status_code=403, detail="Forbidden")
+        try:
+            profiling_settings.update(await request.json())
+        except (ValueError, TypeError) as e:
+            return JSONResponse(content={'error': str(e)}, status_code=400)
+        return JSONResponse(content=profiling_settings.to_dict())
+    
+    @app.get("/example/api/cache/stats")
+    async def api_cache_stats():
+        """Статистика кэша ответов API и объединения запросов"""
+        return JSONResponse(content={
+            'response_cache': encar_client.cache.stats(),
+            'inspection_cache': report_cache.stats(),
+            'disk_cache': encar_client.disk_cache.stats() if encar_client.disk_cache else None,
+            'single_flight': encar_client.single_flight.stats(),
+            'circuit_breakers': {endpoint: breaker.stats() for endpoint, breaker in encar_client.breakers.items()},
+            'limiter': encar_client.limiter.stats(),
+            'background_leader': background_leader.is_leader,
+            'manufacturer_snapshot': manufacturer_snapshot.stats(),
+            'facets': facet_index.stats(),
+            'listing_index': listing_snapshot.stats(),
+            'prefetch': catalog_prefetcher.stats(),
+            'rates': rates_provider.stats(),
+            'compression': body_cache.stats(),
+            'sessions': await SessionManager.size()
+        })
+    
+    @catalog_route("/example/api/catalog/facets", policy='facets')
+    async def api_catalog_facets(data, request: Request):
+        """Фасеты ветки каталога (навигация, топливо, КПП) одним ответом из локального индекса"""
+        try:
+            result = await CatalogService.get_facets(data.get('car_data', {}))
+            return {'status': 'success', **result}
+        except UpstreamUnavailable:
+            raise
+        except Exception as e:
+            print(f"Facets loading error: {e}")
+            return JSONResponse(content={'error': 'Internal server error'}, status_code=500)
     
-    @app.post("/example/api/catalog/fuels")
-    async def api_catalog_fuels(request: Request):
+    @catalog_route("/example/api/catalog/fuels", policy='facets')
+    async def api_catalog_fuels(data, request: Request):
         """API для получения типов топлива"""
         try:
-            data = await request.json()
             car_data = data.get('car_data', {})
             
-            response = encar_client.get_available_fuels(car_data)
+            response = await encar_client.get_available_fuels(car_data)
             if response and response.get('status') == 'success':
                 fuels = [{'value': fuel, 'label': fuel} for fuel in response.get('data', [])]
                 
-                return JSONResponse(content={
+                return {
                     'status': 'success',
                     'data': fuels
-                })
+                }
             
             raise HTTPException(status_code=500, detail="Failed to get fuel types")
             
+        except UpstreamUnavailable:
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail="Internal server error")
     
-    @app.post("/example/api/catalog/transmissions")
-    async def api_catalog_transmissions(request: Request):
+    @catalog_route("/example/api/catalog/transmissions", policy='facets')
+    async def api_catalog_transmissions(data, request: Request):
         """API для получения типов трансмиссии"""
         try:
-            data = await request.json()
             car_data = data.get('car_data', {})
             
-            response = encar_client.get_available_transmissions(car_data)
+            response = await encar_client.get_available_transmissions(car_data)
             if response and response.get('status') == 'success':
                 transmissions = [{'value': transmission, 'label': transmission} for transmission in response.get('data', [])]
                 
-                return JSONResponse(content={
+                return {
                     'status': 'success', 
                     'data': transmissions
-                })
+                }
             
             raise HTTPException(status_code=500, detail="Failed to get transmission types")
             
+        except UpstreamUnavailable:
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail="Internal server error")
     
-    @app.post("/example/api/catalog/navigate")
-    async def api_catalog_navigate(request: Request):
+    @catalog_route("/example/api/catalog/navigate", policy='catalog')
+    async def api_catalog_navigate(data, request: Request):
         """API для навигации по каталогу"""
         try:
-            data = await request.json()
             car_data = data.get('car_data', {})
             filters = data.get('filters', {})
             sorting = data.get('sorting', {"sort_order": "price", "sort_direction": "ASC"})
+            if data.get('price_currency'):
+                filters, _ = CurrencyService.filters_to_won(
+                    {k: v for k, v in filters.items() if v is not None},
+                    data['price_currency'], data.get('rates_version')
+                )
             
-            response = encar_client.simple_search(
+            response = await encar_client.simple_search(
                 car_data=car_data,
                 pagination={"limit": 1, "offset": 0},
                 filters=filters,
-                sorting=sorting
+                sorting=sorting,
+                use_cache=CatalogParamsParser.parse_use_cache(request)
             )
             
-            return JSONResponse(content=response)
+            return response
             
+        except UpstreamUnavailable:
+            raise
         except Exception as e:
             error_message = str(e)
             print(f"Navigation error: {error_message}")
@@ -106,16 +343,18 @@ def setup_api_routes(app):
     @app.post("/example/api/filters")
     async def update_filters(request: Request):
         """Обновление фильтров пользователя"""
-        session_id, user_session = SessionManager.get_user_session(request)
+        session_id, user_session = await SessionManager.get_user_session(request)
         
         data = await request.json()
-        user_session['filters'].update(data)
+        user_session.filters.update(data)
+        await SessionManager.save_user_session(session_id, user_session)
         
-        return JSONResponse(content={'status': 'success', 'filters': user_session['filters']})
+        return JSONResponse(content={'status': 'success', 'filters': user_session.filters})
     
     @app.post("/example/api/filters/reset")
     async def reset_filters(request: Request):
         """Сброс фильтров"""
-        session_id, user_session = SessionManager.get_user_session(request)
-        user_session['filters'] = {}
+        session_id, user_session = await SessionManager.get_user_session(request)
+        user_session.filters = {}
+        await SessionManager.save_user_session(session_id, user_session)
         return JSONResponse(content={'status': 'success'})
@@ -1,34 +1,75 @@
 """Роуты деталей автомобиля и инспекции"""
 from fastapi import Request
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
+from jinja2 import FileSystemBytecodeCache
 from services.catalog_service import encar_client
+from services.car_details_service import CarDetailsService
+from services.currency_service import CurrencyService
 from services.session_manager import SessionManager
-from utils.inspection_generator import InspectionGenerator
+from services.inspection_service import InspectionService
+from utils.assets import setup_template_globals
+from utils.compression import compress_response
 from utils.damage_coordinates import DAMAGE_COLORS
+from utils.http_cache import cached_json_response, serialize_json
+from utils.profiling import phase
 
 templates = Jinja2Templates(directory="templates")
+templates.env.bytecode_cache = FileSystemBytecodeCache()
+setup_template_globals(templates)
+
+INSPECTION_TEMPLATES = [
+    'inspection/macros.html',
+    'inspection/report_ru.html',
+    'inspection/report_image.html',
+    'inspection/error.html'
+]
+
+def precompile_inspection_templates():
+    """Компилирует шаблоны отчетов осмотра при старте, до первого запроса"""
+    for name in INSPECTION_TEMPLATES:
+        templates.get_template(name)
 
 def setup_car_details_routes(app):
     @app.get("/example/car/{car_id}", response_class=HTMLResponse)
     async def car_details(request: Request, car_id: int):
-        return templates.TemplateResponse('car_details.html', {
+        return compress_response(request, templates.TemplateResponse('car_details.html', {
             'request': request, 
-            'car_id': car_id
-        })
+            'car_id': car_id,
+            'exchange_rates': CurrencyService.get_rates()
+        }))
     
     @app.get("/example/api/car/{car_id}")
-    async def api_car_details(car_id: int):
-        car_data = encar_client.get_car_details(car_id)
+    async def api_car_details(request: Request, car_id: int):
+        car_data = await encar_client.get_car_details(car_id)
         if car_data and car_data.get('status') == 'success':
-            return JSONResponse(content=car_data)
+            return cached_json_response(request, car_data, 'car', etag=encar_client.car_details_etag(car_id))
         return JSONResponse(content={'error': 'Car not found'}, status_code=404)
     
+    @app.post("/example/api/cars/batch")
+    async def api_cars_batch(request: Request):
+        """Детали нескольких автомобилей одним запросом: NDJSON, строка на автомобиль по мере готовности"""
+        try:
+            data = await request.json()
+            car_ids = CarDetailsService.parse_car_ids(data.get('car_ids'))
+        except (ValueError, TypeError, AttributeError) as e:
+            return JSONResponse(content={'error': 'Invalid request', 'message': str(e)}, status_code=400)
+        
+        async def body():
+            async for result in CarDetailsService.iter_batch(car_ids, data.get('lang', 'eng'), request):
+                # Детали (RawJSON) вставляются исходными байтами; переводы строк в JSON
+                # возможны только как пробельные символы, их можно убрать
+                yield serialize_json(result).translate(None, b'\r\n') + b'\n'
+        
+        # GZipMiddleware копит сжатый поток до конца ответа - строки должны уходить сразу
+        return StreamingResponse(body(), media_type='application/x-ndjson',
+                                 headers={'Content-Encoding': 'identity'})
+    
     @app.get("/example/car/{car_id}/inspection", response_class=HTMLResponse)
     async def car_inspection(request: Request, car_id: int):
         lang = request.query_params.get('lang', 'ru')
         
-        car_data = encar_client.get_car_details(car_id)
+        car_data = await encar_client.get_car_details(car_id)
         if not car_data or car_data.get('status') != 'success':
             return templates.TemplateResponse('inspection/error.html', {
                 'request': request,
@@ -55,8 +96,8 @@ def setup_car_details_routes(app):
             
             template = 'inspection/report_image.html'
         else:
-            generator = InspectionGenerator()
-            report_data = generator.generate_report(car_info_data, lang)
+            report_data = InspectionService.get_report(car_id, car_info_data, lang,
+                                                       etag=encar_client.car_details_etag(car_id))
             
             if report_data and report_data.get('error'):
                 return templates.TemplateResponse('inspection/error.html', {
@@ -64,10 +105,13 @@ def setup_car_details_routes(app):
                     'message': report_data['error']
                 }, status_code=500)
             
-            template = f'inspection/report_{lang}.html'
+            # Отчет строится на языке, для которого есть перевод
+            template = f"inspection/report_{report_data.get('lang', lang)}.html"
         
-        return templates.TemplateResponse(template, {
-            'request': request,
-            'report_data': report_data,
-            'DAMAGE_COLORS': DAMAGE_COLORS
-        })
+        with phase('template'):
+            response = templates.TemplateResponse(template, {
+                'request': request,
+                'report_data': report_data,
+                'DAMAGE_COLORS': DAMAGE_COLORS
+            })
+        return compress_response(request, response)
@@ -3,11 +3,15 @@ from fastapi import Request, HTTPException
 from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
 from services.catalog_service import CatalogService
+from services.currency_service import CurrencyService
 from services.session_manager import SessionManager
 from routes.parsers import CatalogParamsParser
 from routes.url_builder import URLParamsBuilder
+from utils.assets import setup_template_globals
+from utils.profiling import phase
 
 templates = Jinja2Templates(directory="templates")
+setup_template_globals(templates)
 
 def setup_catalog_routes(app):
     @app.get("/example/", response_class=RedirectResponse)
@@ -23,13 +27,12 @@ def setup_catalog_routes(app):
         
         manufacturers = CatalogService.get_manufacturers()
         
-        session_id, user_session = SessionManager.get_user_session(request)
-        user_session.update({
-            'filters': filters,
-            'car_data': car_data,
-            'sorting': sorting,
-            'pagination': pagination
-        })
+        session_id, user_session = await SessionManager.get_user_session(request)
+        user_session.filters = filters
+        user_session.car_data = car_data
+        user_session.sorting = sorting
+        user_session.pagination = pagination
+        await SessionManager.save_user_session(session_id, user_session)
         
         url_params = URLParamsBuilder.update_url_params({
             'manufacturer': car_data.get('manufacturer'),
@@ -49,23 +52,26 @@ def setup_catalog_routes(app):
             'pagination': pagination
         })
         
-        response = templates.TemplateResponse('catalog.html', {
-            'request': request,
-            'manufacturers': manufacturers,
-            'current_filters': {
-                'price_min': request.query_params.get('price_min'),
-                'price_max': request.query_params.get('price_max'),
-                'year_min': request.query_params.get('year_min'),
-                'year_max': request.query_params.get('year_max'),
-                'mileage_min': request.query_params.get('mileage_min'),
-                'mileage_max': request.query_params.get('mileage_max')
-            },
-            'current_sorting': sorting,
-            'current_page': pagination['offset'] // 20 + 1,
-            'url_params': url_params
-        })
+        with phase('template'):
+            response = templates.TemplateResponse('catalog.html', {
+                'request': request,
+                'manufacturers': manufacturers,
+                'current_filters': {
+                    'price_min': request.query_params.get('price_min'),
+                    'price_max': request.query_params.get('price_max'),
+                    'year_min': request.query_params.get('year_min'),
+                    'year_max': request.query_params.get('year_max'),
+                    'mileage_min': request.query_params.get('mileage_min'),
+                    'mileage_max': request.query_params.get('mileage_max')
+                },
+                'current_sorting': sorting,
+                'current_page': pagination['offset'] // 20 + 1,
+                'url_params': url_params,
+                'exchange_rates': CurrencyService.get_rates(request.query_params.get('rates_version'))
+            })
         
         if not request.cookies.get("session_id"):
             response.set_cookie(key="session_id", value=session_id)
         
+        # Страница зависит от query и сессии и почти не повторяется - ее сжимает GZipMiddleware
         return response
@@ -1,5 +1,17 @@
 """Парсеры параметров запросов"""
+from urllib.parse import urlencode
 from services.currency_service import CurrencyService
+from services.rates_provider import CURRENCIES
+
+# Параметры GET-версий API каталога; цены - в единицах API (как в теле POST)
+API_CAR_DATA_KEYS = ('manufacturer', 'modelgroup', 'model', 'badgegroup', 'badge')
+API_FILTER_KEYS = ('price_min', 'price_max', 'year_min', 'year_max', 'mileage_min', 'mileage_max',
+                   'fuel', 'transmission')
+API_LIST_KEYS = ('badgegroup', 'fuel', 'transmission', 'currencies')
+API_OPTION_KEYS = ('sort_order', 'sort_direction', 'limit', 'offset', 'rates_version', 'currencies',
+                   'price_currency', 'use_cache')
+API_DEFAULTS = {'sort_order': 'price', 'sort_direction': 'ASC', 'limit': '20', 'offset': '0',
+                'use_cache': 'true'}
 
 class CatalogParamsParser:
     @staticmethod
@@ -29,15 +41,17 @@ class CatalogParamsParser:
         
         price_min_rub = request.query_params.get('price_min')
         price_max_rub = request.query_params.get('price_max')
+        # Курс, по которому страница показывала цены; без него - текущий
+        rates_version = request.query_params.get('rates_version')
         
         if price_min_rub:
             try:
-                filters['price_min'] = CurrencyService.convert_to_won(int(price_min_rub))
+                filters['price_min'] = CurrencyService.convert_to_won(int(price_min_rub), rates_version)
             except ValueError:
                 pass
         if price_max_rub:
             try:
-                filters['price_max'] = CurrencyService.convert_to_won(int(price_max_rub))
+                filters['price_max'] = CurrencyService.convert_to_won(int(price_max_rub), rates_version)
             except ValueError:
                 pass
         
@@ -77,3 +91,94 @@ class CatalogParamsParser:
             'limit': 20,
             'offset': (page - 1) * 20
         }
+    
+    @staticmethod
+    def parse_use_cache(request):
+        """Заголовок Cache-Control: no-cache или параметр use_cache=false позволяют обойти кэш ответов API"""
+        cache_control = request.headers.get('cache-control', '')
+        if request.query_params.get('use_cache', '').lower() == 'false':
+            return False
+        return 'no-cache' not in cache_control.lower()
+    
+    @staticmethod
+    def parse_api_query(request):
+        """Тело запроса POST-роута каталога из query string его GET-версии.
+        
+        Неизвестный параметр или неверное значение - ValueError: такой запрос нельзя
+        перенаправить на канонический URL, не изменив его смысл.
+        """
+        params = request.query_params
+        unknown = set(params) - set(API_CAR_DATA_KEYS) - set(API_FILTER_KEYS) - set(API_OPTION_KEYS)
+        if unknown:
+            raise ValueError(f"Неизвестные параметры: {', '.join(sorted(unknown))}")
+        
+        def integer(key, raw):
+            try:
+                return int(raw)
+            except ValueError:
+                raise ValueError(f"Параметр {key} должен быть целым числом: {raw}")
+        
+        def value(key):
+            raw = params.get(key)
+            if raw is None or raw == '':
+                return None
+            if key in API_LIST_KEYS:
+                return [item for item in raw.split(',') if item]
+            return raw
+        
+        car_data = {key: value(key) for key in API_CAR_DATA_KEYS if value(key) is not None}
+        filters = {}
+        for key in API_FILTER_KEYS:
+            raw = value(key)
+            if raw is None:
+                continue
+            filters[key] = raw if isinstance(raw, list) else integer(key, raw)
+        
+        sort_direction = (params.get('sort_direction') or API_DEFAULTS['sort_direction']).upper()
+        if sort_direction not in ('ASC', 'DESC'):
+            raise ValueError(f"Параметр sort_direction должен быть ASC или DESC: {sort_direction}")
+        body = {
+            'car_data': car_data,
+            'filters': filters,
+            'sorting': {
+                'sort_order': params.get('sort_order') or API_DEFAULTS['sort_order'],
+                'sort_direction': sort_direction
+            },
+            'pagination': {
+                'limit': integer('limit', params.get('limit') or API_DEFAULTS['limit']),
+                'offset': integer('offset', params.get('offset') or API_DEFAULTS['offset'])
+            }
+        }
+        if value('rates_version'):
+            body['rates_version'] = value('rates_version')
+        if value('price_currency'):
+            if value('price_currency') not in CURRENCIES:
+                raise ValueError(f"Неизвестная валюта: {value('price_currency')}")
+            body['price_currency'] = value('price_currency')
+        use_cache = (params.get('use_cache') or API_DEFAULTS['use_cache']).lower()
+        if use_cache not in ('true', 'false'):
+            raise ValueError(f"Параметр use_cache должен быть true или false: {use_cache}")
+        # Обход кэша остается в каноническом URL; роуты читают его через parse_use_cache
+        body['use_cache'] = use_cache
+        if value('currencies'):
+            body['currencies'] = value('currencies')
+        return body
+    
+    @staticmethod
+    def canonical_api_query(body):
+        """Канонический query string: ключи по алфавиту, без пустых значений и значений по умолчанию,
+        списки отсортированы - один запрос всегда дает один URL для кэшей браузера и прокси"""
+        pairs = {}
+        sources = [body.get('car_data', {}), body.get('filters', {}), body.get('sorting', {}),
+                   body.get('pagination', {}),
+                   {'rates_version': body.get('rates_version'), 'currencies': body.get('currencies'),
+                    'price_currency': body.get('price_currency'), 'use_cache': body.get('use_cache')}]
+        for source in sources:
+            for key, raw in source.items():
+                if raw is None or raw == '' or raw == []:
+                    continue
+                text = ','.join(sorted(str(item) for item in raw)) if isinstance(raw, list) else str(raw)
+                if API_DEFAULTS.get(key) == text:
+                    continue
+                pairs[key] = text
+        return urlencode(sorted(pairs.items()))
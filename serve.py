@@ -0,0 +1,154 @@
+"""Запуск приложения в несколько процессов с общими кэшами
+
+Родительский процесс один раз прогревает состояние (дерево производителей,
+горячие детали автомобилей из общего кэша, скомпилированные шаблоны),
+затем открывает сокет и делает fork нужного числа воркеров uvicorn.
+Воркеры наследуют прогретую память и разделяют кэши через SQLite
+в разделяемой памяти (/dev/shm).
+
+Упавший воркер перезапускается с экспоненциальной задержкой; если за
+--restart-window секунд упало --restart-max воркеров, мастер останавливает
+остальные и завершается с ошибкой, а не перезапускает их бесконечно.
+
+Запуск:
+    python serve.py --workers 4 --port 5000
+"""
+import argparse
+import asyncio
+import os
+import signal
+import socket
+import sys
+import time
+from collections import deque
+
+import uvicorn
+
+
+def configure_shared_tier(shared_dir: str):
+    """Включает общие для воркеров кэш ответов, хранилище сессий и результаты синхронизаций"""
+    os.environ.setdefault('ENCAR_DISK_CACHE_PATH', os.path.join(shared_dir, 'cache.db'))
+    os.environ.setdefault('ENCAR_DISK_CACHE_ENDPOINTS', 'car_info,simple_search,get_fuel,get_transmission')
+    os.environ.setdefault('ENCAR_SESSION_BACKEND', 'sqlite')
+    os.environ.setdefault('ENCAR_SESSION_DB_PATH', os.path.join(shared_dir, 'sessions.db'))
+    # Синхронизации с API ведет один воркер, остальные читают его результаты
+    os.environ.setdefault('ENCAR_LEADER_LOCK_PATH', os.path.join(shared_dir, 'leader.lock'))
+    os.environ.setdefault('ENCAR_MANUFACTURERS_SHARED_PATH', os.path.join(shared_dir, 'manufacturers.json'))
+    os.environ.setdefault('ENCAR_LISTING_STORE_PATH', os.path.join(shared_dir, 'listings.db'))
+
+
+async def warmup():
+    """Прогрев до fork: воркеры получат результат через copy-on-write"""
+    from decouple import config
+    from routes.car_details import precompile_inspection_templates
+    from services.catalog_service import encar_client, manufacturer_snapshot
+    
+    started = time.perf_counter()
+    await encar_client.warm_from_disk(config('ENCAR_DISK_CACHE_WARM', default=500, cast=int))
+    await manufacturer_snapshot.refresh()
+    precompile_inspection_templates()
+    # Пул соединений и файлы не должны переходить через fork
+    await encar_client.aclose()
+    print(f"✅ Прогрев завершен за {time.perf_counter() - started:.2f} с")
+
+
+def create_socket(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def spawn_worker(app, sock: socket.socket, log_level: str) -> int:
+    pid = os.fork()
+    if pid == 0:
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        server = uvicorn.Server(uvicorn.Config(app, lifespan='on', log_level=log_level))
+        try:
+            server.run(sockets=[sock])
+        finally:
+            os._exit(0)
+    return pid
+
+
+def restart_delay(failures: int, base: float, limit: float) -> float:
+    """Задержка перед перезапуском: base, 2*base, 4*base ... не больше limit"""
+    return min(base * 2 ** max(failures - 1, 0), limit)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--shared-dir', default='/dev/shm/encar')
+    parser.add_argument('--log-level', default='warning')
+    parser.add_argument('--restart-max', type=int, default=5,
+                        help='сколько падений воркеров за --restart-window секунд допустимо')
+    parser.add_argument('--restart-window', type=float, default=60)
+    parser.add_argument('--restart-backoff', type=float, default=0.5,
+                        help='начальная задержка перезапуска, удваивается с каждым падением в окне')
+    parser.add_argument('--restart-backoff-max', type=float, default=30)
+    args = parser.parse_args()
+    
+    configure_shared_tier(args.shared_dir)
+    
+    from main import app
+    asyncio.run(warmup())
+    
+    sock = create_socket(args.host, args.port)
+    workers = {spawn_worker(app, sock, args.log_level) for _ in range(args.workers)}
+    print(f"🚀 Запущено воркеров: {len(workers)} на {args.host}:{args.port}")
+    
+    stopping = False
+    exit_code = 0
+    failures = deque()
+    
+    def shutdown(signum=None, frame=None):
+        nonlocal stopping
+        stopping = True
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+    
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
+    
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        workers.discard(pid)
+        if stopping:
+            continue
+        
+        now = time.monotonic()
+        failures.append(now)
+        while failures and failures[0] <= now - args.restart_window:
+            failures.popleft()
+        if len(failures) >= args.restart_max:
+            print(f"❌ Воркеры упали {len(failures)} раз за {args.restart_window:.0f} с, остановка")
+            exit_code = 1
+            shutdown()
+            continue
+        
+        delay = restart_delay(len(failures), args.restart_backoff, args.restart_backoff_max)
+        print(f"⚠️ Воркер {pid} завершился (status={status}), перезапуск через {delay:.1f} с")
+        time.sleep(delay)
+        if not stopping:
+            workers.add(spawn_worker(app, sock, args.log_level))
+    
+    sock.close()
+    sys.exit(exit_code)
+
+
+if __name__ == '__main__':
+    main()
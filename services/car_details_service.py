@@ -0,0 +1,80 @@
+"""Сервис пакетной загрузки деталей автомобилей"""
+import asyncio
+from decouple import config
+from api.circuit_breaker import UpstreamUnavailable
+from services.catalog_service import encar_client
+from utils.metrics import error_code
+
+BATCH_MAX_IDS = config('ENCAR_BATCH_MAX_IDS', default=50, cast=int)
+BATCH_CONCURRENCY = config('ENCAR_BATCH_CONCURRENCY', default=8, cast=int)
+
+class CarDetailsService:
+    @staticmethod
+    def parse_car_ids(raw_ids):
+        """Уникальные id в исходном порядке; ValueError при неверном списке"""
+        if not isinstance(raw_ids, list) or not raw_ids:
+            raise ValueError("car_ids должен быть непустым списком")
+        car_ids = list(dict.fromkeys(int(car_id) for car_id in raw_ids))
+        if len(car_ids) > BATCH_MAX_IDS:
+            raise ValueError(f"Не более {BATCH_MAX_IDS} автомобилей за запрос")
+        return car_ids
+    
+    @staticmethod
+    async def iter_batch(car_ids, lang="eng", request=None):
+        """Результаты по каждому автомобилю по мере готовности.
+        
+        Закэшированные детали отдаются сразу, остальные запрашиваются
+        параллельно, не более BATCH_CONCURRENCY одновременно. Ошибка одного
+        автомобиля попадает в его результат и не прерывает пакет; при отключении
+        клиента (request) незавершенные запросы отменяются.
+        """
+        missing = []
+        for car_id in car_ids:
+            try:
+                cached = encar_client.peek_car_details(car_id, lang)
+            except Exception as e:
+                yield CarDetailsService._result(car_id, error=e)
+                continue
+            if cached is None:
+                missing.append(car_id)
+            else:
+                yield CarDetailsService._result(car_id, cached, cached=True)
+        
+        if not missing:
+            return
+        
+        semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+        
+        async def fetch(car_id):
+            async with semaphore:
+                try:
+                    return CarDetailsService._result(car_id, await encar_client.get_car_details(car_id, lang))
+                except Exception as e:
+                    return CarDetailsService._result(car_id, error=e)
+        
+        tasks = [asyncio.ensure_future(fetch(car_id)) for car_id in missing]
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                if request is not None and await request.is_disconnected():
+                    break
+                yield await next_result
+        finally:
+            for task in tasks:
+                task.cancel()
+    
+    @staticmethod
+    def _result(car_id, car_data=None, error=None, cached=False):
+        if error is not None:
+            code = error_code(str(error))
+            result = {
+                'car_id': car_id,
+                'status': 'error',
+                'error': 'NOT_FOUND' if code == 'API_ERROR_404' else code,
+                'message': str(error)
+            }
+            if isinstance(error, UpstreamUnavailable):
+                result['retry_after'] = round(error.retry_after, 1)
+            return result
+        if not car_data or car_data.get('status') != 'success':
+            return {'car_id': car_id, 'status': 'error', 'error': 'NOT_FOUND', 'message': 'Car not found'}
+        return {'car_id': car_id, 'status': 'success', 'cached': cached, 'data': car_data}
@@ -1,42 +1,122 @@
 """Сервис для работы с каталогом"""
-from api.web_encar_client import WebEncarClient
+from decouple import config
+from api.web_encar_client import WebEncarClient, search_total
+from api.circuit_breaker import UpstreamUnavailable
 from services.currency_service import CurrencyService
+from services.manufacturer_snapshot import ManufacturerSnapshot
+from services.facet_index import FacetIndex
+from services.listing_index import ListingSnapshot, CATEGORY_FIELDS
+from services.listing_store import ListingStore
+from services.prefetch_service import PrefetchService
+from utils.leader import LeaderLock
 
 encar_client = WebEncarClient()
+manufacturer_snapshot = ManufacturerSnapshot(
+    encar_client,
+    refresh_interval=config('ENCAR_MANUFACTURERS_REFRESH', default=3600, cast=float),
+    shared_path=config('ENCAR_MANUFACTURERS_SHARED_PATH', default='')
+)
+# Фоновые синхронизации с API ведет один воркер (serve.py задает общий файл блокировки)
+background_leader = LeaderLock(config('ENCAR_LEADER_LOCK_PATH', default=''))
+facet_index = FacetIndex(
+    encar_client,
+    snapshot=manufacturer_snapshot,
+    refresh_interval=config('ENCAR_FACETS_REFRESH', default=900, cast=float),
+    max_entries=config('ENCAR_FACETS_MAX_ENTRIES', default=2000, cast=int)
+)
+LISTING_STORE_PATH = config('ENCAR_LISTING_STORE_PATH', default='')
+listing_snapshot = ListingSnapshot(
+    encar_client,
+    enabled=config('ENCAR_LISTING_INDEX_ENABLED', default=False, cast=bool),
+    refresh_interval=config('ENCAR_LISTING_INDEX_REFRESH', default=900, cast=float),
+    max_age=config('ENCAR_LISTING_INDEX_MAX_AGE', default=1800, cast=float),
+    page_size=config('ENCAR_LISTING_INDEX_PAGE_SIZE', default=100, cast=int),
+    pages_per_second=config('ENCAR_LISTING_SYNC_PAGES_PER_SECOND', default=2.0, cast=float),
+    store=ListingStore(LISTING_STORE_PATH) if LISTING_STORE_PATH else None
+)
+catalog_prefetcher = PrefetchService(
+    encar_client,
+    max_concurrent=config('ENCAR_PREFETCH_CONCURRENCY', default=4, cast=int)
+)
+PREFETCH_ENABLED = config('ENCAR_PREFETCH_ENABLED', default=True, cast=bool)
 
 class CatalogService:
     @staticmethod
     def get_manufacturers():
-        try:
-            response = encar_client.simple_search(
-                car_data={},
-                pagination={"limit": 1, "offset": 0},
-                filters={}
-            )
-            if response and 'children' in response:
-                return response['children'].get('manufacturer', [])[:20]
-        except Exception as e:
-            print(f"Error loading manufacturers: {e}")
-        return []
+        """Производители из снимка в памяти - без обращения к API"""
+        return manufacturer_snapshot.get_manufacturers()[:20]
     
     @staticmethod
-    def get_catalog_data(car_data, filters, sorting, pagination):
+    async def get_catalog_data(car_data, filters, sorting, pagination, use_cache=True, prefetch_next=False,
+                               currencies=('RUB',), rates_version=None, price_currency=None):
+        """Страница каталога с ценами, пересчитанными по одной версии курса.
+        
+        rates_version закрепляет курс, с которым были показаны предыдущие
+        страницы; если версия уже не хранится, используется текущая.
+        С price_currency границы цены в фильтрах заданы в этой валюте и
+        переводятся в воны по тому же курсу.
+        """
         try:
             clean_filters = {k: v for k, v in filters.items() if v is not None}
+            if price_currency:
+                clean_filters, rates_version = CurrencyService.filters_to_won(
+                    clean_filters, price_currency, rates_version
+                )
+            
+            if prefetch_next:
+                catalog_prefetcher.record_request(
+                    encar_client.search_cache_key(car_data, pagination, clean_filters, sorting)
+                )
             
-            response = encar_client.simple_search(
-                car_data=car_data,
-                pagination=pagination,
-                filters=clean_filters,
-                sorting=sorting
-            )
+            # Локальный индекс отвечает на типовые фильтры без похода в API
+            response = listing_snapshot.query(car_data, clean_filters, sorting, pagination) if use_cache else None
+            from_index = response is not None
+            if not from_index:
+                response = await encar_client.simple_search(
+                    car_data=car_data,
+                    pagination=pagination,
+                    filters=clean_filters,
+                    sorting=sorting,
+                    use_cache=use_cache
+                )
             
             if response and 'cars' in response:
-                for car in response['cars']:
-                    if car.get('price') is not None:
-                        car['price_rub'] = CurrencyService.convert_to_rub(car['price'])
+                # Ответ может быть из кэша - не изменяем его, а копируем
+                cars, version = CurrencyService.add_prices(response['cars'], currencies, rates_version)
+                response = {**response, 'cars': cars, 'rates_version': version}
+                
+                if prefetch_next and PREFETCH_ENABLED and not from_index:
+                    catalog_prefetcher.schedule_next_page(
+                        car_data, clean_filters, sorting, pagination, search_total(response)
+                    )
             
             return response
+        except UpstreamUnavailable:
+            # Отдается роутом как 503 с Retry-After
+            raise
         except Exception as e:
             print(f"Catalog data error: {e}")
             return None
+    
+    @staticmethod
+    async def get_facets(car_data):
+        """Фасеты ветки каталога со счетчиками из локального индекса объявлений.
+        
+        API отдает только значения фасетов, поэтому счетчики есть лишь при
+        включенном и свежем индексе (ENCAR_LISTING_INDEX_ENABLED); иначе count
+        равен None, а поле counts ответа - False.
+        """
+        entry = await facet_index.get(car_data)
+        facets = entry['facets']
+        
+        fields = {entity: CATEGORY_FIELDS[entity] for entity in facets if entity in CATEGORY_FIELDS}
+        counts = listing_snapshot.facet_counts(car_data, list(fields.values())) if fields else None
+        if counts:
+            facets = {
+                entity: [
+                    {**item, 'count': counts[fields[entity]].get(item['value'], 0)} if entity in fields else item
+                    for item in items
+                ]
+                for entity, items in facets.items()
+            }
+        return {'total': entry['total'], 'counts': bool(counts), 'facets': facets}
@@ -1,29 +1,76 @@
 """Сервис для работы с валютами"""
+from typing import Any, Dict, List, Optional, Tuple
+
+from services.rates_provider import rates_provider, CURRENCIES
+
+
 class CurrencyService:
-    KRW_TO_RUB_RATE = 0.057279
+    @staticmethod
+    def get_exchange_rate(currency: str = 'RUB', version: Optional[str] = None) -> float:
+        return rates_provider.get(version).rates[currency]
     
     @staticmethod
-    def get_exchange_rate() -> float:
-        return CurrencyService.KRW_TO_RUB_RATE
+    def get_rates(version: Optional[str] = None) -> Dict[str, Any]:
+        """Курсы закрепленной (если она еще хранится) или текущей версии"""
+        return rates_provider.get(version).to_dict()
     
     @staticmethod
     def convert_to_rub(price_won: float) -> int:
         if price_won is None:
             return None
         try:
-            rate = CurrencyService.get_exchange_rate()
-            return int(price_won * 10000 * rate / 1000)
+            return rates_provider.get().convert([price_won], 'RUB')[0]
         except (TypeError, ValueError) as e:
             print(f"Currency conversion error: {e}")
             return None
     
     @staticmethod
-    def convert_to_won(price_rub: float) -> int:
+    def convert_to_won(price_rub: float, version: Optional[str] = None) -> int:
         if price_rub is None:
             return None
         try:
-            rate = CurrencyService.get_exchange_rate()
-            return int(price_rub * 1000 / rate / 10000)
-        except (TypeError, ValueError) as e:
+            return rates_provider.get(version).to_won(price_rub, 'RUB')
+        except (TypeError, ValueError, ZeroDivisionError) as e:
             print(f"Currency conversion error: {e}")
             return None
+    
+    @staticmethod
+    def filters_to_won(filters: Dict[str, Any], currency: str = 'RUB',
+                       version: Optional[str] = None) -> Tuple[Dict[str, Any], str]:
+        """Переводит границы цены фильтров из тысяч currency в единицы API.
+        
+        Считает по той же версии курса, что и цены страницы (version), и
+        возвращает копию фильтров и эту версию - границы фильтра и показанные
+        цены не расходятся при смене курса.
+        """
+        if currency not in CURRENCIES:
+            raise ValueError(f"Неизвестная валюта фильтра цены: {currency}")
+        table = rates_provider.get(version)
+        converted = dict(filters)
+        for key in ('price_min', 'price_max'):
+            if converted.get(key) not in (None, ''):
+                converted[key] = table.to_won(float(converted[key]), currency)
+        return converted, table.version
+    
+    @staticmethod
+    def add_prices(cars: List[Dict[str, Any]], currencies=('RUB',),
+                   version: Optional[str] = None) -> Tuple[List[Dict[str, Any]], str]:
+        """Пересчитывает цены страницы одной пачкой по одной версии курса.
+        
+        Возвращает копии автомобилей с полями price_rub/price_usd/price_eur
+        (в тысячах единиц валюты) и версию курса, по которой считали.
+        Исходные словари не изменяются - они могут быть из кэша.
+        """
+        table = rates_provider.get(version)
+        currencies = [currency for currency in currencies if currency in CURRENCIES]
+        indexes = [i for i, car in enumerate(cars) if isinstance(car.get('price'), (int, float))]
+        prices = [cars[i]['price'] for i in indexes]
+        
+        converted = {currency: table.convert(prices, currency) for currency in currencies}
+        result = list(cars)
+        for position, i in enumerate(indexes):
+            result[i] = {
+                **cars[i],
+                **{f'price_{currency.lower()}': converted[currency][position] for currency in currencies}
+            }
+        return result, table.version
@@ -0,0 +1,159 @@
+"""Сервис потоковой выгрузки каталога"""
+import asyncio
+import csv
+import io
+import json
+from collections import deque
+from decouple import config
+from api.web_encar_client import search_total
+from services.catalog_service import encar_client
+from services.currency_service import CurrencyService
+from utils.http_cache import serialize_json
+
+EXPORT_PAGE_SIZE = config('ENCAR_EXPORT_PAGE_SIZE', default=50, cast=int)
+EXPORT_PREFETCH = config('ENCAR_EXPORT_PREFETCH', default=3, cast=int)
+EXPORT_MAX_ROWS = config('ENCAR_EXPORT_MAX_ROWS', default=50000, cast=int)
+
+class ExportError(Exception):
+    """Страница каталога не загружена: выгрузка не начата или оборвана"""
+    
+    code = 'EXPORT_INCOMPLETE'
+
+
+class ExportTruncated(ExportError):
+    """Выгрузка остановлена на лимите EXPORT_MAX_ROWS, в каталоге есть еще строки"""
+    
+    code = 'EXPORT_TRUNCATED'
+
+
+class ExportService:
+    @staticmethod
+    async def fetch_page(car_data, clean_filters, sorting, offset):
+        """Страница simple_search мимо общего кэша ответов; неуспешный ответ - ExportError.
+        
+        Выгрузка обходит до EXPORT_MAX_ROWS строк один раз - в кэше ее страницы
+        только вытеснили бы записи пользовательских запросов.
+        """
+        response = await encar_client.simple_search(
+            car_data=car_data,
+            pagination={"limit": EXPORT_PAGE_SIZE, "offset": offset},
+            filters=clean_filters,
+            sorting=sorting,
+            use_cache=False,
+            store=False
+        )
+        if not response or response.get('status') != 'success':
+            raise ExportError(f"страница со смещением {offset} не загружена")
+        return response
+    
+    @staticmethod
+    async def start(car_data, filters, sorting, request=None):
+        """Загружает и проверяет первую страницу до начала ответа и возвращает генератор строк.
+        
+        Ошибка первой страницы (ExportError, UpstreamUnavailable) всплывает
+        из start(), поэтому роут отвечает кодом ошибки, а не пустым файлом.
+        """
+        clean_filters = {k: v for k, v in filters.items() if v is not None}
+        first_page = await ExportService.fetch_page(car_data, clean_filters, sorting, 0)
+        return ExportService.iter_cars(car_data, clean_filters, sorting, first_page, request)
+    
+    @staticmethod
+    async def iter_cars(car_data, clean_filters, sorting, first_page, request=None):
+        """Обходит все страницы simple_search, держа в работе не более EXPORT_PREFETCH страниц.
+        
+        Страницы отдаются по порядку; при отключении клиента (request) или
+        закрытии генератора незавершенные запросы отменяются. Сбой страницы
+        после начала ответа - ExportError, а достижение EXPORT_MAX_ROWS при
+        оставшихся строках - ExportTruncated; поток превращает их в запись об ошибке.
+        """
+        # Вся выгрузка считается по курсу на момент ее начала
+        rates_version = CurrencyService.get_rates()['version']
+        pending = deque()
+        next_offset = EXPORT_PAGE_SIZE
+        total = search_total(first_page)
+        sent = 0
+        
+        def schedule():
+            nonlocal next_offset
+            while len(pending) < EXPORT_PREFETCH and next_offset < EXPORT_MAX_ROWS:
+                if total is not None and next_offset >= total:
+                    break
+                pending.append(asyncio.ensure_future(
+                    ExportService.fetch_page(car_data, clean_filters, sorting, next_offset)
+                ))
+                next_offset += EXPORT_PAGE_SIZE
+        
+        try:
+            response = first_page
+            while True:
+                cars, _ = CurrencyService.add_prices(response.get('cars') or [], version=rates_version)
+                for car in cars:
+                    if sent >= EXPORT_MAX_ROWS:
+                        raise ExportTruncated(f"выгружено {sent} строк из {total or 'более'}")
+                    sent += 1
+                    yield car
+                
+                if len(cars) < EXPORT_PAGE_SIZE:
+                    break
+                schedule()
+                if not pending:
+                    if next_offset >= EXPORT_MAX_ROWS and (total is None or total > sent):
+                        raise ExportTruncated(f"выгружено {sent} строк из {total or 'более'}")
+                    break
+                if request is not None and await request.is_disconnected():
+                    break
+                try:
+                    response = await pending.popleft()
+                except ExportError:
+                    raise
+                except Exception as e:
+                    raise ExportError(f"после {sent} строк: {e}") from e
+        finally:
+            for task in pending:
+                task.cancel()
+    
+    @staticmethod
+    def error_record(error: Exception) -> dict:
+        """Последняя запись оборванной выгрузки: клиент отличает ее от полного файла"""
+        print(f"Export error: {error}")
+        return {'error': error.code, 'message': str(error)}
+    
+    @staticmethod
+    async def stream_ndjson(cars):
+        """Построчный JSON: один автомобиль на строку, при обрыве - строка с ошибкой"""
+        try:
+            async for car in cars:
+                yield serialize_json(car) + b'\n'
+        except ExportError as e:
+            yield serialize_json(ExportService.error_record(e)) + b'\n'
+    
+    @staticmethod
+    async def stream_csv(cars):
+        """CSV с заголовком по полям первого автомобиля, вложенные значения - в JSON.
+        
+        При обрыве выгрузки последней строкой пишется #EXPORT_INCOMPLETE
+        (или #EXPORT_TRUNCATED на лимите строк) с причиной.
+        """
+        buffer = io.StringIO()
+        writer = None
+        
+        try:
+            async for car in cars:
+                if writer is None:
+                    fieldnames = list(car.keys())
+                    if 'price_rub' not in fieldnames:
+                        fieldnames.append('price_rub')
+                    writer = csv.DictWriter(buffer, fieldnames=fieldnames, extrasaction='ignore')
+                    writer.writeheader()
+                
+                writer.writerow({
+                    key: json.dumps(value, ensure_ascii=False) if isinstance(value, (dict, list)) else value
+                    for key, value in car.items()
+                })
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate(0)
+        except ExportError as e:
+            record = ExportService.error_record(e)
+            csv.writer(buffer).writerow(['#' + record['error'], record['message']])
+            yield buffer.getvalue()
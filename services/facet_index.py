@@ -0,0 +1,198 @@
+"""Локальный индекс фасетов каталога, синхронизируемый в фоне"""
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from collections.abc import Mapping
+from typing import Any, Dict, List, Optional
+
+from api.web_encar_client import search_total
+
+NAVIGATION_KEYS = ('manufacturer', 'modelgroup', 'model', 'badgegroup', 'badge')
+
+
+class FacetIndex:
+    """Фасеты (дочерние элементы навигации, топливо, КПП) по выбранной ветке каталога.
+    
+    Одна запись заменяет три запроса к API: simple_search с limit 1 ради children,
+    get_fuel и get_transmission. Корень, производители и ветки, которые запрашивали
+    за последние два интервала, обновляются фоновой задачей раз в refresh_interval;
+    остальные записи обновляются в фоне при следующем чтении.
+    К API при чтении обращаемся только при промахе.
+    Фоновую синхронизацию ведет только ведущий воркер; остальные (leader=False)
+    обновляют записи через кэш ответов, общий для воркеров на диске.
+    """
+    
+    def __init__(self, client, snapshot=None, refresh_interval: float = 900,
+                 max_entries: int = 2000, sync_concurrency: int = 4):
+        self.client = client
+        self.snapshot = snapshot
+        self.refresh_interval = refresh_interval
+        self.max_entries = max_entries
+        self.sync_concurrency = sync_concurrency
+        self.hits = 0
+        self.misses = 0
+        self.synced = 0
+        self.last_sync = 0.0
+        self._entries: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._accessed: Dict[str, float] = {}
+        self._refreshing: Dict[str, asyncio.Task] = {}
+        self._loop_task: Optional[asyncio.Task] = None
+        self.leader = True
+    
+    async def start(self, leader: bool = True):
+        """Запускает фоновую синхронизацию (первый проход - сразу) в ведущем воркере"""
+        self.leader = leader
+        if leader:
+            self._loop_task = asyncio.create_task(self._sync_loop())
+    
+    async def stop(self):
+        tasks = [self._loop_task, *self._refreshing.values()]
+        for task in tasks:
+            if task and not task.done():
+                task.cancel()
+        self._loop_task = None
+        self._refreshing.clear()
+    
+    async def get(self, car_data: Dict) -> Dict[str, Any]:
+        """Фасеты для ветки каталога: из индекса, при промахе - из API"""
+        key = self.make_key(car_data)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            self._accessed[key] = time.time()
+            self._entries.move_to_end(key)
+            if time.time() - entry['synced_at'] > self.refresh_interval:
+                self._schedule_refresh(key)
+            return entry
+        
+        self.misses += 1
+        entry = await self.refresh(key, use_cache=True)
+        if key in self._entries:
+            self._accessed[key] = time.time()
+        return entry
+    
+    async def refresh(self, key: str, use_cache: bool = False) -> Dict[str, Any]:
+        """Загружает фасеты ветки из API и сохраняет их в индекс.
+        
+        Ошибка simple_search пробрасывается; если не загрузились топливо или КПП,
+        частичный ответ отдается, но в индекс не попадает.
+        """
+        car_data = json.loads(key)
+        search, fuels, transmissions = await asyncio.gather(
+            self.client.simple_search(
+                car_data=car_data,
+                pagination={"limit": 1, "offset": 0},
+                filters={},
+                use_cache=use_cache
+            ),
+            self.client.get_available_fuels(car_data, use_cache),
+            self.client.get_available_transmissions(car_data, use_cache),
+            return_exceptions=True
+        )
+        if isinstance(search, BaseException):
+            raise search
+        
+        facets = {
+            entity: [self._facet_value(item) for item in items]
+            for entity, items in (search or {}).get('children', {}).items()
+            if isinstance(items, list)
+        }
+        complete = True
+        for entity, response in (('fuel', fuels), ('transmission', transmissions)):
+            if isinstance(response, Mapping) and response.get('status') == 'success':
+                facets[entity] = [self._facet_value(item) for item in response.get('data', [])]
+            else:
+                facets[entity] = []
+                complete = False
+        
+        entry = {
+            'car_data': car_data,
+            'total': search_total(search),
+            'facets': facets,
+            'synced_at': time.time()
+        }
+        if complete:
+            self._store(key, entry)
+        return entry
+    
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'synced': self.synced,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            'last_sync_age': round(time.time() - self.last_sync, 1) if self.last_sync else None
+        }
+    
+    @staticmethod
+    def make_key(car_data: Optional[Dict]) -> str:
+        """Канонический ключ ветки: только навигационные поля, списки отсортированы"""
+        normalized = {}
+        for name in NAVIGATION_KEYS:
+            value = (car_data or {}).get(name)
+            if not value:
+                continue
+            normalized[name] = sorted(value) if isinstance(value, list) else value
+        return json.dumps(normalized, sort_keys=True, ensure_ascii=False)
+    
+    @staticmethod
+    def _facet_value(item) -> Dict[str, Any]:
+        """Элемент фасета: API отдает строки или объекты с name/count"""
+        if isinstance(item, dict):
+            return {
+                'value': item.get('name', item.get('value')),
+                'count': item.get('count')
+            }
+        return {'value': item, 'count': None}
+    
+    def _store(self, key: str, entry: Dict[str, Any]) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            evicted, _ = self._entries.popitem(last=False)
+            self._accessed.pop(evicted, None)
+    
+    def _schedule_refresh(self, key: str) -> asyncio.Task:
+        """Фоновое обновление ветки; повторный вызов возвращает уже идущую задачу"""
+        task = self._refreshing.get(key)
+        if task is None or task.done():
+            task = self._refreshing[key] = asyncio.create_task(self._safe_refresh(key))
+        return task
+    
+    async def _safe_refresh(self, key: str) -> None:
+        try:
+            # Не ведущий воркер берет ответы, которые ведущий уже сохранил в общий кэш
+            await self.refresh(key, use_cache=not self.leader)
+            self.synced += 1
+        except Exception as e:
+            print(f"Facet index: ошибка обновления {key}: {e}")
+        finally:
+            self._refreshing.pop(key, None)
+    
+    def _sync_keys(self) -> List[str]:
+        """Ветки для синхронизации: корень, производители и недавно запрошенные"""
+        keys = [self.make_key({})]
+        if self.snapshot is not None:
+            keys.extend(self.make_key({'manufacturer': m}) for m in self.snapshot.get_manufacturers())
+        active_since = time.time() - 2 * self.refresh_interval
+        keys.extend(key for key in self._entries if self._accessed.get(key, 0) >= active_since)
+        return list(dict.fromkeys(keys))
+    
+    async def sync(self) -> None:
+        """Один проход синхронизации с ограничением параллельности"""
+        semaphore = asyncio.Semaphore(self.sync_concurrency)
+        
+        async def sync_one(key):
+            async with semaphore:
+                await self._schedule_refresh(key)
+        
+        await asyncio.gather(*(sync_one(key) for key in self._sync_keys()))
+        self.last_sync = time.time()
+    
+    async def _sync_loop(self):
+        while True:
+            await self.sync()
+            await asyncio.sleep(self.refresh_interval)
@@ -0,0 +1,53 @@
+"""Сервис отчетов осмотра"""
+import hashlib
+import json
+from decouple import config
+from api.response_cache import ResponseCache, make_cache_key
+from utils.inspection_generator import InspectionGenerator
+from utils.translations import TRANSLATIONS
+from utils.profiling import phase
+
+inspection_generator = InspectionGenerator()
+
+# Опубликованный акт осмотра не меняется, поэтому TTL большой,
+# а объем ограничен LRU-бюджетом
+report_cache = ResponseCache(
+    max_bytes=config('ENCAR_INSPECTION_CACHE_MAX_BYTES', default=16 * 1024 * 1024, cast=int),
+    ttls={'inspection_report': config('ENCAR_INSPECTION_CACHE_TTL', default=86400.0, cast=float)}
+)
+
+class InspectionService:
+    @staticmethod
+    def get_report(car_id, car_info_data, lang, etag=None):
+        """Возвращает данные отчета осмотра, генерируя их только при промахе кэша.
+        
+        etag - ETag записи car_info в кэше ответов: он уже вычислен при записи,
+        поэтому данные хэшируются заново, только если записи в кэше нет.
+        Язык без перевода заменяется русским - и на промахе, и на попадании.
+        """
+        if lang not in TRANSLATIONS:
+            lang = 'ru'
+        cache_key = make_cache_key('inspection_report', {
+            'car_id': car_id,
+            'lang': lang,
+            'content': etag or InspectionService._content_hash(car_info_data)
+        })
+        
+        cached = report_cache.get(cache_key)
+        if cached is not None:
+            return {**cached, 'translations': TRANSLATIONS.get(lang, TRANSLATIONS['ru'])}
+        
+        with phase('generate'):
+            report_data = inspection_generator.generate_report(car_info_data, lang)
+        if report_data and not report_data.get('error'):
+            # Словарь переводов общий для всех отчетов - не храним его копию в кэше
+            report_cache.set('inspection_report', cache_key,
+                             {k: v for k, v in report_data.items() if k != 'translations'})
+        return report_data
+    
+    @staticmethod
+    def _content_hash(car_info_data):
+        """Хэш данных, из которых строится отчет"""
+        content = {key: car_info_data.get(key) for key in ('info', 'checkup', 'open_data')}
+        canonical = json.dumps(content, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
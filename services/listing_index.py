@@ -0,0 +1,512 @@
+"""Локальный колоночный индекс объявлений для фильтрации и сортировки без обращения к API"""
+import asyncio
+import hashlib
+import json
+import time
+from typing import Any, Dict, List, Optional, Set
+
+from api.web_encar_client import search_total
+
+try:
+    import numpy as np
+except ImportError:  # индекс необязателен: без NumPy каталог обслуживает API
+    np = None
+
+# Сортировки, которые индекс умеет выполнять сам: sort_order -> поле объявления
+SORT_FIELDS = {
+    'price': 'price',
+    'year': 'year',
+    'mileage': 'mileage',
+    'car_id': 'car_id',
+}
+
+RANGE_FILTERS = {
+    'price_min': ('price', '>='),
+    'price_max': ('price', '<='),
+    'year_min': ('form_year', '>='),
+    'year_max': ('form_year', '<='),
+    'mileage_min': ('mileage', '>='),
+    'mileage_max': ('mileage', '<='),
+}
+
+# Категориальные колонки: ключ car_data/filters -> поле объявления
+CATEGORY_FIELDS = {
+    'manufacturer': 'manufacturer',
+    'modelgroup': 'model_group',
+    'model': 'model',
+    'fuel': 'fuel_type',
+    'transmission': 'transmission',
+}
+
+NUMERIC_FIELDS = ('car_id', 'price', 'year', 'form_year', 'mileage')
+
+
+class ListingIndex:
+    """Неизменяемый снимок объявлений в колонках NumPy.
+    
+    Числовые поля хранятся массивами int64, категориальные - кодами словаря.
+    Порядок сортировки по каждому полю вычисляется один раз при построении
+    (при равенстве - по car_id), поэтому запрос - это маска фильтра,
+    выборка по готовому порядку и срез страницы, все за O(n) без сортировки.
+    """
+    
+    def __init__(self, cars: List[Dict[str, Any]]):
+        self.rows = cars
+        self.size = len(cars)
+        self.columns = {field: self._numeric_column(cars, field) for field in NUMERIC_FIELDS}
+        self.category_lookup: Dict[str, Dict[str, int]] = {}
+        self.codes: Dict[str, Any] = {}
+        for field in CATEGORY_FIELDS.values():
+            lookup: Dict[str, int] = {}
+            self.codes[field] = self._encode(cars, field, lookup)
+            self.category_lookup[field] = lookup
+        self._finish()
+    
+    def apply(self, upserts: List[Dict[str, Any]], removed_ids) -> 'ListingIndex':
+        """Новый индекс с примененной дельтой; текущий не изменяется.
+        
+        Колонки неизмененных объявлений переиспользуются, обход словарей в Python
+        нужен только для новых и измененных; порядки сортировки пересчитываются
+        векторно.
+        """
+        replaced = {self._number(car.get('car_id')) for car in upserts}
+        replaced.update(int(car_id) for car_id in removed_ids)
+        keep = ~np.isin(self.columns['car_id'], np.fromiter(replaced, dtype=np.int64, count=len(replaced)))
+        
+        index = ListingIndex.__new__(ListingIndex)
+        index.rows = [self.rows[i] for i in np.flatnonzero(keep).tolist()] + list(upserts)
+        index.size = len(index.rows)
+        index.columns = {
+            field: np.concatenate((column[keep], self._numeric_column(upserts, field)))
+            for field, column in self.columns.items()
+        }
+        index.category_lookup = {}
+        index.codes = {}
+        for field, codes in self.codes.items():
+            lookup = dict(self.category_lookup[field])
+            index.codes[field] = np.concatenate((codes[keep], self._encode(upserts, field, lookup)))
+            index.category_lookup[field] = lookup
+        index._finish()
+        return index
+    
+    def _finish(self) -> None:
+        """Список значений категорий и порядки сортировки по готовым колонкам"""
+        self.categories: Dict[str, List[str]] = {field: list(lookup) for field, lookup in self.category_lookup.items()}
+        id_rank = np.argsort(self.columns['car_id'], kind='stable')
+        self.sort_orders = {}
+        for sort_order, field in SORT_FIELDS.items():
+            # Стабильная сортировка по полю поверх сортировки по car_id
+            values = self.columns[field][id_rank]
+            self.sort_orders[sort_order] = id_rank[np.argsort(values, kind='stable')]
+    
+    def query(self, car_data: Dict, filters: Dict, sorting: Dict, pagination: Dict) -> Optional[Dict[str, Any]]:
+        """Ответ в формате simple_search или None, если запрос индексу не по силам"""
+        sort_order = (sorting or {}).get('sort_order', 'price')
+        direction = str((sorting or {}).get('sort_direction', 'ASC')).upper()
+        if sort_order not in SORT_FIELDS or direction not in ('ASC', 'DESC'):
+            return None
+        
+        mask = self.filter_mask(car_data, filters)
+        if mask is None:
+            return None
+        
+        order = self.sort_orders[sort_order]
+        if direction == 'DESC':
+            order = order[::-1]
+        matched = order[mask[order]]
+        
+        offset = int((pagination or {}).get('offset', 0))
+        limit = int((pagination or {}).get('limit', 20))
+        page = matched[offset:offset + limit]
+        # Та же форма, что у simple_search: фронтенд читает pagination.filtered_count
+        return {
+            'status': 'success',
+            'total': int(matched.size),
+            'pagination': {
+                'limit': limit,
+                'offset': offset,
+                'filtered_count': int(matched.size),
+                'total_count': self.size
+            },
+            'cars': [self.rows[i] for i in page.tolist()]
+        }
+    
+    def filter_mask(self, car_data: Dict, filters: Dict):
+        """Булева маска по навигации и фильтрам или None для неподдерживаемых условий"""
+        mask = np.ones(self.size, dtype=bool)
+        
+        for key, value in (car_data or {}).items():
+            if not value:
+                continue
+            if key not in CATEGORY_FIELDS or key in ('fuel', 'transmission'):
+                return None
+            if not self._apply_category(mask, CATEGORY_FIELDS[key], value):
+                return None
+        
+        for key, value in (filters or {}).items():
+            if value is None or value == '' or value == []:
+                continue
+            if key in RANGE_FILTERS:
+                field, operator = RANGE_FILTERS[key]
+                try:
+                    bound = int(value)
+                except (TypeError, ValueError):
+                    return None
+                column = self.columns[field]
+                mask &= (column >= bound) if operator == '>=' else (column <= bound)
+            elif key in ('fuel', 'transmission'):
+                if not self._apply_category(mask, CATEGORY_FIELDS[key], value):
+                    return None
+            else:
+                return None
+        return mask
+    
+    def facet_counts(self, car_data: Dict, fields: List[str]) -> Optional[Dict[str, Dict[str, int]]]:
+        """Число объявлений по значениям категориальных полей внутри ветки каталога"""
+        mask = self.filter_mask(car_data, {})
+        if mask is None:
+            return None
+        counts = {}
+        for field in fields:
+            column_counts = np.bincount(self.codes[field][mask], minlength=len(self.categories[field]))
+            counts[field] = {
+                name: int(count)
+                for name, count in zip(self.categories[field], column_counts.tolist())
+                if count and name
+            }
+        return counts
+    
+    def _apply_category(self, mask, field: str, value) -> bool:
+        """Сужает маску по значению (или списку значений) категории; False - тип не поддерживается"""
+        values = value if isinstance(value, list) else [value]
+        if not all(isinstance(v, str) for v in values):
+            return False
+        lookup = self.category_lookup[field]
+        wanted = [lookup[v] for v in values if v in lookup]
+        if not wanted:
+            mask[:] = False
+        elif len(wanted) == 1:
+            mask &= self.codes[field] == wanted[0]
+        else:
+            mask &= np.isin(self.codes[field], wanted)
+        return True
+    
+    @classmethod
+    def _numeric_column(cls, cars: List[Dict[str, Any]], field: str):
+        return np.fromiter((cls._number(car.get(field)) for car in cars), dtype=np.int64, count=len(cars))
+    
+    @staticmethod
+    def _encode(cars: List[Dict[str, Any]], field: str, lookup: Dict[str, int]):
+        """Коды значений категории; новые значения дописываются в lookup"""
+        return np.fromiter((lookup.setdefault(car.get(field) or '', len(lookup)) for car in cars),
+                           dtype=np.int32, count=len(cars))
+    
+    @staticmethod
+    def _number(value) -> int:
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return 0
+
+
+class ListingSnapshot:
+    """ListingIndex со всеми объявлениями каталога, синхронизируемый дельтами.
+    
+    Проход синхронизации читает каталог постранично (simple_search по car_id)
+    и сравнивает хэши содержимого с сохраненными: в индекс попадают только
+    новые и измененные объявления. Страницы перекрываются на overlap объявлений,
+    а если первая страница после сдвига начинается дальше последнего увиденного
+    car_id (снятых объявлений больше перекрытия), проход возвращается на страницу
+    назад. Снятыми считаются объявления, не увиденные два прохода подряд:
+    пропуск в одном проходе из-за сдвига страниц объявление не удаляет.
+    Проход продолжается с checkpoint'а после сбоя или рестарта (если задан
+    store) и ограничен по частоте страниц, а при загруженном лимитере API
+    уступает место пользовательским запросам.
+    
+    Пока индекс моложе max_age, CatalogService отвечает из него; иначе и при
+    неподдерживаемых фильтрах запросы идут в API как раньше.
+    """
+    
+    def __init__(self, client, enabled: bool = False, refresh_interval: float = 900,
+                 max_age: float = 1800, page_size: int = 100, pages_per_second: float = 2.0,
+                 apply_every: int = 50, store=None, retry_interval: float = 60,
+                 max_listings: int = 2_000_000, overlap: Optional[int] = None):
+        if enabled and np is None:
+            print("Listing index: NumPy не установлен, локальный индекс отключен")
+        self.client = client
+        self.enabled = enabled and np is not None
+        self.refresh_interval = refresh_interval
+        self.max_age = max_age
+        self.page_size = page_size
+        self.overlap = min(max(overlap if overlap is not None else page_size // 10, 1), page_size - 1)
+        self.pages_per_second = pages_per_second
+        self.apply_every = apply_every
+        self.store = store
+        self.retry_interval = retry_interval
+        self.max_listings = max_listings
+        self.index: Optional[ListingIndex] = None
+        self.updated_at = 0.0
+        self.synced_at = 0.0
+        self.build_seconds = 0.0
+        self.queries = 0
+        self.fallbacks = 0
+        self.cars: Dict[int, Dict[str, Any]] = {}
+        self.hashes: Dict[int, str] = {}
+        self.checkpoint: Optional[Dict[str, Any]] = None
+        self.last_pass: Dict[str, Any] = {}
+        self.pages_loaded = 0
+        self.rewinds = 0
+        self.throttled = 0.0
+        self._seen: Set[int] = set()
+        # Не увиденные в последнем завершенном проходе: кандидаты на удаление
+        self._missed: Set[int] = set()
+        self._pending: Dict[int, Dict[str, Any]] = {}
+        self._next_page_at = 0.0
+        self._loop_task: Optional[asyncio.Task] = None
+    
+    async def start(self, leader: bool = True):
+        """Загружает сохраненную копию (если есть store) и запускает синхронизацию.
+        
+        Не ведущий воркер не синхронизируется с API, а перечитывает копию из store
+        после каждого завершенного прохода ведущего; без store он синхронизируется сам.
+        """
+        if not self.enabled:
+            return
+        if self.store is not None:
+            try:
+                await asyncio.to_thread(self._restore)
+            except Exception as e:
+                print(f"Listing index: сохраненная копия не загружена: {e}")
+        if leader or self.store is None:
+            self._loop_task = asyncio.create_task(self._sync_loop())
+        else:
+            self._loop_task = asyncio.create_task(self._follow_loop())
+    
+    async def stop(self):
+        if self._loop_task and not self._loop_task.done():
+            self._loop_task.cancel()
+        self._loop_task = None
+        if self.store is not None:
+            self.store.close()
+    
+    def is_fresh(self) -> bool:
+        return self.index is not None and time.time() - self.updated_at <= self.max_age
+    
+    def query(self, car_data: Dict, filters: Dict, sorting: Dict, pagination: Dict) -> Optional[Dict[str, Any]]:
+        """Ответ из индекса или None, если индекс устарел или запрос не поддерживается"""
+        if not self.is_fresh():
+            return None
+        response = self.index.query(car_data, filters, sorting, pagination)
+        if response is None:
+            self.fallbacks += 1
+        else:
+            self.queries += 1
+        return response
+    
+    def facet_counts(self, car_data: Dict, fields: List[str]) -> Optional[Dict[str, Dict[str, int]]]:
+        if not self.is_fresh():
+            return None
+        return self.index.facet_counts(car_data, fields)
+    
+    def replace(self, cars: List[Dict[str, Any]]) -> None:
+        """Строит новый индекс и подменяет текущий"""
+        started = time.perf_counter()
+        index = ListingIndex(cars)
+        self.build_seconds = time.perf_counter() - started
+        self.index = index
+        self.updated_at = time.time()
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'enabled': self.enabled,
+            'listings': self.index.size if self.index else 0,
+            'age': round(time.time() - self.updated_at, 1) if self.updated_at else None,
+            'fresh': self.is_fresh(),
+            'build_seconds': round(self.build_seconds, 3),
+            'queries': self.queries,
+            'fallbacks': self.fallbacks,
+            'sync': {
+                'checkpoint': self.checkpoint,
+                'pages_loaded': self.pages_loaded,
+                'rewinds': self.rewinds,
+                'throttled_seconds': round(self.throttled, 1),
+                'last_pass': self.last_pass
+            }
+        }
+    
+    async def sync(self) -> bool:
+        """Один проход синхронизации (или продолжение прерванного); False - проход прерван"""
+        if self.checkpoint is None:
+            self.checkpoint = {'pass': time.time_ns(), 'offset': 0, 'last_id': None, 'added': 0, 'changed': 0}
+            self._seen = set()
+        checkpoint = self.checkpoint
+        pages = 0
+        try:
+            while checkpoint['offset'] < self.max_listings:
+                await self._throttle()
+                page = await self._load_page(checkpoint['offset'])
+                cars = page.get('cars', [])
+                if self._has_gap(checkpoint, cars):
+                    # Снятых до этой страницы больше перекрытия - возвращаемся назад
+                    checkpoint['offset'] = max(checkpoint['offset'] - self.page_size, 0)
+                    self.rewinds += 1
+                    continue
+                await self._apply_page(checkpoint, cars)
+                pages += 1
+                if pages % self.apply_every == 0:
+                    await self._apply_pending([])
+                if len(cars) < self.page_size or checkpoint['offset'] >= (search_total(page) or 0):
+                    break
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Listing index: синхронизация прервана на смещении {checkpoint['offset']}: {e}")
+            await self._apply_pending([])
+            return False
+        
+        missed = {car_id for car_id in self.cars if car_id not in self._seen}
+        removed = [car_id for car_id in missed if car_id in self._missed]
+        for car_id in removed:
+            del self.cars[car_id]
+            self.hashes.pop(car_id, None)
+            self._pending.pop(car_id, None)
+        self._missed = missed.difference(removed)
+        if self.store is not None:
+            await asyncio.to_thread(self.store.finish_pass, checkpoint['pass'])
+        self.synced_at = time.time()
+        await self._apply_pending(removed)
+        
+        self.last_pass = {
+            'pass': checkpoint['pass'],
+            'listings': len(self.cars),
+            'added': checkpoint['added'],
+            'changed': checkpoint['changed'],
+            'removed': len(removed),
+            'missed': len(self._missed),
+            'finished_at': time.time()
+        }
+        self.checkpoint = None
+        self._seen = set()
+        return True
+    
+    def _has_gap(self, checkpoint: Dict[str, Any], cars: List[Dict[str, Any]]) -> bool:
+        """Страница начинается дальше последнего увиденного car_id - между ними пропуск"""
+        last_id = checkpoint.get('last_id')
+        if last_id is None or not cars or checkpoint['offset'] == 0:
+            return False
+        return self._car_id(cars[0]) > last_id
+    
+    @staticmethod
+    def _car_id(car: Dict[str, Any]) -> Optional[int]:
+        try:
+            return int(car.get('car_id'))
+        except (TypeError, ValueError):
+            return None
+    
+    async def _apply_page(self, checkpoint: Dict[str, Any], cars: List[Dict[str, Any]]) -> None:
+        """Сравнивает хэши страницы с копией и запоминает дельту"""
+        upserts, seen = [], []
+        for car in cars:
+            car_id = self._car_id(car)
+            if car_id is None:
+                continue
+            seen.append(car_id)
+            content_hash = self.content_hash(car)
+            previous = self.hashes.get(car_id)
+            if previous == content_hash:
+                continue
+            checkpoint['added' if previous is None else 'changed'] += 1
+            self.hashes[car_id] = content_hash
+            self.cars[car_id] = car
+            self._pending[car_id] = car
+            upserts.append((car_id, content_hash, car))
+        
+        self._seen.update(seen)
+        if seen:
+            checkpoint['last_id'] = max(max(seen), checkpoint.get('last_id') or 0)
+        # Следующая страница перекрывает конец текущей: сдвиг из-за снятых объявлений
+        # в пределах перекрытия не приводит к пропуску
+        checkpoint['offset'] += self.page_size - self.overlap
+        self.pages_loaded += 1
+        if self.store is not None:
+            await asyncio.to_thread(self.store.apply_page, dict(checkpoint), upserts, seen)
+    
+    async def _apply_pending(self, removed: List[int]) -> None:
+        """Применяет накопленную дельту к индексу в отдельном потоке"""
+        if not self.synced_at:
+            # Пока нет ни одного полного прохода, частичная копия в ответы не попадает
+            return
+        upserts = list(self._pending.values())
+        self._pending = {}
+        if self.index is None or len(upserts) > self.index.size // 5:
+            await asyncio.to_thread(self.replace, list(self.cars.values()))
+            return
+        if upserts or removed:
+            started = time.perf_counter()
+            self.index = await asyncio.to_thread(self.index.apply, upserts, removed)
+            self.build_seconds = time.perf_counter() - started
+        # Индекс сверен с API, даже если изменений не было
+        self.updated_at = time.time()
+    
+    async def _throttle(self) -> None:
+        """Не чаще pages_per_second страниц и только пока лимитер API не загружен"""
+        started = time.monotonic()
+        delay = self._next_page_at - started
+        if delay > 0:
+            await asyncio.sleep(delay)
+        
+        limiter = getattr(self.client, 'limiter', None)
+        while limiter is not None:
+            stats = limiter.stats()
+            if not stats['queued'] and stats['in_flight'] < stats['limit'] / 2:
+                break
+            await asyncio.sleep(0.5)
+        
+        now = time.monotonic()
+        self.throttled += now - started
+        self._next_page_at = now + 1 / self.pages_per_second
+    
+    def _restore(self) -> None:
+        """Поднимает копию, незавершенный проход и индекс из store"""
+        cars, hashes, checkpoint, seen, missed, synced_at = self.store.load()
+        self.cars, self.hashes = cars, hashes
+        self.checkpoint, self._seen, self._missed = checkpoint, seen, missed
+        self.synced_at = synced_at
+        if cars:
+            self.replace(list(cars.values()))
+            # Свежесть определяется временем синхронизации, а не загрузки с диска
+            self.updated_at = synced_at
+        print(f"Listing index: восстановлено {len(cars)} объявлений"
+              + (f", проход продолжится со смещения {checkpoint['offset']}" if checkpoint else ""))
+    
+    @staticmethod
+    def content_hash(car: Dict[str, Any]) -> str:
+        payload = json.dumps(car, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+        return hashlib.blake2b(payload.encode('utf-8'), digest_size=16).hexdigest()
+    
+    async def _load_page(self, offset: int) -> Dict[str, Any]:
+        response = await self.client.simple_search(
+            car_data={},
+            pagination={"limit": self.page_size, "offset": offset},
+            filters={},
+            sorting={"sort_order": "car_id", "sort_direction": "ASC"},
+            use_cache=False,
+            store=False
+        )
+        if not response or response.get('status') != 'success':
+            raise Exception(f"LISTING_PAGE_ERROR: страница {offset} не загружена")
+        return response
+    
+    async def _sync_loop(self):
+        while True:
+            completed = await self.sync()
+            await asyncio.sleep(self.refresh_interval if completed else self.retry_interval)
+    
+    async def _follow_loop(self):
+        while True:
+            await asyncio.sleep(self.retry_interval)
+            try:
+                if await asyncio.to_thread(self.store.synced_at) > self.synced_at:
+                    await asyncio.to_thread(self._restore)
+            except Exception as e:
+                print(f"Listing index: копия ведущего воркера не загружена: {e}")
@@ -0,0 +1,117 @@
+"""Персистентная копия объявлений для инкрементальной синхронизации"""
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from utils.sqlite_db import SharedSQLite
+
+
+class ListingStore:
+    """Объявления с хэшами содержимого и точкой возобновления синхронизации в SQLite.
+    
+    Страница синхронизации и ее checkpoint пишутся одной транзакцией, поэтому
+    после рестарта или сбоя проход продолжается с последней сохраненной страницы,
+    а при старте индекс строится из базы без обращений к API.
+    Каждое объявление помечается номером прохода, в котором его видели последним:
+    по завершении прохода удаляются объявления, не увиденные ни в нем,
+    ни в предыдущем завершенном проходе.
+    """
+    
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS listings ("
+        " car_id INTEGER PRIMARY KEY,"
+        " hash TEXT NOT NULL,"
+        " payload BLOB NOT NULL,"
+        " seen_pass INTEGER NOT NULL)",
+        "CREATE TABLE IF NOT EXISTS sync_state ("
+        " name TEXT PRIMARY KEY,"
+        " value TEXT NOT NULL)",
+    )
+    
+    def __init__(self, path: str, compress_level: int = 6):
+        self.path = path
+        self.compress_level = compress_level
+        self._db = SharedSQLite(path, self.SCHEMA)
+        self._lock = threading.Lock()
+    
+    def load(self) -> Tuple[Dict[int, Dict[str, Any]], Dict[int, str], Optional[Dict[str, Any]],
+                            Set[int], Set[int], float]:
+        """Объявления, их хэши, незавершенный checkpoint, увиденные в нем id,
+        не увиденные в последнем завершенном проходе и время последней синхронизации"""
+        with self._lock:
+            conn = self._db.connection()
+            rows = conn.execute("SELECT car_id, hash, payload, seen_pass FROM listings").fetchall()
+            state = dict(conn.execute("SELECT name, value FROM sync_state").fetchall())
+        
+        checkpoint = json.loads(state['checkpoint']) if 'checkpoint' in state else None
+        last_pass = int(state.get('last_pass', 0))
+        cars, hashes, seen, missed = {}, {}, set(), set()
+        for car_id, content_hash, payload, seen_pass in rows:
+            cars[car_id] = json.loads(zlib.decompress(payload))
+            hashes[car_id] = content_hash
+            if checkpoint and seen_pass == checkpoint['pass']:
+                seen.add(car_id)
+            if seen_pass < last_pass:
+                missed.add(car_id)
+        return cars, hashes, checkpoint, seen, missed, float(state.get('synced_at', 0))
+    
+    def synced_at(self) -> float:
+        """Время последнего завершенного прохода (0 - проходов не было)"""
+        with self._lock:
+            row = self._db.connection().execute(
+                "SELECT value FROM sync_state WHERE name = 'synced_at'").fetchone()
+        return float(row[0]) if row else 0.0
+    
+    def apply_page(self, checkpoint: Dict[str, Any], upserts: List[Tuple[int, str, Dict[str, Any]]],
+                   seen_ids: Iterable[int]) -> None:
+        """Сохраняет изменения страницы, отметки прохода и checkpoint атомарно"""
+        pass_id = checkpoint['pass']
+        rows = [
+            (car_id, content_hash, zlib.compress(json.dumps(car, ensure_ascii=False).encode('utf-8'),
+                                                 self.compress_level), pass_id)
+            for car_id, content_hash, car in upserts
+        ]
+        with self._lock:
+            conn = self._db.connection()
+            conn.execute("BEGIN")
+            try:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO listings (car_id, hash, payload, seen_pass) VALUES (?, ?, ?, ?)",
+                    rows
+                )
+                conn.executemany("UPDATE listings SET seen_pass = ? WHERE car_id = ?",
+                                 [(pass_id, car_id) for car_id in seen_ids])
+                self._set_state(conn, 'checkpoint', json.dumps(checkpoint))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+    
+    def finish_pass(self, pass_id: int) -> None:
+        """Удаляет объявления, не увиденные два прохода подряд, и сбрасывает checkpoint"""
+        with self._lock:
+            conn = self._db.connection()
+            conn.execute("BEGIN")
+            try:
+                row = conn.execute("SELECT value FROM sync_state WHERE name = 'last_pass'").fetchone()
+                previous_pass = int(row[0]) if row else 0
+                # seen_pass < предыдущего прохода - не видели ни в нем, ни в текущем
+                conn.execute("DELETE FROM listings WHERE seen_pass < ?", (previous_pass,))
+                conn.execute("DELETE FROM sync_state WHERE name = 'checkpoint'")
+                self._set_state(conn, 'last_pass', str(pass_id))
+                self._set_state(conn, 'synced_at', str(time.time()))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+    
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+    
+    @staticmethod
+    def _set_state(conn: sqlite3.Connection, name: str, value: str) -> None:
+        conn.execute("INSERT OR REPLACE INTO sync_state (name, value) VALUES (?, ?)", (name, value))
@@ -0,0 +1,182 @@
+"""Снимок дерева производителей и моделей, обновляемый в фоне"""
+import asyncio
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+
+class ManufacturerSnapshot:
+    """Дерево производителей/моделей в памяти с семантикой stale-while-revalidate.
+    
+    Снимок загружается при старте приложения и обновляется фоновой задачей.
+    Чтение никогда не обращается к сети: если снимок устарел, возвращаются
+    старые данные, а обновление запускается в фоне.
+    С shared_path ведущий воркер пишет загруженный снимок в файл, а остальные
+    (leader=False) не обращаются к API и перечитывают этот файл.
+    """
+    
+    def __init__(self, client, refresh_interval: float = 3600, retry_interval: float = 60,
+                 models_concurrency: int = 4, shared_path: str = ''):
+        self.client = client
+        self.refresh_interval = refresh_interval
+        self.retry_interval = retry_interval
+        self.models_concurrency = models_concurrency
+        self.shared_path = shared_path
+        self.leader = True
+        self.children: Dict[str, List] = {}
+        self.models: Dict[str, Dict[str, List]] = {}
+        self.updated_at = 0.0
+        self._last_attempt = 0.0
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._loop_task: Optional[asyncio.Task] = None
+    
+    async def start(self, leader: bool = True):
+        """Первичная загрузка снимка и запуск фонового обновления.
+        
+        Если снимок уже загружен (прогрев до fork в serve.py), повторная
+        загрузка пропускается. Не ведущий воркер только следит за файлом снимка.
+        """
+        self.leader = leader or not self.shared_path
+        if not self.leader:
+            self._loop_task = asyncio.create_task(self._follow_loop())
+            return
+        if self.is_stale():
+            await self.refresh()
+        self._loop_task = asyncio.create_task(self._refresh_loop())
+    
+    async def stop(self):
+        """Останавливает фоновые задачи"""
+        for task in (self._loop_task, self._refresh_task):
+            if task and not task.done():
+                task.cancel()
+        self._loop_task = None
+        self._refresh_task = None
+    
+    def get_manufacturers(self) -> List:
+        """Список производителей из снимка"""
+        self._revalidate_if_stale()
+        return self.children.get('manufacturer', [])
+    
+    def get_models(self, manufacturer: str) -> Dict[str, List]:
+        """Дочерние элементы (группы моделей) производителя из снимка"""
+        self._revalidate_if_stale()
+        return self.models.get(manufacturer, {})
+    
+    def is_stale(self) -> bool:
+        return time.time() - self.updated_at > self.refresh_interval
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'manufacturers': len(self.children.get('manufacturer', [])),
+            'models_loaded': len(self.models),
+            'age': round(time.time() - self.updated_at, 1) if self.updated_at else None,
+            'stale': self.is_stale()
+        }
+    
+    async def refresh(self) -> bool:
+        """Загружает дерево из API и атомарно подменяет снимок"""
+        self._last_attempt = time.time()
+        try:
+            response = await self.client.simple_search(
+                car_data={},
+                pagination={"limit": 1, "offset": 0},
+                filters={},
+                use_cache=False
+            )
+            if not response or 'children' not in response:
+                print("Manufacturer snapshot: пустой ответ API")
+                return False
+            
+            children = response['children']
+            models = await self._load_models(children.get('manufacturer', []))
+            
+            self.children = children
+            self.models = models
+            self.updated_at = time.time()
+            if self.shared_path:
+                await asyncio.to_thread(self._write_shared)
+            return True
+        except Exception as e:
+            print(f"Manufacturer snapshot refresh error: {e}")
+            return False
+    
+    async def _load_models(self, manufacturers: List) -> Dict[str, Dict[str, List]]:
+        """Загружает дочерние элементы для каждого производителя"""
+        semaphore = asyncio.Semaphore(self.models_concurrency)
+        models = dict(self.models)
+        
+        async def load(manufacturer):
+            async with semaphore:
+                try:
+                    response = await self.client.simple_search(
+                        car_data={'manufacturer': manufacturer},
+                        pagination={"limit": 1, "offset": 0},
+                        filters={},
+                        use_cache=False
+                    )
+                    if response and 'children' in response:
+                        models[manufacturer] = response['children']
+                except Exception as e:
+                    print(f"Manufacturer snapshot: ошибка загрузки моделей {manufacturer}: {e}")
+        
+        await asyncio.gather(*(load(m) for m in manufacturers))
+        return models
+    
+    def _write_shared(self) -> None:
+        """Атомарно записывает снимок в общий файл"""
+        directory = os.path.dirname(self.shared_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.shared_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'children': self.children, 'models': self.models, 'updated_at': self.updated_at},
+                      f, ensure_ascii=False)
+        os.replace(tmp_path, self.shared_path)
+    
+    def _read_shared(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.shared_path, encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+    
+    async def reload_shared(self) -> bool:
+        """Подменяет снимок более новым из общего файла"""
+        try:
+            data = await asyncio.to_thread(self._read_shared)
+        except Exception as e:
+            print(f"Manufacturer snapshot: общий снимок не прочитан: {e}")
+            return False
+        if not data or data.get('updated_at', 0) <= self.updated_at:
+            return False
+        self.children = data['children']
+        self.models = data['models']
+        self.updated_at = data['updated_at']
+        return True
+    
+    def _revalidate_if_stale(self):
+        """Запускает фоновое обновление, если снимок устарел (только в ведущем воркере)"""
+        if not self.leader or not self.is_stale():
+            return
+        if self._refresh_task and not self._refresh_task.done():
+            return
+        if time.time() - self._last_attempt < self.retry_interval:
+            return
+        try:
+            self._refresh_task = asyncio.get_running_loop().create_task(self.refresh())
+        except RuntimeError:
+            # Нет запущенного event loop - обновит фоновая задача
+            pass
+    
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            if self._refresh_task and not self._refresh_task.done():
+                continue
+            self._refresh_task = asyncio.create_task(self.refresh())
+    
+    async def _follow_loop(self):
+        while True:
+            await self.reload_shared()
+            await asyncio.sleep(self.retry_interval)
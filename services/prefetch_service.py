@@ -0,0 +1,93 @@
+"""Спекулятивная предзагрузка следующей страницы каталога"""
+import asyncio
+from collections import OrderedDict
+from typing import Any, Dict
+
+
+class PrefetchService:
+    """Загружает в фоне страницу N+1 после отдачи страницы N.
+    
+    Результат попадает в кэш ответов клиента. Число одновременных
+    предзагрузок ограничено: если лимит исчерпан, предзагрузка пропускается,
+    а не ставится в очередь - она никогда не задерживает текущий ответ.
+    """
+    
+    def __init__(self, client, max_concurrent: int = 4, max_tracked: int = 1000):
+        self.client = client
+        self.max_concurrent = max_concurrent
+        self.max_tracked = max_tracked
+        self.active = 0
+        self.scheduled = 0
+        self.skipped = 0
+        self.completed = 0
+        self.failed = 0
+        self.used = 0
+        self._prefetched: 'OrderedDict[str, str]' = OrderedDict()
+        self._tasks = set()
+    
+    def record_request(self, cache_key: str) -> None:
+        """Отмечает запрос страницы.
+        
+        Попадание - если страницу предзагрузили и она еще в кэше, либо ее
+        предзагрузка еще выполняется (запрос присоединится к ней через single-flight).
+        """
+        state = self._prefetched.pop(cache_key, None)
+        if state is None:
+            return
+        if state == 'pending' or self.client.cache.contains(cache_key):
+            self.used += 1
+    
+    def schedule_next_page(self, car_data: Dict, filters: Dict, sorting: Dict,
+                           pagination: Dict, total: Any = None) -> None:
+        """Запускает фоновую загрузку следующей страницы"""
+        limit = pagination.get('limit', 20)
+        next_offset = pagination.get('offset', 0) + limit
+        if isinstance(total, int) and next_offset >= total:
+            return
+        
+        next_pagination = {**pagination, 'offset': next_offset}
+        cache_key = self.client.search_cache_key(car_data, next_pagination, filters, sorting)
+        
+        if self.client.cache.contains(cache_key) or self.client.single_flight.is_in_flight(cache_key):
+            return
+        if self.active >= self.max_concurrent:
+            self.skipped += 1
+            return
+        
+        self.active += 1
+        self.scheduled += 1
+        self._prefetched[cache_key] = 'pending'
+        while len(self._prefetched) > self.max_tracked:
+            self._prefetched.popitem(last=False)
+        task = asyncio.ensure_future(self._prefetch(car_data, filters, sorting, next_pagination, cache_key))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def _prefetch(self, car_data, filters, sorting, pagination, cache_key):
+        try:
+            await self.client.simple_search(
+                car_data=car_data,
+                pagination=pagination,
+                filters=filters,
+                sorting=sorting
+            )
+            self.completed += 1
+            if cache_key in self._prefetched:
+                self._prefetched[cache_key] = 'done'
+        except Exception as e:
+            self.failed += 1
+            self._prefetched.pop(cache_key, None)
+            print(f"Prefetch error: {e}")
+        finally:
+            self.active -= 1
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'active': self.active,
+            'scheduled': self.scheduled,
+            'skipped': self.skipped,
+            'completed': self.completed,
+            'failed': self.failed,
+            'used': self.used,
+            'hit_rate': round(self.used / self.scheduled, 4) if self.scheduled else 0.0
+        }
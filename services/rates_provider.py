@@ -0,0 +1,185 @@
+"""Курсы валют с подключаемым источником и фиксацией версии курса"""
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import httpx
+from decouple import config
+
+try:
+    import numpy as np
+except ImportError:  # без NumPy пересчет идет списком
+    np = None
+
+CURRENCIES = ('RUB', 'USD', 'EUR')
+
+# Цены API - в десятках тысяч вон, пересчитанные - в тысячах единиц валюты
+WON_UNIT = 10000
+PRICE_UNIT = 1000
+
+# Меньшие пачки быстрее пересчитать списком, чем собирать массив
+NUMPY_MIN_BATCH = 64
+
+
+class RateTable:
+    """Неизменяемый набор курсов KRW -> валюта с версией"""
+    
+    __slots__ = ('version', 'rates', 'fetched_at', 'source')
+    
+    def __init__(self, rates: Dict[str, float], version: Optional[str] = None, source: str = 'static'):
+        self.rates = {currency: float(rates[currency]) for currency in CURRENCIES}
+        self.version = str(version) if version else hashlib.sha1(
+            json.dumps(self.rates, sort_keys=True).encode('utf-8')
+        ).hexdigest()[:12]
+        self.fetched_at = time.time()
+        self.source = source
+    
+    def convert(self, prices: List, currency: str = 'RUB') -> List[Optional[int]]:
+        """Пересчет пачки цен из вон в тысячи единиц валюты; None остается None"""
+        factor = WON_UNIT * self.rates[currency] / PRICE_UNIT
+        if np is not None and len(prices) >= NUMPY_MIN_BATCH:
+            values = np.array([np.nan if price is None else price for price in prices], dtype=np.float64)
+            converted = np.trunc(values * factor)
+            missing = np.isnan(converted)
+            result = converted.astype(np.int64).tolist()
+            return [None if skip else value for value, skip in zip(result, missing.tolist())]
+        return [None if price is None else int(price * factor) for price in prices]
+    
+    def to_won(self, price: float, currency: str = 'RUB') -> int:
+        return int(price * PRICE_UNIT / self.rates[currency] / WON_UNIT)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'version': self.version,
+            'base': 'KRW',
+            'rates': self.rates,
+            'fetched_at': self.fetched_at,
+            'source': self.source
+        }
+
+
+class FileRateSource:
+    """Курсы из JSON файла: {"version": "...", "rates": {"RUB": ..., "USD": ..., "EUR": ...}}"""
+    
+    def __init__(self, path: str):
+        self.path = path
+        self.name = f"file:{path}"
+    
+    async def fetch(self) -> Dict[str, Any]:
+        def read():
+            with open(self.path, encoding='utf-8') as file:
+                return json.load(file)
+        return await asyncio.to_thread(read)
+
+
+class HttpRateSource:
+    """Курсы с HTTP endpoint'а в том же формате, что и файл"""
+    
+    def __init__(self, url: str, timeout: float = 5.0):
+        self.url = url
+        self.timeout = timeout
+        self.name = url
+    
+    async def fetch(self) -> Dict[str, Any]:
+        async with httpx.AsyncClient(timeout=self.timeout) as client:
+            response = await client.get(self.url)
+            response.raise_for_status()
+            return response.json()
+
+
+class RatesProvider:
+    """Текущие курсы в памяти с фоновым обновлением раз в ttl.
+    
+    Таблица курсов подменяется целиком, читатели видят либо старую, либо новую.
+    Замененные версии хранятся еще pin_ttl секунд: страница каталога, отрисованная
+    с версией X, может запросить следующие страницы по тому же курсу.
+    При ошибке источника остается последняя загруженная таблица.
+    """
+    
+    def __init__(self, default_rates: Dict[str, float], source=None, ttl: float = 3600,
+                 retry_interval: float = 60, pin_ttl: float = 3600, max_versions: int = 16):
+        self.source = source
+        self.ttl = ttl
+        self.retry_interval = retry_interval
+        self.pin_ttl = pin_ttl
+        self.max_versions = max_versions
+        self.table = RateTable(default_rates)
+        self.refreshes = 0
+        self.errors = 0
+        self._superseded: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._loop_task: Optional[asyncio.Task] = None
+    
+    async def start(self):
+        if self.source is None:
+            return
+        succeeded = await self.refresh()
+        self._loop_task = asyncio.create_task(self._refresh_loop(succeeded))
+    
+    async def stop(self):
+        if self._loop_task and not self._loop_task.done():
+            self._loop_task.cancel()
+        self._loop_task = None
+    
+    def get(self, version: Optional[str] = None) -> RateTable:
+        """Таблица закрепленной версии, если она еще хранится, иначе текущая"""
+        if version and version != self.table.version:
+            pinned = self._superseded.get(version)
+            if pinned is not None and time.time() - pinned[1] <= self.pin_ttl:
+                return pinned[0]
+        return self.table
+    
+    async def refresh(self) -> bool:
+        try:
+            data = await self.source.fetch()
+            table = RateTable(data['rates'], version=data.get('version'), source=self.source.name)
+            if any(rate <= 0 for rate in table.rates.values()):
+                raise ValueError(f"неположительный курс: {table.rates}")
+        except Exception as e:
+            self.errors += 1
+            print(f"Rates refresh error: {e}")
+            return False
+        
+        self.refreshes += 1
+        if table.version != self.table.version:
+            self._superseded[self.table.version] = (self.table, time.time())
+            while len(self._superseded) > self.max_versions:
+                self._superseded.popitem(last=False)
+        self.table = table
+        return True
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.table.to_dict(),
+            'age': round(time.time() - self.table.fetched_at, 1),
+            'pinned_versions': list(self._superseded),
+            'refreshes': self.refreshes,
+            'errors': self.errors
+        }
+    
+    async def _refresh_loop(self, succeeded: bool):
+        while True:
+            await asyncio.sleep(self.ttl if succeeded else self.retry_interval)
+            succeeded = await self.refresh()
+
+
+def _create_source(spec: str):
+    if not spec:
+        return None
+    if spec.startswith(('http://', 'https://')):
+        return HttpRateSource(spec)
+    return FileRateSource(spec[len('file:'):] if spec.startswith('file:') else spec)
+
+
+rates_provider = RatesProvider(
+    default_rates={
+        'RUB': config('ENCAR_RATE_KRW_RUB', default=0.057279, cast=float),
+        'USD': config('ENCAR_RATE_KRW_USD', default=0.00072, cast=float),
+        'EUR': config('ENCAR_RATE_KRW_EUR', default=0.00066, cast=float),
+    },
+    source=_create_source(config('ENCAR_RATES_SOURCE', default='')),
+    ttl=config('ENCAR_RATES_TTL', default=3600, cast=float),
+    pin_ttl=config('ENCAR_RATES_PIN_TTL', default=3600, cast=float)
+)
@@ -1,22 +1,79 @@
 """Менеджер сессий пользователя"""
+import asyncio
 import time
 import os
+from decouple import config
+from services.session_store import SessionRecord, MemorySessionBackend, SQLiteSessionBackend
 
-user_sessions = {}
+SESSION_IDLE_TTL = config('ENCAR_SESSION_TTL', default=1800, cast=float)
+SESSION_MAX = config('ENCAR_SESSION_MAX', default=10000, cast=int)
+# Не выделять сессию под GET-запросы без cookie (краулеры)
+SESSION_LAZY_CREATE = config('ENCAR_SESSION_LAZY', default=True, cast=bool)
+# Неизмененная сессия перезаписывается только для продления, не чаще этого интервала
+SESSION_TOUCH_INTERVAL = config('ENCAR_SESSION_TOUCH_INTERVAL', default=SESSION_IDLE_TTL / 10, cast=float)
+
+def _create_backend():
+    backend = config('ENCAR_SESSION_BACKEND', default='memory')
+    if backend == 'sqlite':
+        return SQLiteSessionBackend(
+            config('ENCAR_SESSION_DB_PATH', default='/dev/shm/encar_sessions.db'),
+            SESSION_IDLE_TTL,
+            SESSION_MAX
+        )
+    return MemorySessionBackend(SESSION_IDLE_TTL, SESSION_MAX)
+
+session_store = _create_backend()
+
+async def _call(method, *args):
+    """Вызов метода хранилища: блокирующие хранилища - в пуле потоков"""
+    if session_store.blocking:
+        return await asyncio.to_thread(method, *args)
+    return method(*args)
 
 class SessionManager:
+    # Число сессий на момент последнего size() - для синхронных сборщиков метрик
+    last_size = 0
+    
+    @staticmethod
+    async def size():
+        """Число сессий в хранилище (COUNT(*) SQLite - в пуле потоков)"""
+        SessionManager.last_size = await _call(session_store.size)
+        return SessionManager.last_size
+    
     @staticmethod
-    def get_user_session(request):
+    async def get_user_session(request):
+        """Возвращает (session_id, SessionRecord).
+        
+        Для GET-запроса без cookie в ленивом режиме запись не сохраняется:
+        сессия появится в хранилище, когда клиент вернет выданную cookie.
+        Чтение ничего не записывает - новая или измененная сессия сохраняется
+        в save_user_session.
+        """
         session_id = request.cookies.get("session_id")
         if not session_id:
             session_id = f"web_{int(time.time())}_{os.urandom(4).hex()}"
+            if SESSION_LAZY_CREATE and request.method == 'GET':
+                return session_id, SessionRecord(transient=True)
+        
+        record = await _call(session_store.get, session_id)
+        if record is None:
+            record = SessionRecord()
         
-        if session_id not in user_sessions:
-            user_sessions[session_id] = {
-                'filters': {},
-                'catalog_context': {},
-                'navigation_history': [],
-                'last_activity': time.time()
-            }
+        return session_id, record
+    
+    @staticmethod
+    async def save_user_session(session_id, record):
+        """Сохраняет сессию, если она изменилась или пора продлить ее срок.
         
-        return session_id, user_sessions[session_id]
+        Просмотр страницы с теми же параметрами не пишет в хранилище:
+        last_activity обновляется не чаще SESSION_TOUCH_INTERVAL.
+        """
+        if record.transient:
+            return
+        now = time.time()
+        state = record.state()
+        if state == record.saved_state and now - record.last_activity < SESSION_TOUCH_INTERVAL:
+            return
+        record.last_activity = now
+        await _call(session_store.save, session_id, record)
+        record.saved_state = state
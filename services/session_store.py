@@ -0,0 +1,194 @@
+"""Хранилища пользовательских сессий"""
+import json
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from utils.sqlite_db import SharedSQLite
+
+
+class SessionRecord:
+    """Компактная запись сессии (слоты вместо вложенных словарей)"""
+    
+    __slots__ = ('filters', 'car_data', 'sorting', 'pagination',
+                 'catalog_context', 'navigation_history', 'last_activity', 'transient', 'saved_state')
+    
+    FIELDS = ('filters', 'car_data', 'sorting', 'pagination', 'catalog_context', 'navigation_history')
+    
+    def __init__(self, filters=None, car_data=None, sorting=None, pagination=None,
+                 catalog_context=None, navigation_history=None, last_activity=None, transient=False):
+        self.filters = filters if filters is not None else {}
+        self.car_data = car_data
+        self.sorting = sorting
+        self.pagination = pagination
+        self.catalog_context = catalog_context
+        self.navigation_history = navigation_history
+        self.last_activity = last_activity or time.time()
+        self.transient = transient
+        # Состояние на момент последней записи в хранилище (None - еще не сохранялась)
+        self.saved_state = None
+    
+    def state(self) -> str:
+        """Содержимое сессии без last_activity - для проверки, изменилась ли она"""
+        return json.dumps({field: getattr(self, field) for field in self.FIELDS},
+                          sort_keys=True, ensure_ascii=False, default=str)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        data = {field: getattr(self, field) for field in self.FIELDS if getattr(self, field) is not None}
+        data['last_activity'] = self.last_activity
+        return data
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'SessionRecord':
+        return cls(**{key: value for key, value in data.items()
+                      if key in cls.FIELDS or key == 'last_activity'})
+
+
+class SessionBackend(ABC):
+    """Интерфейс хранилища сессий.
+    
+    blocking=True - методы выполняют дисковый ввод-вывод, и SessionManager
+    вызывает их в пуле потоков, а не в цикле событий.
+    """
+    
+    blocking = False
+    
+    @abstractmethod
+    def get(self, session_id: str) -> Optional[SessionRecord]:
+        ...
+    
+    @abstractmethod
+    def save(self, session_id: str, record: SessionRecord) -> None:
+        ...
+    
+    @abstractmethod
+    def delete(self, session_id: str) -> None:
+        ...
+    
+    @abstractmethod
+    def size(self) -> int:
+        ...
+
+
+class MemorySessionBackend(SessionBackend):
+    """Сессии в памяти процесса: истечение по простою и LRU-вытеснение сверх лимита"""
+    
+    def __init__(self, idle_ttl: float, max_sessions: int):
+        self.idle_ttl = idle_ttl
+        self.max_sessions = max_sessions
+        self.expired = 0
+        self.evicted = 0
+        self._sessions: 'OrderedDict[str, SessionRecord]' = OrderedDict()
+    
+    def get(self, session_id: str) -> Optional[SessionRecord]:
+        record = self._sessions.get(session_id)
+        if record is None:
+            return None
+        if record.last_activity + self.idle_ttl <= time.time():
+            del self._sessions[session_id]
+            self.expired += 1
+            return None
+        # Порядок словаря должен совпадать с порядком last_activity (см. _purge)
+        record.last_activity = time.time()
+        self._sessions.move_to_end(session_id)
+        return record
+    
+    def save(self, session_id: str, record: SessionRecord) -> None:
+        record.last_activity = time.time()
+        self._sessions[session_id] = record
+        self._sessions.move_to_end(session_id)
+        self._purge()
+    
+    def delete(self, session_id: str) -> None:
+        self._sessions.pop(session_id, None)
+    
+    def size(self) -> int:
+        return len(self._sessions)
+    
+    def _purge(self) -> None:
+        """Удаляет истекшие сессии и вытесняет самые давние сверх лимита.
+        
+        Порядок словаря совпадает с порядком последнего обращения, поэтому
+        истекшие сессии всегда находятся в начале.
+        """
+        deadline = time.time() - self.idle_ttl
+        while self._sessions:
+            session_id, record = next(iter(self._sessions.items()))
+            if record.last_activity > deadline:
+                break
+            del self._sessions[session_id]
+            self.expired += 1
+        
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+            self.evicted += 1
+
+
+class SQLiteSessionBackend(SessionBackend):
+    """Сессии в SQLite - общие для нескольких воркеров на одном хосте.
+    
+    Для хранения в разделяемой памяти укажите путь на tmpfs
+    (например, /dev/shm/encar_sessions.db). Ожидание блокировки базы другим
+    воркером может занять до timeout секунд, поэтому get/save из асинхронных
+    роутов выполняются в пуле потоков (blocking=True).
+    """
+    
+    blocking = True
+    PURGE_EVERY = 200
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS sessions ("
+        " id TEXT PRIMARY KEY,"
+        " data TEXT NOT NULL,"
+        " last_activity REAL NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS sessions_activity ON sessions (last_activity)",
+    )
+    
+    def __init__(self, path: str, idle_ttl: float, max_sessions: int):
+        self.path = path
+        self.idle_ttl = idle_ttl
+        self.max_sessions = max_sessions
+        self.writes = 0
+        self._db = SharedSQLite(path, self.SCHEMA)
+        self._lock = threading.Lock()
+    
+    def get(self, session_id: str) -> Optional[SessionRecord]:
+        with self._lock:
+            row = self._db.connection().execute(
+                "SELECT data FROM sessions WHERE id = ? AND last_activity > ?",
+                (session_id, time.time() - self.idle_ttl)
+            ).fetchone()
+        if row is None:
+            return None
+        record = SessionRecord.from_dict(json.loads(row[0]))
+        record.saved_state = record.state()
+        return record
+    
+    def save(self, session_id: str, record: SessionRecord) -> None:
+        with self._lock:
+            conn = self._db.connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO sessions (id, data, last_activity) VALUES (?, ?, ?)",
+                (session_id, json.dumps(record.to_dict(), ensure_ascii=False), record.last_activity)
+            )
+            self.writes += 1
+            if self.writes % self.PURGE_EVERY == 0:
+                self._purge(conn)
+    
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._db.connection().execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+    
+    def size(self) -> int:
+        with self._lock:
+            return self._db.connection().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+    
+    def _purge(self, conn: sqlite3.Connection) -> None:
+        conn.execute("DELETE FROM sessions WHERE last_activity <= ?", (time.time() - self.idle_ttl,))
+        conn.execute(
+            "DELETE FROM sessions WHERE id IN ("
+            " SELECT id FROM sessions ORDER BY last_activity DESC LIMIT -1 OFFSET ?)",
+            (self.max_sessions,)
+        )
@@ -191,7 +191,8 @@ class CarsGridComponent {
      * Создание блока цены
      */
     createCarPrice(car) {
-        const priceRub = CurrencyService.convertToRub(car.price);
+        // Цена в рублях приходит с сервера по курсу страницы
+        const priceRub = car.price_rub ?? CurrencyService.convertToRub(car.price);
         const priceText = priceRub ? `${priceRub.toLocaleString()} тыс.₽` : '—';
         
         const priceEl = SafeDOM.createElement('div', {
@@ -93,7 +93,7 @@ class NavigationComponent {
      * Получение иконки производителя - ФИКСИРУЕМ ПУТИ
      */
     getManufacturerIcon(manufacturer) {
-        if (!manufacturer) return '/example/static/images/brands/default.svg';
+        if (!manufacturer) return NavigationComponent.brandIconUrl('default');
         
         const brandSlugs = {
             'Acura': 'acura', 'Alfa Romeo': 'alfaromeo', 'Astonmartin': 'astonmartin',
@@ -115,9 +115,18 @@ class NavigationComponent {
         
         const slug = brandSlugs[manufacturer];
         // ФИКС: Правильный путь без экранирования
-        const iconPath = slug ? `/example/static/images/brands/${slug}.svg` : '/example/static/images/brands/default.svg';
-        
-        return iconPath;
+        return NavigationComponent.brandIconUrl(slug || 'default');
+    }
+
+    /**
+     * URL логотипа: кадр спрайта из сборки или отдельный файл, если сборки нет
+     */
+    static brandIconUrl(slug) {
+        const sprite = window.BRAND_SPRITE;
+        if (sprite) {
+            return `${sprite.url}#${sprite.ids.includes(slug) ? slug : 'default'}`;
+        }
+        return `/example/static/images/brands/${slug}.svg`;
     }
 
     /**
@@ -155,9 +164,9 @@ class NavigationComponent {
                 // Добавляем обработчик ошибки загрузки иконки
                 icon.addEventListener('error', () => {
                     console.warn('Failed to load brand icon:', iconUrl);
-                    // Пробуем загрузить дефолтную иконку
-                    icon.src = '/example/static/images/brands/default.svg';
-                });
+                    // Пробуем загрузить дефолтную иконку (один раз, без зацикливания)
+                    icon.src = NavigationComponent.brandIconUrl('default');
+                }, { once: true });
                 
                 link.appendChild(icon);
             }
@@ -281,12 +281,10 @@ class CatalogApp {
     async loadCars() {
         try {
             
-            const apiFilters = this.convertFiltersForAPI(this.state.filters);
-
             const carsData = await this.apiService.getCars(
                 this.prepareCarDataForAPI(this.state.car_data),
                 this.state.pagination,
-                apiFilters,
+                this.state.filters,
                 this.state.sorting
             );
             if (carsData?.cars?.length > 0) {
@@ -422,24 +420,6 @@ class CatalogApp {
         return cleaned;
     }
 
-    /**
-     * Конвертация фильтров для API
-     */
-    convertFiltersForAPI(filters) {
-        const apiFilters = { ...filters };
-        
-        
-        // Конвертация цен в воны (только если значения есть)
-        if (apiFilters.price_min !== null && apiFilters.price_min !== undefined) {
-            apiFilters.price_min = CurrencyService.convertToWon(apiFilters.price_min);
-        }
-        if (apiFilters.price_max !== null && apiFilters.price_max !== undefined) {
-            apiFilters.price_max = CurrencyService.convertToWon(apiFilters.price_max);
-        }
-        
-        return apiFilters;
-    }
-
     /**
      * Сброс на первую страницу
      */
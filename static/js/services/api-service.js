@@ -4,6 +4,8 @@
 class ApiService {
     constructor() {
         this.baseURL = '/example/api';
+        this.facetsCache = new Map();
+        this.ratesVersion = null;
     }
 
     /**
@@ -34,14 +36,46 @@ class ApiService {
      * Навигация по каталогу
      */
     async navigateCatalog(carData, filters = {}, sorting = {}) {
-        return this.request('catalog/navigate', {
+        return this.getCatalog('catalog/navigate', {
             car_data: carData,
             filters: filters,
-            sorting: sorting
+            sorting: sorting,
+            // Цены фильтров - в тыс. ₽, в воны их переводит сервер по своему курсу
+            price_currency: 'RUB'
         });
     }
 
 
+    /**
+     * GET-версия роута каталога: тело запроса передается каноническим query string,
+     * чтобы браузер кэшировал ответ (ETag, Cache-Control)
+     */
+    async getCatalog(endpoint, body) {
+        const query = ApiService.canonicalQuery(body);
+        return this.getRequest(query ? `${endpoint}?${query}` : endpoint);
+    }
+
+    /**
+     * Канонический query string - должен совпадать с CatalogParamsParser.canonical_api_query
+     */
+    static canonicalQuery(body) {
+        const defaults = { sort_order: 'price', sort_direction: 'ASC', limit: '20', offset: '0' };
+        const pairs = {};
+        const sources = [
+            body.car_data || {}, body.filters || {}, body.sorting || {}, body.pagination || {},
+            { rates_version: body.rates_version, currencies: body.currencies, price_currency: body.price_currency }
+        ];
+        sources.forEach(source => {
+            Object.entries(source).forEach(([key, raw]) => {
+                if (raw === null || raw === undefined || raw === '' || (Array.isArray(raw) && !raw.length)) return;
+                const text = Array.isArray(raw) ? raw.map(String).sort().join(',') : String(raw);
+                if (defaults[key] === text) return;
+                pairs[key] = text;
+            });
+        });
+        return new URLSearchParams(Object.keys(pairs).sort().map(key => [key, pairs[key]])).toString();
+    }
+
     /**
      * Получение деталей автомобиля
      */
@@ -63,22 +97,86 @@ class ApiService {
         return this.getRequest(`car/${carId}`);
     }
 
+    /**
+     * Детали нескольких автомобилей одним запросом (сравнение, избранное).
+     * onResult вызывается для каждого автомобиля по мере готовности:
+     * {car_id, status: 'success', data} или {car_id, status: 'error', error, message}
+     */
+    async getCarDetailsBatch(carIds, onResult, lang = 'eng') {
+        const response = await fetch(`${this.baseURL}/cars/batch`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({ car_ids: carIds, lang: lang })
+        });
+        
+        if (!response.ok) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+        }
+        
+        const results = [];
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        const emit = (line) => {
+            if (!line.trim()) return;
+            const result = JSON.parse(line);
+            results.push(result);
+            if (onResult) onResult(result);
+        };
+        
+        while (true) {
+            const { done, value } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            const lines = buffer.split('\n');
+            buffer = lines.pop();
+            lines.forEach(emit);
+        }
+        emit(buffer + decoder.decode());
+        return results;
+    }
+
+    /**
+     * Фасеты ветки каталога (топливо, КПП, навигация) - один запрос на ветку
+     */
+    async getFacets(carData) {
+        const key = JSON.stringify(carData || {});
+        if (!this.facetsCache.has(key)) {
+            const promise = this.getCatalog('catalog/facets', { car_data: carData || {} });
+            this.facetsCache.set(key, promise);
+            promise.catch(() => this.facetsCache.delete(key));
+        }
+        return this.facetsCache.get(key);
+    }
+
+    /**
+     * Значения фасета в формате ответа catalog/fuels и catalog/transmissions
+     */
+    async getFacetOptions(carData, facet) {
+        const response = await this.getFacets(carData);
+        if (!response || response.status !== 'success') {
+            return response;
+        }
+        return {
+            status: 'success',
+            data: (response.facets[facet] || []).map(item => ({ value: item.value, label: item.value }))
+        };
+    }
+
     /**
      * Получение вариантов топлива
      */
     async getFuelTypes(carData) {
-        return this.request('catalog/fuels', {
-            car_data: carData
-        });
+        return this.getFacetOptions(carData, 'fuel');
     }
 
     /**
      * Получение вариантов трансмиссии
      */
     async getTransmissionTypes(carData) {
-        return this.request('catalog/transmissions', {
-            car_data: carData
-        });
+        return this.getFacetOptions(carData, 'transmission');
     }
 
 
@@ -112,16 +210,26 @@ class ApiService {
      */
     async getCars(carData, pagination, filters = {}, sorting = {}) {
         try {
-            const response = await this.request('catalog/cars', {
+            const body = {
                 car_data: carData,
                 pagination: pagination,
                 filters: filters,
-                sorting: sorting
-            });
+                sorting: sorting,
+                // Цены фильтров - в тыс. ₽: сервер переводит их по тому же курсу, что и цены в выдаче
+                price_currency: 'RUB'
+            };
+            // Следующие страницы считаются по тому же курсу, что и первая
+            if (pagination?.offset > 0 && this.ratesVersion) {
+                body.rates_version = this.ratesVersion;
+            }
+            const response = await this.getCatalog('catalog/cars', body);
             
             if (response && response.cars) {
                 response.cars = this.processCarData(response.cars);
             }
+            if (response?.rates_version) {
+                this.ratesVersion = response.rates_version;
+            }
             
             return response;
         } catch (error) {
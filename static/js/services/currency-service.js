@@ -1,33 +1,24 @@
 /**
- * Сервис конвертации валют - единый источник курса
+ * Сервис конвертации валют - курс берется с сервера (window.EXCHANGE_RATES),
+ * тот же, по которому сервер считает price_rub и переводит фильтры цены в воны
  */
 class CurrencyService {
     static getExchangeRate() {
-        // Временная константа, позже можно получать через API
-        return 0.057279;
+        const rate = window.EXCHANGE_RATES?.rates?.RUB;
+        return typeof rate === 'number' ? rate : null;
     }
     
     static convertToRub(priceWon) {
         if (priceWon === null || priceWon === undefined) return null;
         try {
             const rate = this.getExchangeRate();
+            if (rate === null) return null;
             return Math.round(priceWon * 10000 * rate / 1000);
         } catch (e) {
             console.error('Currency conversion error:', e);
             return null;
         }
     }
-    
-    static convertToWon(priceRub) {
-        if (priceRub === null || priceRub === undefined) return null;
-        try {
-            const rate = this.getExchangeRate();
-            return Math.round(priceRub * 1000 / rate / 10000);
-        } catch (e) {
-            console.error('Currency conversion error:', e);
-            return null;
-        }
-    }
 
     static formatPriceRub(priceWon) {
         const rub = this.convertToRub(priceWon);
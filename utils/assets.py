@@ -0,0 +1,127 @@
+"""
+Статические файлы сборки: манифест хэшированных имен и раздача предсжатых копий
+
+build_assets.py пишет в static/dist минифицированные файлы с хэшем содержимого
+в имени, рядом .gz/.br копии и manifest.json (исходный путь -> путь в dist).
+Шаблоны и генератор осмотра получают URL через asset_url(): пока сборки нет,
+отдается исходный файл, так что разработка без сборки не ломается.
+"""
+import json
+import mimetypes
+import os
+import stat
+from typing import Any, Dict, Optional
+
+import anyio
+from decouple import config
+from starlette.staticfiles import StaticFiles
+from starlette.types import Scope
+from starlette.responses import Response
+
+STATIC_DIR = 'static'
+STATIC_URL = '/example/static'
+DIST_DIR = 'dist'
+MANIFEST_PATH = config('ENCAR_ASSET_MANIFEST', default=os.path.join(STATIC_DIR, DIST_DIR, 'manifest.json'))
+
+# Содержимое файла в dist не меняется: новая версия - новое имя
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# Порядок предпочтения предсжатых копий
+PRECOMPRESSED = (('br', '.br'), ('gzip', '.gz'))
+
+_manifest: Optional[Dict[str, Any]] = None
+
+
+def load_manifest(reload: bool = False) -> Dict[str, Any]:
+    """Манифест сборки; пустой, если сборки нет"""
+    global _manifest
+    if _manifest is None or reload:
+        try:
+            with open(MANIFEST_PATH, encoding='utf-8') as file:
+                _manifest = json.load(file)
+        except FileNotFoundError:
+            _manifest = {'files': {}, 'sprites': {}}
+        except (OSError, ValueError) as e:
+            print(f"Asset manifest error: {e}")
+            _manifest = {'files': {}, 'sprites': {}}
+    return _manifest
+
+
+def asset_url(path: str) -> str:
+    """URL файла из static/: хэшированная копия из сборки или исходный файл"""
+    path = path.lstrip('/')
+    return f"{STATIC_URL}/{load_manifest()['files'].get(path, path)}"
+
+
+def brand_sprite() -> Optional[Dict[str, Any]]:
+    """Спрайт логотипов для навигации: {'url', 'ids'} или None без сборки"""
+    sprite = load_manifest()['sprites'].get('images/brands.svg')
+    if sprite is None:
+        return None
+    return {'url': f"{STATIC_URL}/{sprite['file']}", 'ids': sprite['ids']}
+
+
+def setup_template_globals(templates) -> None:
+    """Регистрирует asset_url и brand_sprite в окружении Jinja2Templates"""
+    templates.env.globals['asset_url'] = asset_url
+    templates.env.globals['brand_sprite'] = brand_sprite
+
+
+def accepted_encodings(scope: Scope) -> set:
+    """Кодировки из Accept-Encoding, кроме явно запрещенных q=0"""
+    header = ''
+    for name, value in scope.get('headers', []):
+        if name == b'accept-encoding':
+            header = value.decode('latin-1')
+            break
+    encodings = set()
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        if params.replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        if coding:
+            encodings.add(coding.strip().lower())
+    return encodings
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """StaticFiles, отдающий для файлов сборки готовые .br/.gz копии.
+    
+    Сжатие выполняется один раз при сборке, поэтому GZipMiddleware пропускает
+    такие ответы (Content-Encoding уже выставлен). Файлам из dist ставится
+    immutable Cache-Control, остальные раздаются как обычно.
+    """
+    
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        if path.split(os.sep, 1)[0] != DIST_DIR:
+            return await super().get_response(path, scope)
+        
+        encodings = accepted_encodings(scope)
+        if scope['method'] in ('GET', 'HEAD'):
+            for encoding, suffix in PRECOMPRESSED:
+                if encoding not in encodings and '*' not in encodings:
+                    continue
+                full_path, stat_result = await anyio.to_thread.run_sync(self.lookup_path, path + suffix)
+                if stat_result is None or not stat.S_ISREG(stat_result.st_mode):
+                    continue
+                response = self.file_response(full_path, stat_result, scope)
+                if response.status_code == 200:
+                    response.headers['Content-Type'] = self._content_type(path)
+                    response.headers['Content-Encoding'] = encoding
+                # GZipMiddleware такой ответ не трогает, Vary ставится здесь
+                response.headers['Vary'] = 'Accept-Encoding'
+                return self._immutable(response)
+        
+        return self._immutable(await super().get_response(path, scope))
+    
+    @staticmethod
+    def _content_type(path: str) -> str:
+        media_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        if media_type.startswith('text/'):
+            media_type += '; charset=utf-8'
+        return media_type
+    
+    @staticmethod
+    def _immutable(response: Response) -> Response:
+        response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+        return response
@@ -0,0 +1,214 @@
+"""
+Сжатие ответов один раз на содержимое
+
+Тела кэшируемых ответов (JSON с ETag, страницы карточки и отчета) сжимаются
+при первой отдаче и хранятся в CompressedBodyCache под ETag - хэшем содержимого.
+Повторная отдача того же содержимого - готовые байты с Content-Encoding,
+GZipMiddleware такие ответы пропускает. Повышенный уровень (PRECOMPRESS_LEVELS)
+тратится только на тела с ETag из кэша ответов API: они гарантированно
+повторяются. Остальные промахи сжимаются с уровнем GZIP_LEVEL - не дороже,
+чем GZipMiddleware, который сжимает на лету уникальные ответы (страницу каталога).
+"""
+import gzip
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from decouple import config
+from fastapi import Request
+from starlette.responses import Response
+
+from utils.assets import accepted_encodings
+from utils.profiling import phase
+
+try:
+    import brotli
+except ImportError:  # без brotli - только gzip/zstd
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # без zstandard - только gzip/br
+    zstandard = None
+
+# Ответы меньше порога не сжимаются (тот же порог у GZipMiddleware)
+MIN_SIZE = config('ENCAR_COMPRESS_MIN_SIZE', default=1000, cast=int)
+# Уровень GZipMiddleware для некэшируемых ответов: сжатие на каждый запрос
+GZIP_LEVEL = config('ENCAR_GZIP_LEVEL', default=6, cast=int)
+
+# Уровни на промахе по содержимому, которое может не повториться: цена как у сжатия на лету
+ONLINE_LEVELS = {
+    'gzip': GZIP_LEVEL,
+    'br': config('ENCAR_BROTLI_QUALITY', default=4, cast=int),
+    'zstd': config('ENCAR_ZSTD_LEVEL', default=3, cast=int),
+}
+
+# Уровни для тел с ETag из кэша ответов API: сжимаются один раз, можно выше, чем на лету
+PRECOMPRESS_LEVELS = {
+    'gzip': config('ENCAR_PRECOMPRESS_GZIP_LEVEL', default=9, cast=int),
+    'br': config('ENCAR_PRECOMPRESS_BROTLI_QUALITY', default=9, cast=int),
+    'zstd': config('ENCAR_PRECOMPRESS_ZSTD_LEVEL', default=10, cast=int),
+}
+
+
+def _compress_gzip(data: bytes, level: int) -> bytes:
+    # mtime=0 - одинаковое содержимое дает одинаковые байты
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def _compress_brotli(data: bytes, level: int) -> bytes:
+    return brotli.compress(data, quality=level)
+
+
+def _compress_zstd(data: bytes, level: int) -> bytes:
+    return zstandard.ZstdCompressor(level=level).compress(data)
+
+
+# Доступные кодировки в порядке предпочтения
+ENCODERS: Dict[str, Callable[[bytes, int], bytes]] = {}
+if brotli is not None:
+    ENCODERS['br'] = _compress_brotli
+if zstandard is not None:
+    ENCODERS['zstd'] = _compress_zstd
+ENCODERS['gzip'] = _compress_gzip
+
+
+def negotiate_encoding(request: Request) -> Optional[str]:
+    """Лучшая доступная кодировка из Accept-Encoding или None"""
+    accepted = accepted_encodings(request.scope)
+    for encoding in ENCODERS:
+        if encoding in accepted:
+            return encoding
+    return None
+
+
+class CompressedBodyCache:
+    """Сжатые тела ответов по (ETag, кодировка) с LRU-вытеснением по объему.
+    
+    ETag - хэш содержимого, поэтому запись не устаревает: новое содержимое
+    получает новый ключ, а старое вытесняется по LRU.
+    """
+    
+    def __init__(self, max_bytes: int, levels: Dict[str, int], online_levels: Dict[str, int]):
+        self.max_bytes = max_bytes
+        self.levels = levels
+        self.online_levels = online_levels
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.compress_seconds = 0.0
+        self.encodings: Dict[str, int] = {}
+        self._entries: 'OrderedDict[Tuple[str, str], Tuple[bytes, int]]' = OrderedDict()
+    
+    def get(self, etag: str, encoding: str) -> Optional[bytes]:
+        entry = self._entries.get((etag, encoding))
+        if entry is None:
+            return None
+        self._entries.move_to_end((etag, encoding))
+        self.hits += 1
+        self._count(encoding, entry[1], len(entry[0]))
+        return entry[0]
+    
+    def put(self, etag: str, encoding: str, body: bytes, precompress: bool = False) -> bytes:
+        """Сжимает тело (с precompress - повышенным уровнем), сохраняет и возвращает сжатые байты"""
+        self.misses += 1
+        level = (self.levels if precompress else self.online_levels)[encoding]
+        started = time.process_time()
+        with phase('compress'):
+            encoded = ENCODERS[encoding](body, level)
+        self.compress_seconds += time.process_time() - started
+        self._count(encoding, len(body), len(encoded))
+        
+        if len(encoded) <= self.max_bytes:
+            key = (etag, encoding)
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (encoded, len(body))
+            self.current_bytes += len(encoded)
+            while self.current_bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+        return encoded
+    
+    def clear(self) -> None:
+        self._entries.clear()
+        self.current_bytes = 0
+    
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self.current_bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 3) if total else 0.0,
+            'evictions': self.evictions,
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'bytes_saved': self.bytes_in - self.bytes_out,
+            'compress_cpu_ms': round(self.compress_seconds * 1000, 1),
+            'encodings': dict(self.encodings),
+            'levels': {encoding: self.levels[encoding] for encoding in ENCODERS},
+            'online_levels': {encoding: self.online_levels[encoding] for encoding in ENCODERS},
+            'gzip_level': GZIP_LEVEL
+        }
+    
+    def _count(self, encoding: str, size_in: int, size_out: int) -> None:
+        self.bytes_in += size_in
+        self.bytes_out += size_out
+        self.encodings[encoding] = self.encodings.get(encoding, 0) + 1
+    
+    def _remove(self, key: Tuple[str, str]) -> None:
+        encoded, _ = self._entries.pop(key)
+        self.current_bytes -= len(encoded)
+
+
+body_cache = CompressedBodyCache(
+    max_bytes=config('ENCAR_COMPRESSED_CACHE_MB', default=32, cast=int) * 1024 * 1024,
+    levels=PRECOMPRESS_LEVELS,
+    online_levels=ONLINE_LEVELS
+)
+
+
+def encode_body(request: Request, etag: str, render: Callable[[], bytes],
+                precompress: bool = False) -> Tuple[bytes, Optional[str]]:
+    """Тело в лучшей принятой кодировке: из кэша по ETag или сжатое один раз.
+    
+    render() вызывается только на промахе, поэтому попадание не сериализует ответ.
+    precompress - ETag из кэша ответов API, промах сжимается уровнем PRECOMPRESS_LEVELS.
+    Возвращает (байты, Content-Encoding или None для несжатого тела).
+    """
+    encoding = negotiate_encoding(request)
+    if encoding is not None:
+        encoded = body_cache.get(etag, encoding)
+        if encoded is not None:
+            return encoded, encoding
+    
+    body = render()
+    if encoding is None or len(body) < MIN_SIZE:
+        return body, None
+    return body_cache.put(etag, encoding, body, precompress), encoding
+
+
+def compress_response(request: Request, response: Response) -> Response:
+    """Подменяет тело готового ответа (страницы) сжатым из кэша по хэшу содержимого.
+    
+    Заголовки и cookie ответа сохраняются; страница по-прежнему рендерится
+    на каждый запрос, но одинаковый результат сжимается один раз. Только для
+    страниц, которые повторяются (карточка, отчет по car_id): уникальные
+    страницы вытесняли бы из кэша полезные записи - их сжимает GZipMiddleware.
+    """
+    key = hashlib.blake2b(response.body, digest_size=16).hexdigest()
+    body, encoding = encode_body(request, key, lambda: response.body)
+    if encoding is not None:
+        # Несжатым ответам Vary добавит GZipMiddleware
+        response.body = body
+        response.headers['Content-Encoding'] = encoding
+        response.headers['Content-Length'] = str(len(body))
+        response.headers['Vary'] = 'Accept-Encoding'
+    return response
@@ -0,0 +1,95 @@
+"""
+HTTP кэширование JSON ответов: ETag, If-None-Match и Cache-Control
+
+ETag - хэш содержимого ответа. Для ответов из кэша API он вычисляется
+один раз при записи в кэш (ResponseCache) и передается сюда готовым,
+поэтому проверка If-None-Match на попадании не сериализует ответ.
+По тому же ETag хранится и сжатое тело (utils.compression).
+Клиенту ETag отдается слабым (W/): несжатое, gzip и br тела одного
+содержимого - разные байты, и сильный валидатор у них должен различаться.
+"""
+import hashlib
+from typing import Any, Optional
+
+from decouple import config
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+
+from utils.compression import encode_body
+from utils.json_codec import dumps
+
+# Cache-Control по типам роутов
+CACHE_POLICIES = {
+    'car': config('ENCAR_HTTP_CACHE_CAR', default='public, max-age=300, stale-while-revalidate=600'),
+    'catalog': config('ENCAR_HTTP_CACHE_CATALOG', default='public, max-age=60, stale-while-revalidate=120'),
+    'facets': config('ENCAR_HTTP_CACHE_FACETS', default='public, max-age=300, stale-while-revalidate=600'),
+    # Редирект на канонический URL не меняется
+    'redirect': 'public, max-age=86400',
+    # Ошибки, неуспешные ответы upstream и запросы в обход кэша
+    'no_store': 'no-store',
+}
+
+
+def serialize_json(content: Any) -> bytes:
+    """Компактный JSON как у JSONResponse, но через orjson (если установлен).
+    
+    Неразобранный ответ upstream (RawJSON) отдается исходными байтами.
+    """
+    return dumps(content)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse на serialize_json: быстрее и принимает RawJSON"""
+    
+    def render(self, content: Any) -> bytes:
+        return serialize_json(content)
+
+
+def make_etag(body: bytes) -> str:
+    """Сильный ETag по содержимому"""
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def weak_etag(etag: str) -> str:
+    """Слабый ETag для ответа: один на все Content-Encoding одного содержимого"""
+    return etag if etag.startswith('W/') else 'W/' + etag
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Совпадает ли ETag с If-None-Match (слабое сравнение, как требует RFC 9110)"""
+    header = request.headers.get('if-none-match')
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    candidates = {tag.strip().removeprefix('W/') for tag in header.split(',')}
+    return etag.removeprefix('W/') in candidates
+
+
+def cached_json_response(request: Request, content: Any, policy: str,
+                         etag: Optional[str] = None) -> Response:
+    """JSON ответ с ETag и Cache-Control или 304, если у клиента та же версия.
+    
+    Тело отдается сжатым один раз на ETag (utils.compression): при известном
+    ETag попадание не сериализует и не сжимает ответ.
+    """
+    headers = {'Cache-Control': CACHE_POLICIES[policy]}
+    if etag is not None and etag_matches(request, etag):
+        return Response(status_code=304, headers={**headers, 'ETag': weak_etag(etag)})
+    
+    body = None
+    # ETag из кэша ответов API - содержимое будет повторяться, его стоит сжать сильнее
+    precompress = etag is not None
+    if etag is None:
+        body = serialize_json(content)
+        etag = make_etag(body)
+        if etag_matches(request, etag):
+            return Response(status_code=304, headers={**headers, 'ETag': weak_etag(etag)})
+    headers['ETag'] = weak_etag(etag)
+    
+    body, encoding = encode_body(request, etag, lambda: body if body is not None else serialize_json(content),
+                                 precompress)
+    if encoding is not None:
+        headers['Content-Encoding'] = encoding
+        headers['Vary'] = 'Accept-Encoding'
+    return Response(content=body, media_type=JSONResponse.media_type, headers=headers)
@@ -2,8 +2,9 @@
 Генератор актов осмотра автомобилей - исправленная версия
 """
 import os
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
+from .assets import asset_url
 from .translations import TRANSLATIONS
 from .damage_coordinates import DAMAGE_COORDINATES, DAMAGE_COLORS
 
@@ -12,9 +13,9 @@ class InspectionGenerator:
     """Генератор отчетов осмотра автомобилей - исправленная версия"""
     
     def __init__(self):
-        # Используем правильные пути для FastAPI
-        self.front_svg = "/example/static/images/car_scheme_front.svg"
-        self.back_svg = "/example/static/images/car_scheme_back.svg"
+        # Используем правильные пути для FastAPI (хэшированные копии из сборки, если она есть)
+        self.front_svg = asset_url("images/car_scheme_front.svg")
+        self.back_svg = asset_url("images/car_scheme_back.svg")
     
     def generate_report(self, car_data: Dict[str, Any], lang: str = 'ru') -> Dict[str, Any]:
         """Генерирует данные для отчета осмотра - ИСПРАВЛЕННАЯ ВЕРСИЯ"""
@@ -170,29 +171,26 @@ class InspectionGenerator:
         except Exception:
             return '—'
 
-    def _generate_diagnosis_sections(self, checkup: Dict[str, Any], lang: str) -> str:
-        """Генерирует HTML для разделов диагностики"""
+    def _generate_diagnosis_sections(self, checkup: Dict[str, Any], lang: str) -> Optional[List[Dict[str, Any]]]:
+        """Собирает данные разделов диагностики (None - ошибка загрузки)"""
         try:
             t = TRANSLATIONS[lang]
             inners = checkup.get('inners', [])
             
-            if not inners:
-                return f'<p class="no-data">{t.get("no_data", "Нет данных")}</p>'
-            
-            sections_html = []
+            sections = []
             
             for system in inners:
-                section_html = self._generate_system_section(system, t)
-                if section_html:
-                    sections_html.append(section_html)
+                section = self._generate_system_section(system, t)
+                if section:
+                    sections.append(section)
             
-            return '\n'.join(sections_html)
+            return sections
         except Exception as e:
             print(f"Diagnosis sections error: {e}")
-            return '<p class="no-data">Ошибка загрузки диагностики</p>'
+            return None
 
-    def _generate_system_section(self, system: Dict[str, Any], translations: Dict[str, Any]) -> str:
-        """Генерирует HTML для одной системы"""
+    def _generate_system_section(self, system: Dict[str, Any], translations: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Собирает данные одной системы"""
         system_title = system.get('type', {}).get('title', 'Другое')
         system_code = system.get('type', {}).get('code', '')
         
@@ -203,28 +201,16 @@ class InspectionGenerator:
         
         children = system.get('children', [])
         if not children:
-            return ''
-        
-        items_html = self._generate_system_items(children, translations)
+            return None
         
-        return f'''
-        <div class="detail-section">
-            <button type="button" class="detail-toggle" onclick="toggleSection(this)">
-                <span class="toggle-icon">▶</span>
-                <span class="system-name">{system_name}</span>
-            </button>
-            <div class="detail-content">
-                <table class="diagnosis-table">
-                    {items_html}
-                </table>
-            </div>
-        </div>
-        '''
+        return {
+            'name': system_name,
+            'items': self._generate_system_items(children, translations)
+        }
 
-    # В методе _generate_system_items ИСПРАВИТЬ получение названий элементов:
-    def _generate_system_items(self, children: List[Dict[str, Any]], translations: Dict[str, Any]) -> str:
-        """Генерирует HTML для элементов системы"""
-        items_html = []
+    def _generate_system_items(self, children: List[Dict[str, Any]], translations: Dict[str, Any]) -> List[Dict[str, str]]:
+        """Собирает элементы системы с переведенными названиями и статусами"""
+        items = []
         
         for item in children:
             item_title_orig = item.get('type', {}).get('title', '')
@@ -241,82 +227,45 @@ class InspectionGenerator:
                             translations.get('status_names', {}).get(status_title, 
                             status_title if status_title else '-'))
             
-            items_html.append(f'''
-            <tr>
-                <td class="element-name">{item_title}</td>
-                <td class="element-status">{status_value}</td>
-            </tr>
-            ''')
-        
-        return '\n'.join(items_html)
+            items.append({'name': item_title, 'status': status_value})
         
+        return items
 
-    def _generate_repair_list(self, checkup: Dict[str, Any], lang: str) -> str:
-        """Генерирует список деталей с ремонтом/заменой"""
+    def _generate_repair_list(self, checkup: Dict[str, Any], lang: str) -> Optional[List[Dict[str, str]]]:
+        """Собирает список деталей с ремонтом/заменой (None - ошибка загрузки)"""
         try:
             t = TRANSLATIONS[lang]
             outers = checkup.get('outers', [])
             
-            if not outers:
-                return f'<p class="no-data">Нет данных о ремонтах и заменах</p>'
-            
-            rows_html = self._generate_repair_rows(outers, t)
-            
-            return f'''
-            <div class="repair-section">
-                <button type="button" class="detail-toggle" onclick="toggleSection(this)">
-                    <span class="toggle-icon">▶</span>
-                    <span class="system-name">Детали с ремонтом/заменой</span>
-                </button>
-                <div class="detail-content" style="display: none;">
-                    <table class="repair-table">
-                        <thead>
-                            <tr>
-                                <th>Деталь</th>
-                                <th>Тип ремонта</th>
-                                <th>Статус</th>
-                            </tr>
-                        </thead>
-                        <tbody>
-                            {rows_html}
-                        </tbody>
-                    </table>
-                </div>
-            </div>
-            '''
+            return self._generate_repair_rows(outers, t)
         except Exception as e:
             print(f"Repair list error: {e}")
-            return '<p class="no-data">Ошибка загрузки ремонтов</p>'
+            return None
 
-    def _generate_repair_rows(self, outers: List[Dict[str, Any]], translations: Dict[str, Any]) -> str:
-        """Генерирует строки таблицы ремонтов"""
-        try:
-            rows = []
-            
-            for damage in outers:
-                row_html = self._generate_repair_row(damage, translations)
-                rows.append(row_html)
-            
-            return '\n'.join(rows)
-        except Exception as e:
-            print(f"Repair rows error: {e}")
-            return ''
+    def _generate_repair_rows(self, outers: List[Dict[str, Any]], translations: Dict[str, Any]) -> List[Dict[str, str]]:
+        """Собирает строки таблицы ремонтов"""
+        rows = []
+        
+        for damage in outers:
+            row = self._generate_repair_row(damage, translations)
+            if row:
+                rows.append(row)
+        
+        return rows
 
-    def _generate_repair_row(self, damage: Dict[str, Any], translations: Dict[str, Any]) -> str:
-        """Генерирует одну строку таблицы ремонтов"""
+    def _generate_repair_row(self, damage: Dict[str, Any], translations: Dict[str, Any]) -> Optional[Dict[str, str]]:
+        """Собирает одну строку таблицы ремонтов"""
         try:
             damage_name = damage.get('type', {}).get('title', 'Неизвестная деталь')
             repair_type, status = self._get_repair_info(damage, translations)
             
-            return f'''
-            <tr>
-                <td class="part-name">{damage_name}</td>
-                <td class="repair-type">{repair_type}</td>
-                <td class="repair-status">{status}</td>
-            </tr>
-            '''
+            return {
+                'name': damage_name,
+                'repair_type': repair_type,
+                'status': status
+            }
         except Exception:
-            return ''
+            return None
 
     def _get_repair_info(self, damage: Dict[str, Any], translations: Dict[str, Any]) -> Tuple[str, str]:
         """Получает информацию о ремонте"""
@@ -341,26 +290,20 @@ class InspectionGenerator:
             return '—', '—'
 
 
-    def _generate_svg_schemes(self, checkup: Dict[str, Any], lang: str) -> str:
-        """Генерирует HTML со схемами повреждений"""
+    def _generate_svg_schemes(self, checkup: Dict[str, Any], lang: str) -> Optional[List[Dict[str, Any]]]:
+        """Собирает данные схем повреждений (None - ошибка загрузки)"""
         try:
-            t = TRANSLATIONS[lang]
             outers = checkup.get('outers', [])
             
-            if not outers:
-                return f'<p class="no-data">{t["no_damages"]}</p>'
-            
             front_damages, back_damages = self._categorize_damages(outers)
             
-            schemes_html = self._build_schemes_html(front_damages, back_damages, lang)
-            
-            return schemes_html
+            return self._build_schemes(front_damages, back_damages, lang)
             
         except Exception as e:
             print(f"SVG schemes error: {e}")
             import traceback
             traceback.print_exc()
-            return '<p class="no-data">Ошибка загрузки схем</p>'
+            return None
     
 
     def _categorize_damages(self, outers: List[Dict[str, Any]]) -> Tuple[List, List]:
@@ -429,73 +372,43 @@ class InspectionGenerator:
         # Используем КОД из API напрямую, так как в координатах есть точные соответствия
         return damage_code  # P032, P021, P061
 
-    # В методе _build_schemes_html ИСПРАВИТЬ логику отображения:
-    def _build_schemes_html(self, front_damages: List, back_damages: List, lang: str) -> str:
-        """Строит HTML для схем - показываем только схемы с повреждениями"""
-        schemes_html = '<div class="schemes-container">'
-        schemes_html += '<div class="scheme-wrapper">'
+    def _build_schemes(self, front_damages: List, back_damages: List, lang: str) -> List[Dict[str, Any]]:
+        """Собирает схемы - показываем только схемы с повреждениями"""
+        schemes = []
         
-        # Показываем только схемы, где есть повреждения
         if front_damages:
-            schemes_html += self._generate_scheme_html(front_damages, 'front', lang)
+            schemes.append(self._generate_scheme(front_damages, 'front', lang))
         
         if back_damages:
-            schemes_html += self._generate_scheme_html(back_damages, 'back', lang)
-        
-        # Если нет повреждений вообще, показываем сообщение
-        if not front_damages and not back_damages:
-            schemes_html += f'<p class="no-data">{TRANSLATIONS[lang]["no_damages"]}</p>'
-        
-        schemes_html += '</div>'
-        schemes_html += '</div>'
+            schemes.append(self._generate_scheme(back_damages, 'back', lang))
         
-        return schemes_html
+        return schemes
 
-    # В методе _generate_scheme_html ИСПРАВИТЬ названия:
-    def _generate_scheme_html(self, damages: List, scheme_type: str, lang: str) -> str:
-        """Генерирует HTML для одной схемы"""
-        try:
-            svg_path = self.front_svg if scheme_type == 'front' else self.back_svg
-            # Меняем названия на "Вид сверху" и "Вид снизу"
-            scheme_name = "Вид сверху" if scheme_type == 'front' else "Вид снизу"
-            
-            damage_count = len(damages)
-            
-            return f'''
-            <div class="scheme-container">
-                <div class="scheme-title">{scheme_name} ({damage_count} повреждений)</div>
-                <div style="position: relative; display: inline-block;">
-                    <img src="{svg_path}" width="400" height="300" alt="{scheme_name}" style="display: block;">
-                    {self._generate_damage_points_html(damages, scheme_type, TRANSLATIONS[lang])}
-                </div>
-            </div>
-            '''
-        except Exception as e:
-            print(f"Scheme HTML error: {e}")
-            return f'<div class="scheme-container">Ошибка: {str(e)}</div>'
+    def _generate_scheme(self, damages: List, scheme_type: str, lang: str) -> Dict[str, Any]:
+        """Собирает данные одной схемы"""
+        return {
+            'type': scheme_type,
+            'svg': self.front_svg if scheme_type == 'front' else self.back_svg,
+            # Названия схем: "Вид сверху" и "Вид снизу"
+            'name': "Вид сверху" if scheme_type == 'front' else "Вид снизу",
+            'damage_count': len(damages),
+            'points': self._generate_damage_points(damages, scheme_type, TRANSLATIONS[lang])
+        }
 
-    def _generate_damage_points_html(self, damages: List, scheme_type: str, translations: Dict[str, Any]) -> str:
-        """Генерирует HTML для точек повреждений"""
-        try:
-            points_html = ''
-            damage_count = 0
-            
-            for damage in damages:
-                point_html = self._generate_damage_point_html(damage, scheme_type, translations)
-                if point_html:
-                    points_html += point_html
-                    damage_count += 1
-            
-            return points_html
-        except Exception as e:
-            print(f"Damage points HTML error: {e}")
-            return ''
+    def _generate_damage_points(self, damages: List, scheme_type: str, translations: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Собирает точки повреждений для схемы"""
+        points = []
+        
+        for damage in damages:
+            point = self._generate_damage_point(damage, scheme_type, translations)
+            if point:
+                points.append(point)
+        
+        return points
 
-    
-    # В методе _generate_damage_point_html ДОБАВИТЬ отладку:
-    def _generate_damage_point_html(self, damage: Dict[str, Any], scheme_type: str, 
-                                translations: Dict[str, Any]) -> str:
-        """Генерирует HTML для одной точки повреждения"""
+    def _generate_damage_point(self, damage: Dict[str, Any], scheme_type: str, 
+                               translations: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Собирает данные одной точки повреждения"""
         try:
             damage_type = damage.get('type', {})
             damage_code = damage_type.get('code', '')
@@ -503,27 +416,26 @@ class InspectionGenerator:
             
             coordinates_key = self._map_damage_to_coordinates(damage_title, damage_code)
             
-            
             if coordinates_key not in DAMAGE_COORDINATES:
                 print(f"  No coordinates found for {coordinates_key}")
-                return ''
+                return None
             
             coords = DAMAGE_COORDINATES[coordinates_key]
             if coords['scheme'] != scheme_type:
                 print(f"  Scheme mismatch: {coords['scheme']} != {scheme_type}")
-                return ''
+                return None
             
             damage_info = self._get_damage_info(damage, translations)
             
-            return f'''
-            <div class="damage-point" 
-                style="left: {coords['x']}%; top: {coords['y']}%; background: {damage_info['color']};"
-                title="{coords['name']}: {damage_info['status']}">
-            </div>
-            '''
+            return {
+                'x': coords['x'],
+                'y': coords['y'],
+                'color': damage_info['color'],
+                'title': f"{coords['name']}: {damage_info['status']}"
+            }
         except Exception as e:
-            print(f"Damage point HTML error: {e}")
-            return ''
+            print(f"Damage point error: {e}")
+            return None
 
 
     def _process_damage(self, damage: Dict[str, Any], damage_stats: Dict, 
@@ -0,0 +1,115 @@
+"""
+Быстрый JSON: orjson, если установлен, и исходные байты ответов upstream
+
+RawJSON хранит тело ответа API как есть и разбирает его только при обращении
+к содержимому. Роуты-прокси отдают такие байты клиенту без разбора и повторной
+сериализации; роуты, изменяющие данные, сериализуют результат через dumps().
+"""
+import json
+import re
+from collections.abc import Mapping
+from typing import Any, Iterator
+
+try:
+    import orjson
+except ImportError:  # без orjson - стандартный json
+    orjson = None
+
+# Первый член объекта с простым значением: {"status": "success", ...}
+_FIRST_MEMBER = re.compile(
+    rb'\s*\{\s*"((?:[^"\\]|\\.)*)"\s*:\s*("(?:[^"\\]|\\.)*"|-?\d+(?:\.\d+)?|true|false|null)\s*[,}]'
+)
+
+
+class RawJSON(Mapping):
+    """JSON объект upstream: исходные байты и разбор по первому обращению.
+    
+    Ведет себя как неизменяемый dict. Значение первого ключа (у API это status)
+    читается без разбора всего тела, поэтому проверка статуса ответа
+    не разбирает мегабайтные детали автомобиля.
+    """
+    
+    __slots__ = ('raw', '_data')
+    
+    def __init__(self, raw: bytes):
+        self.raw = raw
+        self._data = None
+    
+    @property
+    def data(self) -> dict:
+        if self._data is None:
+            data = loads(self.raw)
+            if not isinstance(data, dict):
+                raise ValueError("RawJSON: ожидался JSON объект")
+            self._data = data
+        return self._data
+    
+    @property
+    def is_parsed(self) -> bool:
+        return self._data is not None
+    
+    def __getitem__(self, key: str) -> Any:
+        if self._data is None:
+            match = _FIRST_MEMBER.match(self.raw)
+            if match is not None and loads(b'"' + match.group(1) + b'"') == key:
+                return loads(match.group(2))
+        return self.data[key]
+    
+    def __contains__(self, key: object) -> bool:
+        if self._data is None:
+            match = _FIRST_MEMBER.match(self.raw)
+            if match is not None and loads(b'"' + match.group(1) + b'"') == key:
+                return True
+        return key in self.data
+    
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.data)
+    
+    def __len__(self) -> int:
+        return len(self.data)
+    
+    def __bool__(self) -> bool:
+        if self._data is None:
+            return self.raw.strip() != b'{}'
+        return bool(self._data)
+    
+    def __repr__(self) -> str:
+        return f"RawJSON({len(self.raw)} bytes{', parsed' if self._data is not None else ''})"
+
+
+def loads(data: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _default(value: Any) -> Any:
+    # Вложенный RawJSON сериализуется через разобранное содержимое
+    if isinstance(value, RawJSON):
+        return value.data
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """Компактный UTF-8 JSON; RawJSON верхнего уровня и в значениях dict - исходными байтами"""
+    if isinstance(content, RawJSON):
+        return content.raw
+    if isinstance(content, dict) and any(isinstance(value, RawJSON) for value in content.values()):
+        return _dumps_spliced(content)
+    return _dumps(content)
+
+
+def _dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None,
+                      separators=(',', ':'), default=_default).encode('utf-8')
+
+
+def _dumps_spliced(content: dict) -> bytes:
+    """Объект, в который значения RawJSON вставлены байтами без разбора"""
+    parts = []
+    for key, value in content.items():
+        body = value.raw if isinstance(value, RawJSON) else _dumps(value)
+        parts.append(_dumps(str(key)) + b':' + body.strip())
+    return b'{' + b','.join(parts) + b'}'
@@ -0,0 +1,53 @@
+"""Выбор одного воркера для фоновых синхронизаций
+
+Воркеры serve.py разделяют кэши через общий каталог, поэтому синхронизации
+с API (снимок производителей, фасеты, индекс объявлений) достаточно вести
+в одном процессе. Ведущим становится воркер, захвативший flock на файле
+в общем каталоге; блокировка снимается ядром при смерти процесса, и ее
+подхватывает один из остальных воркеров.
+"""
+import os
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # без fcntl (Windows) каждый процесс ведущий
+    fcntl = None
+
+
+class LeaderLock:
+    """Неблокирующая эксклюзивная блокировка файла; без пути - процесс всегда ведущий"""
+    
+    def __init__(self, path: str):
+        self.path = path
+        self.is_leader = False
+        self._fd: Optional[int] = None
+    
+    def try_acquire(self) -> bool:
+        """Пытается стать ведущим, не дожидаясь блокировки"""
+        if self.is_leader:
+            return True
+        if not self.path or fcntl is None:
+            self.is_leader = True
+            return True
+        
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        self._fd = fd
+        self.is_leader = True
+        return True
+    
+    def release(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        self.is_leader = False
@@ -0,0 +1,173 @@
+"""
+Метрики приложения в текстовом формате Prometheus
+
+Запись идет только из потока event loop, поэтому счетчики - обычные словари
+без блокировок: наблюдение стоит один bisect и несколько сложений.
+В режиме нескольких воркеров (serve.py) каждый процесс отдает свои значения.
+"""
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from fastapi import HTTPException
+from fastapi.routing import APIRoute
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# (имя, тип, описание, [(метки, значение)])
+MetricFamily = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+
+class Histogram:
+    """Гистограмма с фиксированными границами корзин"""
+    
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+    
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        # Последняя ячейка - корзина +Inf
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+    
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class LatencyTracker:
+    """Латентность, запросы в работе и ошибки в разрезе набора меток"""
+    
+    def __init__(self, name: str, label_names: Tuple[str, ...], description: str,
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.label_names = label_names
+        self.description = description
+        self.buckets = buckets
+        self.histograms: Dict[tuple, Histogram] = {}
+        self.in_flight: Dict[tuple, int] = {}
+        self.errors: Dict[tuple, int] = {}
+    
+    def begin(self, labels: tuple) -> float:
+        self.in_flight[labels] = self.in_flight.get(labels, 0) + 1
+        return time.perf_counter()
+    
+    def end(self, labels: tuple, started: float) -> None:
+        self.in_flight[labels] -= 1
+        histogram = self.histograms.get(labels)
+        if histogram is None:
+            histogram = self.histograms[labels] = Histogram(self.buckets)
+        histogram.observe(time.perf_counter() - started)
+    
+    def error(self, labels: tuple, code: str) -> None:
+        key = labels + (code,)
+        self.errors[key] = self.errors.get(key, 0) + 1
+    
+    def render(self, lines: List[str]) -> None:
+        name = self.name
+        lines.append(f"# HELP {name}_duration_seconds {self.description}")
+        lines.append(f"# TYPE {name}_duration_seconds histogram")
+        for labels, histogram in sorted(self.histograms.items()):
+            base = _format_labels(self.label_names, labels)
+            cumulative = 0
+            for bound, count in zip(self.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f'{name}_duration_seconds_bucket{{{base},le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_duration_seconds_bucket{{{base},le="+Inf"}} {histogram.count}')
+            lines.append(f"{name}_duration_seconds_sum{{{base}}} {histogram.sum:.6f}")
+            lines.append(f"{name}_duration_seconds_count{{{base}}} {histogram.count}")
+        
+        lines.append(f"# HELP {name}s_in_flight Запросы в работе")
+        lines.append(f"# TYPE {name}s_in_flight gauge")
+        for labels, value in sorted(self.in_flight.items()):
+            lines.append(f"{name}s_in_flight{{{_format_labels(self.label_names, labels)}}} {value}")
+        
+        lines.append(f"# HELP {name}_errors_total Ошибки по коду")
+        lines.append(f"# TYPE {name}_errors_total counter")
+        label_names = self.label_names + ('code',)
+        for labels, value in sorted(self.errors.items()):
+            lines.append(f"{name}_errors_total{{{_format_labels(label_names, labels)}}} {value}")
+
+
+class MetricsRegistry:
+    """Реестр метрик роутов, upstream API и внешних сборщиков"""
+    
+    def __init__(self):
+        self.http = LatencyTracker('encar_http_request', ('method', 'route'),
+                                   'Время обработки запроса роутом FastAPI')
+        self.upstream = LatencyTracker('encar_upstream_request', ('endpoint',),
+                                       'Время запроса к upstream API')
+        self._collectors: List[Callable[[], Iterable[MetricFamily]]] = []
+    
+    def add_collector(self, collector: Callable[[], Iterable[MetricFamily]]) -> None:
+        """Регистрирует функцию, возвращающую метрики на момент выгрузки"""
+        self._collectors.append(collector)
+    
+    def render(self) -> str:
+        lines: List[str] = []
+        self.http.render(lines)
+        self.upstream.render(lines)
+        for collector in self._collectors:
+            for name, metric_type, description, samples in collector():
+                lines.append(f"# HELP {name} {description}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                for labels, value in samples:
+                    if labels:
+                        label_text = _format_labels(tuple(labels), tuple(labels.values()))
+                        lines.append(f"{name}{{{label_text}}} {value}")
+                    else:
+                        lines.append(f"{name} {value}")
+        lines.append('')
+        return '\n'.join(lines)
+
+
+class MetricsRoute(APIRoute):
+    """APIRoute, замеряющий время обработчика по шаблону пути (без id в метках)"""
+    
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        path = self.path
+        tracker = metrics.http
+        
+        async def timed_handler(request):
+            labels = (request.method, path)
+            started = tracker.begin(labels)
+            try:
+                response = await handler(request)
+            except HTTPException as e:
+                tracker.error(labels, str(e.status_code))
+                raise
+            except Exception:
+                tracker.error(labels, 'exception')
+                raise
+            finally:
+                tracker.end(labels, started)
+            if response.status_code >= 400:
+                tracker.error(labels, str(response.status_code))
+            return response
+        
+        return timed_handler
+
+
+def error_code(message: str) -> str:
+    """Код ошибки из сообщения вида 'API_TIMEOUT: ...'
+
+    Для обернутых ошибок ('API_REQUEST_ERROR: API_ERROR_404: ...') берется самый внутренний код.
+    """
+    codes = [part for part in message.split(': ')[:-1]
+             if part.startswith('API_') and part.replace('_', '').isalnum() and part.isupper()]
+    if codes:
+        return codes[-1]
+    return message.split(':', 1)[0] or 'unknown'
+
+
+def _format_labels(names: Tuple[str, ...], values: tuple) -> str:
+    return ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+metrics = MetricsRegistry()
@@ -0,0 +1,281 @@
+"""
+Профилирование медленных запросов
+
+ProfilingMiddleware создает профиль запроса в contextvar, код приложения
+отмечает фазы через phase('upstream') и т.п. Профиль пишется в ротируемый лог,
+если запрос попал в выборку или превысил порог. Пока профилирование выключено,
+phase() не делает ничего, кроме чтения contextvar.
+
+Настройки меняются на лету через ProfilingSettings.update()
+(роут /example/api/profiling с заголовком X-Profile-Token = ENCAR_PROFILE_TOKEN;
+без токена изменение закрыто); в режиме нескольких воркеров - в каждом свои.
+"""
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+from typing import Any, Dict, Optional
+
+from decouple import config
+
+_current_profile: ContextVar[Optional['RequestProfile']] = ContextVar('request_profile', default=None)
+
+
+def _parse_flag(value: Any) -> bool:
+    """JSON boolean или строка true/false; bool("false") был бы True"""
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.strip().lower() in ('true', 'false'):
+        return value.strip().lower() == 'true'
+    raise ValueError(f"Ожидалось true или false, получено: {value!r}")
+
+
+class ProfilingSettings:
+    """Настройки профилирования, изменяемые без перезапуска"""
+    
+    def __init__(self):
+        self.enabled = config('ENCAR_PROFILE_ENABLED', default=False, cast=bool)
+        self.sample_rate = config('ENCAR_PROFILE_SAMPLE_RATE', default=0.0, cast=float)
+        self.slow_threshold = config('ENCAR_PROFILE_SLOW_MS', default=1000, cast=float) / 1000
+        self.stack_sampling = config('ENCAR_PROFILE_STACKS', default=False, cast=bool)
+        self.stack_interval = config('ENCAR_PROFILE_STACK_INTERVAL_MS', default=10, cast=float) / 1000
+    
+    def update(self, values: Dict[str, Any]) -> None:
+        """Применяет изменения; неизвестные ключи и неверные значения - ошибка"""
+        if not isinstance(values, dict):
+            raise ValueError("Ожидался JSON объект с настройками")
+        fields = {
+            'enabled': ('enabled', _parse_flag),
+            'sample_rate': ('sample_rate', lambda v: min(max(float(v), 0.0), 1.0)),
+            'slow_threshold_ms': ('slow_threshold', lambda v: max(float(v), 0.0) / 1000),
+            'stack_sampling': ('stack_sampling', _parse_flag),
+            'stack_interval_ms': ('stack_interval', lambda v: max(float(v), 1.0) / 1000),
+        }
+        parsed = {}
+        for key, value in values.items():
+            if key not in fields:
+                raise ValueError(f"Неизвестная настройка: {key}")
+            attribute, parser = fields[key]
+            parsed[attribute] = parser(value)
+        
+        for attribute, value in parsed.items():
+            setattr(self, attribute, value)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'enabled': self.enabled,
+            'sample_rate': self.sample_rate,
+            'slow_threshold_ms': self.slow_threshold * 1000,
+            'stack_sampling': self.stack_sampling,
+            'stack_interval_ms': self.stack_interval * 1000,
+            'log_path': LOG_PATH
+        }
+
+
+class RequestProfile:
+    """Суммарное время по фазам одного запроса (вложенные фазы считаются целиком)"""
+    
+    __slots__ = ('phases', 'sampled', 'started')
+    
+    def __init__(self, sampled: bool):
+        self.phases: Dict[str, float] = {}
+        self.sampled = sampled
+        self.started = time.perf_counter()
+    
+    def add(self, name: str, seconds: float) -> None:
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+
+@contextmanager
+def phase(name: str):
+    """Отмечает фазу запроса; без активного профиля ничего не замеряет"""
+    profile = _current_profile.get()
+    if profile is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add(name, time.perf_counter() - started)
+
+
+class StackSampler:
+    """Фоновый поток, периодически снимающий стек потока event loop
+    
+    Стеки пишутся в кольцевой буфер только пока есть профилируемые запросы.
+    В event loop выполняются все запросы сразу, поэтому в выборку попадает
+    и работа соседних запросов за то же время.
+    """
+    
+    def __init__(self, history_seconds: float = 60):
+        self.history_seconds = history_seconds
+        self.samples = deque()
+        self.active_requests = 0
+        self._loop_thread_id: Optional[int] = None
+        self._thread: Optional[threading.Thread] = None
+    
+    def ensure_running(self, loop_thread_id: int) -> None:
+        self._loop_thread_id = loop_thread_id
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+            self._thread.start()
+    
+    def collect(self, started: float, finished: float) -> Dict[str, int]:
+        """Свернутые стеки (формат flamegraph) за интервал запроса"""
+        stacks: Dict[str, int] = {}
+        for timestamp, stack in list(self.samples):
+            if started <= timestamp <= finished:
+                stacks[stack] = stacks.get(stack, 0) + 1
+        return stacks
+    
+    def _run(self) -> None:
+        while settings.enabled and settings.stack_sampling:
+            time.sleep(settings.stack_interval)
+            if not self.active_requests:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            now = time.perf_counter()
+            self.samples.append((now, self._fold(frame)))
+            while self.samples and self.samples[0][0] < now - self.history_seconds:
+                self.samples.popleft()
+    
+    @staticmethod
+    def _fold(frame) -> str:
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+            frame = frame.f_back
+        return ';'.join(reversed(names))
+
+
+def _create_logger() -> logging.Logger:
+    logger = logging.getLogger('encar.profiling')
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    return logger
+
+
+def _ensure_handler() -> None:
+    """Файл лога открывается только при первой записи"""
+    if profile_logger.handlers:
+        return
+    directory = os.path.dirname(LOG_PATH)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    handler = RotatingFileHandler(LOG_PATH, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS, encoding='utf-8')
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    profile_logger.addHandler(handler)
+
+
+class ProfilingMiddleware:
+    """Внешний ASGI middleware: создает профиль и пишет его в лог при необходимости
+    
+    Должен стоять снаружи GZipMiddleware, а CompressionTimerMiddleware - сразу
+    внутри него: время сжатия = время отправки через GZip минус время отправки наружу.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not settings.enabled:
+            await self.app(scope, receive, send)
+            return
+        
+        profile = RequestProfile(sampled=random.random() < settings.sample_rate)
+        token = _current_profile.set(profile)
+        status = 0
+        
+        if settings.stack_sampling:
+            sampler.ensure_running(threading.get_ident())
+        sampler.active_requests += 1
+        
+        async def timed_send(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            started = time.perf_counter()
+            try:
+                await send(message)
+            finally:
+                profile.add('send', time.perf_counter() - started)
+        
+        try:
+            await self.app(scope, receive, timed_send)
+        finally:
+            sampler.active_requests -= 1
+            _current_profile.reset(token)
+            self._finish(scope, profile, status)
+    
+    def _finish(self, scope, profile: RequestProfile, status: int) -> None:
+        finished = time.perf_counter()
+        duration = finished - profile.started
+        slow = duration >= settings.slow_threshold
+        if not (slow or profile.sampled):
+            return
+        
+        phases = dict(profile.phases)
+        if 'compress_and_send' in phases:
+            phases['compression'] = max(phases.pop('compress_and_send') - phases.get('send', 0.0), 0.0)
+        
+        record = {
+            'ts': datetime.now(timezone.utc).isoformat(timespec='milliseconds'),
+            'reason': 'slow' if slow else 'sampled',
+            'method': scope.get('method'),
+            'path': scope.get('path'),
+            'query': scope.get('query_string', b'').decode('latin-1'),
+            'status': status,
+            'duration_ms': round(duration * 1000, 2),
+            'phases_ms': {name: round(value * 1000, 2) for name, value in sorted(phases.items())}
+        }
+        if settings.stack_sampling:
+            record['stacks'] = sampler.collect(profile.started, finished)
+        
+        try:
+            _ensure_handler()
+            profile_logger.info(json.dumps(record, ensure_ascii=False))
+        except OSError as e:
+            print(f"Profiling log error: {e}")
+
+
+class CompressionTimerMiddleware:
+    """Внутренний middleware: замеряет отправку через GZipMiddleware (сжатие + отправка).
+    
+    Заранее сжатые ответы GZip пропускает, для них здесь только отправка,
+    а сжатие на промахе кэша попадает в фазу 'compress'.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if _current_profile.get() is None:
+            await self.app(scope, receive, send)
+            return
+        
+        async def timed_send(message):
+            with phase('compress_and_send'):
+                await send(message)
+        
+        await self.app(scope, receive, timed_send)
+
+
+LOG_PATH = config('ENCAR_PROFILE_LOG', default='logs/profile.log')
+LOG_MAX_BYTES = config('ENCAR_PROFILE_LOG_MAX_BYTES', default=10 * 1024 * 1024, cast=int)
+LOG_BACKUPS = config('ENCAR_PROFILE_LOG_BACKUPS', default=5, cast=int)
+
+settings = ProfilingSettings()
+sampler = StackSampler()
+profile_logger = _create_logger()
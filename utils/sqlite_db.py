@@ -0,0 +1,41 @@
+"""Соединение SQLite, общее для воркеров на одном хосте"""
+import os
+import sqlite3
+from typing import Iterable, Optional
+
+
+class SharedSQLite:
+    """Соединение с базой в режиме WAL, отдельное в каждом процессе.
+    
+    Соединение, унаследованное через fork, не используется: при первом
+    обращении в новом процессе открывается свое. schema - выражения
+    CREATE ... IF NOT EXISTS, выполняемые при открытии. Доступ к соединению
+    из нескольких потоков сериализует владелец (threading.Lock).
+    """
+    
+    def __init__(self, path: str, schema: Iterable[str] = ()):
+        self.path = path
+        self.schema = tuple(schema)
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid = None
+    
+    def connection(self) -> sqlite3.Connection:
+        if self._conn is None or self._pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False,
+                                   isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            for statement in self.schema:
+                conn.execute(statement)
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+    
+    def close(self) -> None:
+        """Закрывает соединение своего процесса; чужое (до fork) только забывается"""
+        if self._conn is not None and self._pid == os.getpid():
+            self._conn.close()
+        self._conn = None